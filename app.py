@@ -2,9 +2,16 @@ import streamlit as st
 import auth
 from ui import pages
 import utils
+import change_listener
+import models
+from ui import debug_panel
 
 # 1. Initialize State
 auth.init_session_state()
+models.begin_query_trace(st.session_state.get("show_debug_panel", False))
+
+# Push cache invalidation (no-op unless DATABASE_URL / DB_PASSWORD is configured)
+change_listener.start_change_listener()
 
 # Inject CSS here so it is loaded once and never re-parsed during reruns
 utils.apply_custom_tabs_css()
@@ -22,6 +29,8 @@ with st.sidebar:
     st.divider() # Visual separation for the logout button
     if st.button("Log Out", use_container_width=True, type="secondary"):
         auth.sign_out()
+    if auth.is_admin():
+        st.toggle("🛠 Debug panel", key="show_debug_panel")
 
 # 4. Navigation Definition
 # Define your pages as a list
@@ -45,3 +54,10 @@ try:
     pg.run()
 except Exception as e:
     st.error(f"An unexpected error occurred: {e}")
+finally:
+    trace = models.end_query_trace()  # Also flushes the JSONL log when a page calls st.rerun()
+
+# 6. Query Debug Panel (admins, via the sidebar toggle)
+if trace is not None and st.session_state.get("show_debug_panel"):
+    with st.sidebar:
+        debug_panel.show_query_trace(trace)
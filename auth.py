@@ -1,5 +1,6 @@
 import streamlit as st
 from supabase_config import sb
+import models
 from auth_ui import AuthUI
 from auth_engine import AuthEngine
 
@@ -37,10 +38,10 @@ def init_session_state():
             res = sb.auth.get_user()
             if res and res.user: 
                 st.session_state.user = res.user
-                # Clear cache on initial load if a user is found to ensure 
-                # their specific metrics are loaded, not the public/empty ones.
+                # Drop this user's cached reads on initial load so a new
+                # session never starts from another session's stale copy.
                 if "initial_load_done" not in st.session_state:
-                    st.cache_data.clear()
+                    models.invalidate_user(res.user)
                     st.session_state.initial_load_done = True 
         except Exception as e:
             st.session_state.auth_debug.append(f"Session init error: {str(e)}")
@@ -77,12 +78,12 @@ def sign_out():
     except Exception as e:
         st.session_state.auth_debug.append(f"Sign out error: {str(e)}")
     
-    # 1. Clear session state user
+    # 1. Drop this user's cached reads (other users' caches stay warm)
+    models.invalidate_user(st.session_state.user)
+
+    # 2. Clear session state user
     st.session_state.user = None
     
-    # 2. IMPORTANT: Clear global cache so the next user doesn't see old data
-    st.cache_data.clear() 
-    
     # 3. Clean up UI states
     st.session_state.show_recovery_form = False
     st.session_state.show_password_reset = False
@@ -99,7 +100,6 @@ def auth_page():
             res = sb.auth.verify_otp({"token_hash": params["token_hash"], "type": token_type})
 
             st.query_params.clear()
-            st.cache_data.clear() # Clear cache as auth context has changed
 
             # Only recovery/invite flows should prompt for a new password.
             if token_type in ("recovery", "invite"):
@@ -109,6 +109,7 @@ def auth_page():
                 st.session_state.recovery_type = None
                 st.session_state.show_recovery_form = False
                 if res and getattr(res, "user", None):
+                    models.invalidate_user(res.user)  # Auth context has changed
                     st.session_state.user = res.user
                 st.rerun()
         except Exception as e:
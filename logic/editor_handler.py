@@ -1,8 +1,139 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import models
 import utils
 import datetime as dt
+from dataclasses import dataclass, field
+
+EDIT_COLUMNS = ("value", "recorded_at")
+
+@dataclass
+class EntryDraft:
+    """
+    Editor draft: the loaded window as an immutable base frame (never copied
+    or mutated) plus a compact overlay keyed by entry id. Save and reset only
+    touch the overlay; `view()` applies it to the visible rows.
+    """
+    base: pd.DataFrame
+    window: tuple | None = None
+    edits: dict = field(default_factory=dict)  # entry id -> {"value", "recorded_at"} after the edit
+    deleted: dict = field(default_factory=dict)  # entry id -> row snapshot at deletion time
+    added: list = field(default_factory=list)  # Rows added in the editor widget
+    _positions: dict | None = field(default=None, repr=False)
+    _updated: int = field(default=0, repr=False)  # Edited ids that are not also deleted
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.edits or self.deleted or self.added)
+
+    def rebase(self, base: pd.DataFrame, window=None):
+        self.base, self.window, self._positions = base, window, None
+
+    def clear(self):
+        self.edits, self.deleted, self.added = {}, {}, []
+        self._updated = 0
+
+    def _position(self, entry_id):
+        if self._positions is None:
+            ids = self.base["id"] if "id" in self.base.columns else []
+            self._positions = {entry_id: pos for pos, entry_id in enumerate(ids)}
+        return self._positions.get(entry_id)
+
+    def row(self, entry_id) -> dict:
+        """Current value/recorded_at of an entry, overlay first."""
+        if entry_id in self.edits:
+            return dict(self.edits[entry_id])
+        pos = self._position(entry_id)
+        if pos is None:
+            return dict(self.deleted.get(entry_id, {}))
+        return {col: self.base[col].iat[pos] for col in EDIT_COLUMNS}
+
+    def _rows(self, ids) -> pd.DataFrame:
+        """Current value/recorded_at of many entries, indexed by id: one take from the base."""
+        ids = list(ids)
+        in_base = {i: self._position(i) for i in ids if i not in self.edits and self._position(i) is not None}
+        frames = []
+        if in_base:
+            taken = self.base.take(list(in_base.values()))[list(EDIT_COLUMNS)]
+            frames.append(taken.set_axis(list(in_base), axis=0))
+        rest = [i for i in ids if i not in in_base]
+        if rest:
+            frames.append(pd.DataFrame.from_dict({i: self.row(i) for i in rest}, orient="index", columns=list(EDIT_COLUMNS)))
+        return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+    def apply(self, entry_id, changes: dict):
+        """Records one editor row's cumulative changes (`edited_rows` entry)."""
+        self.apply_rows({entry_id: changes})
+
+    def apply_rows(self, changes_by_id: dict):
+        """
+        Records a batch of `edited_rows` entries (keyed by entry id): the
+        touched rows are resolved with one take and their new values written
+        as whole columns. Counters move by the touched rows only.
+        """
+        selects = {i: c["Select"] for i, c in changes_by_id.items() if "Select" in c}
+        values = {
+            i: {col: val for col, val in c.items() if col in EDIT_COLUMNS}
+            for i, c in changes_by_id.items()
+        }
+        values = {i: v for i, v in values.items() if v}
+
+        if selects:
+            current = self._rows(selects)
+            for entry_id, selected in selects.items():
+                was_deleted = entry_id in self.deleted
+                if selected and not was_deleted:
+                    self.deleted[entry_id] = current.loc[entry_id].to_dict()
+                    if entry_id in self.edits:
+                        self._updated -= 1
+                elif not selected and was_deleted:
+                    del self.deleted[entry_id]
+                    if entry_id in self.edits:
+                        self._updated += 1
+
+        if values:
+            batch = pd.DataFrame.from_dict(values, orient="index").reindex(columns=list(EDIT_COLUMNS))
+            given = pd.DataFrame(
+                {col: [col in values[i] for i in batch.index] for col in EDIT_COLUMNS}, index=batch.index
+            )
+            batch = batch.astype(object).where(given, self._rows(values).astype(object))
+            batch["recorded_at"] = pd.to_datetime(batch["recorded_at"], utc=True, format="mixed")
+            self._updated += sum(1 for i in values if i not in self.edits and i not in self.deleted)
+            self.edits.update(batch.to_dict("index"))
+
+    @property
+    def counts(self) -> dict:
+        """Pending deletes/updates/inserts, kept incrementally (no rescan)."""
+        return {"del": len(self.deleted), "upd": self._updated, "add": len(self.added)}
+
+    def pending(self) -> pd.DataFrame:
+        """Only the rows with pending changes, built from the overlay in O(edits)."""
+        rows = [{"Change Log": "🔴", **snap} for snap in self.deleted.values()]
+        rows += [{"Change Log": "🟡", **row} for i, row in self.edits.items() if i not in self.deleted]
+        rows += [{"Change Log": "🟢", "value": r.get("value"), "recorded_at": r.get("recorded_at")} for r in self.added if r.get("value") is not None]
+        frame = pd.DataFrame(rows, columns=["Change Log", *EDIT_COLUMNS])
+        frame["recorded_at"] = pd.to_datetime(frame["recorded_at"], utc=True, format="mixed")
+        return frame
+
+    def view(self) -> pd.DataFrame:
+        """Visible rows: base with the overlay applied, plus touched rows outside it."""
+        cols = ["id", *EDIT_COLUMNS]
+        frame = self.base[cols] if not self.base.empty else pd.DataFrame(columns=cols)
+        outside = [i for i in {**self.deleted, **self.edits} if self._position(i) is None]
+        if outside:
+            frame = pd.concat([frame, pd.DataFrame([{"id": i, **self.row(i)} for i in outside])], ignore_index=True)
+        ids = frame["id"]
+        edited = ids.isin(self.edits.keys())
+        if edited.any():
+            frame = frame.copy()
+            for col in EDIT_COLUMNS:
+                frame.loc[edited, col] = [self.edits[i][col] for i in ids[edited]]
+        deleted = ids.isin(self.deleted.keys())
+        return frame.assign(**{
+            "Change Log": np.where(deleted, "🔴", np.where(edited, "🟡", "")),
+            "Select": deleted,
+        })
 
 def get_pill_range(selection, abs_min, abs_max):
     """Calculates start/end dates based on pill selection."""
@@ -20,12 +151,23 @@ def get_pill_range(selection, abs_min, abs_max):
         return abs_min, abs_max
     return None, None 
 
-def get_date_bounds(dfe, mid):
-    """Calculates boundaries and ensures baseline state exists."""
-    # Ensure datetime conversion is robust
-    dfe['recorded_at'] = pd.to_datetime(dfe['recorded_at'], utc=True)
-    abs_min = dfe['recorded_at'].min().date()
-    abs_max = dfe['recorded_at'].max().date()
+def _utc_date(raw):
+    """UTC calendar date of a PostgREST timestamp (stdlib parse; no pandas per rerun)."""
+    try:
+        ts = dt.datetime.fromisoformat(raw)
+    except (TypeError, ValueError):
+        return pd.to_datetime(raw, utc=True).date()
+    return (ts.astimezone(dt.timezone.utc) if ts.tzinfo else ts).date()
+
+def get_date_bounds(mid):
+    """
+    Oldest/newest entry dates (queried, not derived from a full load) and
+    ensures baseline state exists. Returns (None, None) when there is no data.
+    """
+    bounds = models.get_entry_bounds(mid)
+    if not bounds or bounds[0] is None:
+        return None, None
+    abs_min, abs_max = _utc_date(bounds[0]), _utc_date(bounds[1])
     
     prev_date_key = f"prev_date_{mid}"
     if prev_date_key not in st.session_state:
@@ -58,11 +200,9 @@ def is_date_conflict(mid, state_key):
     return False
 
 def has_unsaved_changes(state_key):
-    """Checks for non-empty change log strings in the draft."""
-    if state_key in st.session_state:
-        log = st.session_state[state_key].get("Change Log", pd.Series(dtype=str)).fillna('')
-        return (log != "").any()
-    return False
+    """Checks the draft overlay for pending edits, deletions or added rows."""
+    draft = st.session_state.get(state_key)
+    return isinstance(draft, EntryDraft) and draft.dirty
 
 def revert_date_range(mid):
     """Snaps UI pickers back to the last safe baseline saved in session state."""
@@ -73,50 +213,29 @@ def revert_date_range(mid):
     if prev_pill_key in st.session_state:
         st.session_state[f"pill_{mid}"] = st.session_state[prev_pill_key]
 
-def sync_editor_changes(state_key, editor_key, view_df_indices):
-    """Marks rows in the master draft based on data_editor interaction."""
+def sync_editor_changes(state_key, editor_key, view_ids):
+    """Records data_editor interaction in the draft overlay (rows are mapped to entry ids)."""
     if editor_key not in st.session_state:
         return
         
     state = st.session_state[editor_key]
-    df = st.session_state[state_key]
+    draft = st.session_state[state_key]
     
-    for idx, changes in state.get("edited_rows", {}).items():
-        actual_idx = view_df_indices[idx]
-        for col, val in changes.items():
-            df.at[actual_idx, col] = val
-            # Update visual status markers
-            if col == "Select":
-                df.at[actual_idx, "Change Log"] = "🔴" if val else ""
-            elif "🔴" not in str(df.at[actual_idx, "Change Log"]):
-                df.at[actual_idx, "Change Log"] = "🟡"
+    draft.apply_rows({view_ids[idx]: changes for idx, changes in state.get("edited_rows", {}).items()})
+    draft.added = list(state.get("added_rows", []))
 
 def get_change_summary(state_key, editor_key):
     """Counts pending updates for the confirmation dialog."""
-    df = st.session_state[state_key]
-    state = st.session_state.get(editor_key, {})
-    return {
-        "del": len(df[df["Change Log"] == "🔴"]),
-        "upd": len(df[df["Change Log"] == "🟡"]),
-        "add": len(state.get("added_rows", []))
-    }
+    return st.session_state[state_key].counts
 
 def reset_editor_state(state_key, mid=None):
     """
-    Clears draft and baseline without deleting keys to maintain state stability.
-    Ensures that columns remain present to avoid KeyErrors in visualizations.
+    Discards pending edits in O(edits): only the overlay is cleared; the next
+    render points the draft at the freshly loaded window.
     """
-    # Define the exact columns your application logic expects
-    standard_cols = ["id", "recorded_at", "value", "Change Log", "Select"]
-    
-    if state_key in st.session_state:
-        # Re-initialize as an empty dataframe with the correct columns
-        st.session_state[state_key] = pd.DataFrame(columns=standard_cols)
-    
-    saved_key = f"saved_data_{mid}"
-    if saved_key in st.session_state:
-        # Ensure the visualization data source also keeps its columns
-        st.session_state[saved_key] = pd.DataFrame(columns=standard_cols)
+    draft = st.session_state.get(state_key)
+    if isinstance(draft, EntryDraft):
+        draft.clear()
 
     if mid:
         # Synchronize baselines so the conflict warning doesn't immediately re-trigger
@@ -126,49 +245,60 @@ def reset_editor_state(state_key, mid=None):
         )
         st.session_state[f"prev_pill_{mid}"] = st.session_state.get(f"pill_{mid}")
 
+def _db_value(raw_val):
+    if raw_val is None or (isinstance(raw_val, float) and pd.isna(raw_val)) or (isinstance(raw_val, str) and raw_val.strip() == ""):
+        return None  # "not measured"
+    return float(raw_val)
+
+def build_entry_diff(draft):
+    """
+    Computes the pending edit diff from the overlay in O(edits): ids to delete,
+    update payloads (skipping rows that are also deleted) and insert payloads.
+    """
+    deletes = [str(i) for i in draft.deleted]
+    updates = [
+        {
+            "id": str(entry_id),
+            "value": _db_value(row.get("value")),
+            "recorded_at": pd.to_datetime(row["recorded_at"]).isoformat(),
+        }
+        for entry_id, row in draft.edits.items()
+        if entry_id not in draft.deleted
+    ]
+    inserts = [
+        {
+            "value": float(row["value"]),
+            "recorded_at": pd.to_datetime(row.get("recorded_at", dt.datetime.now())).isoformat(),
+        }
+        for row in draft.added
+        if row.get("value") is not None
+    ]
+    return deletes, updates, inserts
+
+def load_window(mid, state_key, dfe, window):
+    """
+    Points the draft at the freshly loaded window (a reference, not a copy).
+    While edits are pending the base stays put so editor rows keep their ids.
+    """
+    draft = st.session_state.get(state_key)
+    if not isinstance(draft, EntryDraft):
+        st.session_state[state_key] = EntryDraft(dfe, window)
+    elif not draft.dirty or draft.window != window:
+        draft.rebase(dfe, window)
+
 def execute_save(mid, state_key, editor_key):
-    """Commits all pending edits to the database and refreshes state."""
-    df = st.session_state[state_key]
-    state = st.session_state.get(editor_key, {})
-    
-    # 1. Process Deletions (using the markers defined in sync_editor_changes)
-    for _, row in df[df["Change Log"] == "🔴"].iterrows():
-        if pd.notna(row.get("id")): 
-            models.delete_entry(row["id"])
-            
-    # 2. Process Updates
-    for _, row in df[df["Change Log"] == "🟡"].iterrows():
-        if pd.notna(row.get("id")):
-            raw_val = row.get("value")
-            if raw_val is None or (isinstance(raw_val, float) and pd.isna(raw_val)) or (isinstance(raw_val, str) and raw_val.strip() == ""):
-                db_val = None  # "not measured"
-            else:
-                db_val = float(raw_val)
-            models.update_entry(row["id"], {
-                "value": db_val,
-                "recorded_at": pd.to_datetime(row["recorded_at"]).isoformat()
-            })
-            
-    # 3. Process New Rows
-    for row in state.get("added_rows", []):
-        if row.get("value") is not None:
-            models.create_entry({
-                "value": float(row["value"]), 
-                "recorded_at": pd.to_datetime(row.get("recorded_at", dt.datetime.now())).isoformat(), 
-                "metric_id": mid
-            })
-    
-    # --- FIX: RE-FETCH FRESH DATA ---
-    # We clear the cache and fetch the updated dataset from the DB
-    # Assuming your metric object is available or you just need the ID to re-fetch
-    # If collect_data requires the full 'selected_metric' dict, you may need to pass it in
-    fresh_dfe, _, _ = utils.collect_data({"id": mid}) 
+    """
+    Commits all pending edits in one batch. The save evicts the cached window,
+    so the rerun reloads it through `load_window`; only the overlay is cleared here.
+    """
+    draft = st.session_state[state_key]
+
+    deletes, updates, inserts = build_entry_diff(draft)
+    result = models.commit_entry_edits(mid, deletes, updates, inserts)
+    if result is None:
+        return  # Error already shown; the draft keeps its pending edits
 
-    # 4. Clean up and update state with fresh data instead of empty DFs
     reset_editor_state(state_key, mid)
-    if fresh_dfe is not None:
-        st.session_state[f"saved_data_{mid}"] = fresh_dfe.copy()
-        st.session_state[state_key] = fresh_dfe.assign(**{"Change Log": "", "Select": False})
 
     utils.finalize_action("Changes Saved Successfully!")
     st.rerun()
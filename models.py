@@ -1,31 +1,684 @@
-from supabase_config import sb
+from supabase_config import sb, get_async_http_client
 import streamlit as st
+import asyncio
+import contextvars
+import functools
+import inspect
+import itertools
 import json
+import logging
 import os
-from datetime import datetime
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import random
+import httpx
 import pandas as pd
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
+logger = logging.getLogger(__name__)
+
+
+# --- QUERY EXECUTION POLICY ---
+# Every query runs under an ExecutionPolicy: a per-attempt timeout (so a hung
+# backend never pins the Streamlit thread), jittered exponential retries for
+# idempotent (GET/HEAD) requests on transient errors, and a process-wide
+# circuit breaker that fails fast while the backend is degraded.
+
+@dataclass(frozen=True)
+class ExecutionPolicy:
+    timeout: float = 10.0  # Seconds per attempt
+    retries: int = 2  # Extra attempts; idempotent requests only
+    backoff_base: float = 0.2
+    backoff_max: float = 2.0
+
+DEFAULT_POLICY = ExecutionPolicy()
+BULK_POLICY = ExecutionPolicy(timeout=60.0)  # Batched editor saves and the import RPC
+
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive transient failures before opening
+BREAKER_COOLDOWN = 15.0  # Seconds to fail fast before letting one probe through
+EXECUTE_WORKERS = 16
+
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504, 520, 522, 524}
+_TRANSIENT_PGRST = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}  # Pool/connection errors
+
+class BackendUnavailable(Exception):
+    """Raised without a round trip while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """closed -> open after `threshold` transient failures -> half-open probe after `cooldown`."""
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+class _ExecutionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.calls = self.errors = self.retries = self.timeouts = self.short_circuits = 0
+            self.latency_total = self.latency_max = 0.0
+
+    def record(self, latency: float, error: bool = False, timeout: bool = False):
+        with self._lock:
+            self.calls += 1
+            self.errors += error
+            self.timeouts += timeout
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "timeouts": self.timeouts,
+                "short_circuits": self.short_circuits,
+                "latency_avg_ms": 1000 * self.latency_total / self.calls if self.calls else 0.0,
+                "latency_max_ms": 1000 * self.latency_max,
+            }
+
+_BREAKER = CircuitBreaker()
+_EXEC_STATS = _ExecutionStats()
+_EXECUTE_POOL = ThreadPoolExecutor(max_workers=EXECUTE_WORKERS, thread_name_prefix="db-execute")
+
+def execution_stats() -> dict:
+    """Process-wide query counters plus the circuit breaker state."""
+    return {**_EXEC_STATS.snapshot(), "breaker": _BREAKER.state}
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, (TimeoutError, httpx.TransportError)):
+        return True
+    if isinstance(error, APIError):
+        return error.code in _TRANSIENT_PGRST or str(error.code).isdigit() and int(error.code) in _TRANSIENT_STATUS
+    return False
+
+class _TimedSession:
+    """
+    Sends one query's requests with the policy's timeout. postgrest has no
+    per-request timeout, and without one a timed-out attempt keeps its worker
+    busy until the pool-wide HTTP timeout.
+    """
+
+    def __init__(self, session, timeout: float):
+        self._session = session
+        self._timeout = httpx.Timeout(timeout)
+
+    def request(self, *args, **kwargs):
+        return self._session.request(*args, timeout=self._timeout, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+def _prepare(query_func, policy: ExecutionPolicy) -> int:
+    """
+    Disables postgrest's built-in retry (it sleeps up to 30s), applies the
+    policy timeout to the HTTP request and returns the attempt budget. Only
+    GET/HEAD are retried: a write that timed out may already be committed.
+    """
+    request = getattr(query_func, "request", None)
+    if hasattr(request, "retry_enabled"):
+        request.retry_enabled = False
+    if hasattr(request, "session"):
+        session = request.session
+        request.session = _TimedSession(getattr(session, "_session", session), policy.timeout)
+    idempotent = getattr(request, "http_method", None) in ("GET", "HEAD")
+    return 1 + (policy.retries if idempotent else 0)
+
+def _before_attempt():
+    if not _BREAKER.allow():
+        _EXEC_STATS.count("short_circuits")
+        raise BackendUnavailable(f"backend unavailable, retrying in {_BREAKER.retry_in():.0f}s")
+
+def _after_failure(error: Exception, latency: float, attempt: int, attempts: int, policy: ExecutionPolicy) -> float | None:
+    """Records a failed attempt; returns the backoff before the next one, or None to give up."""
+    transient = _is_transient(error)
+    _EXEC_STATS.record(latency, error=True, timeout=isinstance(error, TimeoutError))
+    if transient:
+        _BREAKER.record_failure()
+    else:
+        _BREAKER.record_success()  # The backend answered; the request itself was bad
+    if not transient or attempt + 1 >= attempts:
+        return None
+    _EXEC_STATS.count("retries")
+    return random.uniform(0, min(policy.backoff_max, policy.backoff_base * 2 ** attempt))
+
+def _execute(query_func, policy: ExecutionPolicy = DEFAULT_POLICY):
+    """Runs `query_func.execute()` under `policy`; raises on final failure."""
+    attempts = _prepare(query_func, policy)
+    for attempt in range(attempts):
+        _before_attempt()
+        start = time.perf_counter()
+        try:
+            result = _EXECUTE_POOL.submit(query_func.execute).result(timeout=policy.timeout)
+        except Exception as e:
+            _trace(query_func, time.perf_counter() - start, error=e)
+            delay = _after_failure(e, time.perf_counter() - start, attempt, attempts, policy)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            continue
+        _EXEC_STATS.record(time.perf_counter() - start)
+        _BREAKER.record_success()
+        _trace(query_func, time.perf_counter() - start, result)
+        return result
+
+# --- QUERY TRACING ---
+# While a QueryTrace is active for the session (debug panel on, or a JSONL log
+# configured), every attempt is recorded with its table, operation, filters,
+# row count, payload sizes and wall time, grouped per Streamlit rerun. Slow
+# queries are logged regardless.
+
+SLOW_QUERY_MS = 500
+N_PLUS_ONE_THRESHOLD = 5  # Same table/operation this many times in one rerun
+QUERY_TRACE_KEY = "query_trace"
+QUERY_LOG_ENV = "QUANTIFI_QUERY_LOG"  # Or `QUERY_LOG_PATH` in Streamlit secrets
+
+_OPERATIONS = {"GET": "select", "HEAD": "count", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+_NON_FILTER_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+@dataclass
+class QueryRecord:
+    table: str
+    operation: str
+    filters: str
+    rows: int | None
+    request_bytes: int
+    response_bytes: int
+    ms: float
+    error: str | None = None
+
+class QueryTrace:
+    """Queries issued during one Streamlit rerun."""
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self.records: list[QueryRecord] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: QueryRecord):
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> list[dict]:
+        """One row per (table, operation), slowest first; flags likely N+1 loops."""
+        groups: dict = {}
+        for r in list(self.records):
+            g = groups.setdefault((r.table, r.operation), {
+                "table": r.table, "operation": r.operation, "calls": 0, "ms": 0.0, "rows": 0, "bytes": 0, "errors": 0,
+            })
+            g["calls"] += 1
+            g["ms"] += r.ms
+            g["rows"] += r.rows or 0
+            g["bytes"] += r.request_bytes + r.response_bytes
+            g["errors"] += r.error is not None
+        for g in groups.values():
+            g["n_plus_one"] = g["calls"] >= N_PLUS_ONE_THRESHOLD
+        return sorted(groups.values(), key=lambda g: g["ms"], reverse=True)
+
+    def slow_queries(self) -> list[QueryRecord]:
+        return [r for r in list(self.records) if r.ms >= SLOW_QUERY_MS]
+
+    def to_jsonl(self) -> str:
+        started = self.started_at.isoformat()
+        return "".join(json.dumps({"rerun_started_at": started, **r.__dict__}) + "\n" for r in list(self.records))
+
+def _payload_bytes(value) -> int:
+    return len(json.dumps(value, default=str)) if value is not None else 0
+
+def _query_record(query_func, latency: float, result=None, error=None, sizes: bool = True) -> QueryRecord:
+    request = getattr(query_func, "request", None)
+    path = str(getattr(request, "path", "") or "")
+    method = getattr(request, "http_method", None)
+    if "/rpc/" in path:
+        table, operation = "rpc/" + path.rsplit("/", 1)[-1], "rpc"
+    else:
+        table = path.rsplit("/", 1)[-1] if path else type(query_func).__name__
+        operation = _OPERATIONS.get(method, "unknown") if isinstance(method, str) else "unknown"
+        prefer = str(getattr(request, "headers", {}).get("Prefer", ""))
+        if operation == "insert" and "resolution=" in prefer:
+            operation = "upsert"
+    params = getattr(request, "params", None)
+    filters = "&".join(f"{k}={v}" for k, v in params.multi_items() if k not in _NON_FILTER_PARAMS) if hasattr(params, "multi_items") else ""
+    data = getattr(result, "data", None)
+    return QueryRecord(
+        table=table,
+        operation=operation,
+        filters=filters,
+        rows=len(data) if isinstance(data, list) else (1 if isinstance(data, dict) else None),
+        request_bytes=_payload_bytes(getattr(request, "json", None)) if sizes else 0,
+        response_bytes=_payload_bytes(data) if sizes else 0,
+        ms=round(latency * 1000, 2),
+        error=str(error) if error is not None else None,
+    )
+
+def _current_trace():
+    context = _ASYNC_CONTEXT.get(None)
+    if context is not None:
+        return context.trace
+    try:
+        return st.session_state.get(QUERY_TRACE_KEY)
+    except Exception:
+        return None  # No Streamlit session (scripts, tests)
+
+def _trace(query_func, latency: float, result=None, error=None):
+    trace = _current_trace()
+    slow = latency * 1000 >= SLOW_QUERY_MS
+    if trace is None and not slow:
+        return
+    record = _query_record(query_func, latency, result, error, sizes=trace is not None)
+    if slow:
+        logger.warning("Slow query (%.0f ms): %s %s %s", record.ms, record.operation, record.table, record.filters)
+    if trace is not None:
+        trace.add(record)
+
+def query_log_path():
+    """Local JSONL file for query traces, if configured."""
+    path = os.environ.get(QUERY_LOG_ENV)
+    if not path:
+        try:
+            path = st.secrets.get("QUERY_LOG_PATH")
+        except Exception:
+            path = None  # No secrets file
+    return path or None
+
+def begin_query_trace(enabled: bool):
+    """Call at the top of each rerun: starts a fresh QueryTrace, or stops tracing."""
+    if enabled or query_log_path():
+        st.session_state[QUERY_TRACE_KEY] = QueryTrace()
+    else:
+        st.session_state.pop(QUERY_TRACE_KEY, None)
+
+def end_query_trace():
+    """Returns this rerun's QueryTrace (None when off) after appending it to the JSONL log."""
+    trace = st.session_state.get(QUERY_TRACE_KEY)
+    path = query_log_path()
+    if trace is not None and trace.records and path:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(trace.to_jsonl())
+        except OSError as e:
+            logger.warning("Could not write query log %s: %s", path, e)
+    return trace
 
 # --- HELPER ERROR WRAPPER ---
-def _safe_execute(query_func, error_message="Database operation failed"):
+def _safe_execute(query_func, error_message="Database operation failed", policy: ExecutionPolicy = DEFAULT_POLICY):
     """Internal helper to catch Supabase/Network errors."""
     try:
-        return query_func.execute()
+        return _execute(query_func, policy)
     except Exception as e:
         # Ignore JWT/Auth errors during initial startup
         if "jwt" not in str(e).lower():
             st.error(f"⚠️ {error_message}: {str(e)}")
         return None
 
+# --- PER-USER QUERY CACHE ---
+# st.cache_data is process-wide and keyed only by arguments, so clearing it after
+# one user's write evicted every user's queries. Cached reads here are keyed by
+# user and tagged with the tables (and metric) they read; writes call
+# `invalidate` for exactly what they touched.
+
+_MISS = object()
+
+@dataclass
+class _CacheEntry:
+    payload: bytes  # pickled, so callers always get a private copy
+    expires_at: float
+    tables: frozenset
+    metric_id: str | None
+
+CACHE_MAX_ENTRIES_PER_USER = 128
+CACHE_MAX_BYTES_PER_USER = 16 * 1024 * 1024
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+class QueryCache:
+    """
+    Thread-safe TTL cache: user id -> LRU of {(function, args): _CacheEntry}.
+    Each user's bucket is bounded by entry count and pickled bytes; above the
+    global byte budget whole buckets are dropped, least recently active first.
+    """
+
+    def __init__(
+        self,
+        max_entries_per_user: int = CACHE_MAX_ENTRIES_PER_USER,
+        max_bytes_per_user: int = CACHE_MAX_BYTES_PER_USER,
+        max_bytes: int = CACHE_MAX_BYTES,
+    ):
+        self.max_entries_per_user = max_entries_per_user
+        self.max_bytes_per_user = max_bytes_per_user
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._users: OrderedDict = OrderedDict()  # user id -> OrderedDict(key -> entry)
+        self._user_bytes: dict = {}
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _drop(self, user_id, key):
+        entry = self._users[user_id].pop(key)
+        size = len(entry.payload)
+        self._user_bytes[user_id] -= size
+        self._bytes -= size
+
+    def _drop_user(self, user_id) -> int:
+        bucket = self._users.pop(user_id, {})
+        self._bytes -= self._user_bytes.pop(user_id, 0)
+        return len(bucket)
+
+    def get(self, user_id, key):
+        with self._lock:
+            bucket = self._users.get(user_id, {})
+            entry = bucket.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                self._drop(user_id, key)
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return _MISS
+            bucket.move_to_end(key)
+            self._users.move_to_end(user_id)
+            self._counters["hits"] += 1
+            payload = entry.payload
+        return pickle.loads(payload)
+
+    def put(self, user_id, key, value, ttl: float, tables: frozenset, metric_id=None):
+        entry = _CacheEntry(pickle.dumps(value), time.monotonic() + ttl, tables, metric_id)
+        size = len(entry.payload)
+        if size > self.max_bytes_per_user:
+            return  # Would evict the whole bucket for a single result
+        with self._lock:
+            bucket = self._users.setdefault(user_id, OrderedDict())
+            self._user_bytes.setdefault(user_id, 0)
+            if key in bucket:
+                self._drop(user_id, key)
+            bucket[key] = entry
+            self._user_bytes[user_id] += size
+            self._bytes += size
+            self._users.move_to_end(user_id)
+
+            while len(bucket) > self.max_entries_per_user or self._user_bytes[user_id] > self.max_bytes_per_user:
+                self._drop(user_id, next(iter(bucket)))
+                self._counters["evictions"] += 1
+            while self._bytes > self.max_bytes and len(self._users) > 1:
+                oldest = next(iter(self._users))
+                if oldest == user_id:
+                    break
+                self._counters["evictions"] += self._drop_user(oldest)
+
+    def update(self, user_id, key, updater) -> bool:
+        """
+        Write-through: replaces a live entry with `updater(value)`, keeping its
+        expiry and tags. `updater` may return _MISS to drop the entry instead.
+        Returns True when the entry now holds the patched value.
+        """
+        with self._lock:
+            entry = self._users.get(user_id, {}).get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                return False
+            value = updater(pickle.loads(entry.payload))
+            if value is _MISS:
+                self._drop(user_id, key)
+                return False
+            self.put(user_id, key, value, entry.expires_at - time.monotonic(), entry.tables, entry.metric_id)
+            return key in self._users.get(user_id, {})
+
+    def _evict(self, user_id, predicate) -> int:
+        with self._lock:
+            bucket = self._users.get(user_id, {})
+            stale = [key for key, entry in bucket.items() if predicate(key, entry)]
+            for key in stale:
+                self._drop(user_id, key)
+        return len(stale)
+
+    def invalidate(self, user_id, table: str, metric_id=None, keep=()) -> int:
+        """
+        Evicts the user's cached reads of `table`. With `metric_id`, reads scoped
+        to other metrics survive; table-wide reads are always evicted. Keys in
+        `keep` (already patched write-through) survive too.
+        """
+        return self._evict(
+            user_id,
+            lambda key, e: (
+                key not in keep
+                and table in e.tables
+                and (metric_id is None or e.metric_id in (None, metric_id))
+            ),
+        )
+
+    def invalidate_function(self, user_id, name: str) -> int:
+        return self._evict(user_id, lambda key, _e: key[0] == name)
+
+    def invalidate_user(self, user_id) -> int:
+        with self._lock:
+            return self._drop_user(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._user_bytes.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """Counters plus current size, e.g. for an admin/debug panel."""
+        with self._lock:
+            return {
+                **self._counters,
+                "users": len(self._users),
+                "entries": sum(len(bucket) for bucket in self._users.values()),
+                "bytes": self._bytes,
+            }
+
+_QUERY_CACHE = QueryCache()
+
+def _user_key(user):
+    """Accepts a Supabase user object or a plain id."""
+    return getattr(user, "id", user)
+
+def _current_user_id():
+    try:
+        return _user_key(st.session_state.get("user"))
+    except Exception:
+        return None  # No Streamlit session (scripts, tests)
+
+def invalidate(user, table: str, metric_id=None) -> int:
+    """Evicts `user`'s cached reads of `table` (optionally only for `metric_id`)."""
+    if table == "entries":
+        _entries_changed(_user_key(user))
+    return _QUERY_CACHE.invalidate(_user_key(user), table, metric_id)
+
+def cache_stats() -> dict:
+    """Process-wide hit/miss/eviction counters and memory use of the query cache."""
+    return _QUERY_CACHE.stats()
+
+def invalidate_user(user) -> int:
+    """
+    Drops every cached read for `user`, e.g. on sign-in/out or after a restore.
+    Entry snapshots are kept but re-polled (deltas are cheaper than a reload).
+    """
+    _entries_changed(_user_key(user))
+    return _QUERY_CACHE.invalidate_user(_user_key(user))
+
+def invalidate_all():
+    """Drops every cached read and re-polls every entry snapshot."""
+    _QUERY_CACHE.clear()
+    with _SNAPSHOT_LOCK:
+        for snap in _ENTRY_SNAPSHOTS.values():
+            snap.dirty = True
+
+# --- PUSH INVALIDATION ---
+# When change_listener.py is connected, remote writes arrive as notifications,
+# so cached reads can live much longer than their polling TTLs.
+
+PUSH_CACHE_TTL = 3600
+ECHO_WINDOW = 5  # Seconds a local write waits for its own notification
+
+_push_invalidation = False
+_echo_tokens: dict = {}  # (user_id, table, metric_id) -> [expiry, ...]
+_ECHO_LOCK = threading.Lock()
+
+def set_push_invalidation(active: bool):
+    """
+    Called by the listener on (dis)connect. Either transition drops all cached
+    reads: notifications may have been missed while nothing was listening.
+    """
+    global _push_invalidation
+    _push_invalidation = active
+    invalidate_all()
+
+def push_invalidation_active() -> bool:
+    return _push_invalidation
+
+def _effective_ttl(ttl: float) -> float:
+    return max(ttl, PUSH_CACHE_TTL) if _push_invalidation else ttl
+
+def _change_key(table: str, row: dict):
+    """Metric a change is scoped to; mirrors change_notification_key() in SQL."""
+    if table == "entries":
+        return row.get("metric_id")
+    if table == "metrics":
+        return row.get("id")
+    return None
+
+def _expect_echo(user_id, table: str, metric_id):
+    """A write-through already patched the cache: skip its own notification."""
+    if not _push_invalidation:
+        return
+    with _ECHO_LOCK:
+        _echo_tokens.setdefault((user_id, table, metric_id), []).append(time.monotonic() + ECHO_WINDOW)
+
+def apply_remote_change(table: str, user_id, metric_id=None) -> bool:
+    """
+    Handles one change notification. Returns False when it was the echo of a
+    write-through from this process (the cache already holds the new row).
+    """
+    key = (user_id, table, metric_id)
+    now = time.monotonic()
+    with _ECHO_LOCK:
+        live = [t for t in _echo_tokens.pop(key, []) if t > now]
+        if live:
+            if len(live) > 1:
+                _echo_tokens[key] = live[1:]
+            return False
+    invalidate(user_id, table, metric_id)
+    return True
+
+@contextmanager
+def _invalidating(*tables: str, metric_id=None):
+    """Wraps a write; afterwards evicts the current user's reads of `tables`."""
+    try:
+        yield
+    finally:
+        user_id = _current_user_id()
+        for table in tables:
+            _QUERY_CACHE.invalidate(user_id, table, metric_id)
+        if "entries" in tables:
+            _entries_changed(user_id)
+
+def cached(tables, ttl: float, metric_arg: str | None = None):
+    """
+    Per-user replacement for st.cache_data. `tables` names what the function
+    reads (used for invalidation); `metric_arg` names the argument that scopes
+    the result to one metric. None results (failed fetches) are not cached.
+    `func.clear()` evicts this function for the current user only;
+    `func.patch(updater, *args)` rewrites one cached result in place.
+    """
+    tables = frozenset([tables] if isinstance(tables, str) else tables)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = func.__qualname__
+
+        def _key(bound):
+            bound.apply_defaults()
+            return (name, tuple(bound.arguments.items()))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            key = _key(bound)
+            user_id = _current_user_id()
+            value = _QUERY_CACHE.get(user_id, key)
+            if value is not _MISS:
+                return value
+            value = func(*args, **kwargs)
+            if value is not None:
+                metric_id = bound.arguments.get(metric_arg) if metric_arg else None
+                _QUERY_CACHE.put(user_id, key, value, _effective_ttl(ttl), tables, metric_id)
+            return value
+
+        def patch(updater, *args, **kwargs):
+            key = _key(signature.bind(*args, **kwargs))
+            return key if _QUERY_CACHE.update(_current_user_id(), key, updater) else None
+
+        wrapper.clear = lambda: _QUERY_CACHE.invalidate_function(_current_user_id(), name)
+        wrapper.patch = patch
+        wrapper.cache_spec = (name, signature, tables, ttl, metric_arg)
+        return wrapper
+
+    return decorator
+
 # --- READ OPERATIONS ---
 
-@st.cache_data(ttl=60)
+@cached("categories", ttl=60)
 def get_categories():
     """Fetches all categories for the authenticated user."""
     res = _safe_execute(sb.table("categories").select("*"), "Failed to fetch categories")
     return res.data if res else []
 
-@st.cache_data(ttl=60)
+@cached("metrics", ttl=60)
 def get_metrics(include_archived=False):
     """Fetches metrics, filtering archived ones by default for speed."""
     query = sb.table("metrics").select("*")
@@ -34,7 +687,7 @@ def get_metrics(include_archived=False):
     res = _safe_execute(query, "Failed to fetch metrics")
     return res.data if res else []
 
-@st.cache_data(ttl=60)
+@cached(("change_events", "categories"), ttl=60)
 def get_change_events(limit: int = 200):
     """
     Fetches lifestyle change events (with category label when available),
@@ -49,13 +702,335 @@ def get_change_events(limit: int = 200):
     )
     return res.data if res else []
 
+ENTRY_PAGE_SIZE = 1000  # Matches the default PostgREST max-rows cap
+
+def _keyset_filter(last_row: dict, descending: bool = False, order_column: str = "recorded_at", id_column: str = "id") -> str:
+    """
+    PostgREST `or` filter selecting rows strictly after `last_row` in
+    (recorded_at, id) order. Values are quoted so timestamps are safe.
+    """
+    op = "lt" if descending else "gt"
+    ts = last_row[order_column]
+    row_id = last_row[id_column]
+    return f'{order_column}.{op}."{ts}",and({order_column}.eq."{ts}",{id_column}.{op}.{row_id})'
+
+def _with_keyset_columns(columns: str) -> str:
+    """Adds `recorded_at` and `id` to a projection, respecting nested embeds."""
+    if columns == "*":
+        return columns
+    cols, depth, current = [], 0, ""
+    for ch in columns:
+        if ch == "," and depth == 0:
+            cols.append(current.strip())
+            current = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current += ch
+    cols.append(current.strip())
+    cols = [c for c in cols if c]
+    for key in ("recorded_at", "id"):
+        if key not in cols:
+            cols.append(key)
+    return ", ".join(cols)
+
+def _iter_keyset(table: str, columns: str, filters: dict | None, page_size: int, descending: bool, start=None, end=None):
+    """
+    Generic (recorded_at, id) keyset pager shared by the streaming readers.
+    A failed page raises (after the policy's retries), so a partial stream is
+    never mistaken for the whole result.
+    """
+    columns = _with_keyset_columns(columns)
+    last_row = None
+    while True:
+        query = sb.table(table).select(columns)
+        for col, val in (filters or {}).items():
+            query = query.eq(col, val)
+        if start is not None:
+            query = query.gte("recorded_at", start)
+        if end is not None:
+            query = query.lt("recorded_at", end)
+        if last_row is not None:
+            query = query.or_(_keyset_filter(last_row, descending))
+        query = query.order("recorded_at", desc=descending).order("id", desc=descending).limit(page_size)
+
+        page = _execute(query).data or []
+        yield from page
+        if len(page) < page_size:
+            return
+        last_row = page[-1]
+
+def iter_entries(metric_id=None, columns: str = "*", page_size: int = ENTRY_PAGE_SIZE, descending: bool = False, start=None, end=None):
+    """
+    Streams entries page by page using a (recorded_at, id) keyset, so results
+    stay complete above the PostgREST row cap without holding everything at once.
+    `columns` is a PostgREST projection; `id` and `recorded_at` are always added.
+    `start` (inclusive) and `end` (exclusive) are ISO timestamps filtered in Postgres.
+    Raises when a page fails.
+    """
+    filters = {"metric_id": metric_id} if metric_id else None
+    return _iter_keyset("entries", columns, filters, page_size, descending, start, end)
+
+@cached("entries", ttl=30, metric_arg="metric_id")
+def get_entries_window(metric_id, start_date, end_date):
+    """
+    Entries of one metric recorded between two dates (inclusive), oldest first.
+    The range runs in Postgres, so the editor never loads the whole history.
+    Returns None (not cached) when a page fails.
+    """
+    start = datetime.combine(start_date, datetime.min.time()).isoformat()
+    end = datetime.combine(end_date + timedelta(days=1), datetime.min.time()).isoformat()
+    try:
+        return list(iter_entries(metric_id, start=start, end=end))
+    except Exception as e:
+        st.error(f"⚠️ Failed to fetch entries: {e}")
+        return None
+
+@cached("entries", ttl=60, metric_arg="metric_id")
+def get_entry_bounds(metric_id):
+    """
+    (oldest, newest) `recorded_at` of a metric as ISO strings, (None, None) when
+    it has no entries, or None on failure. Two indexed single-row reads.
+    """
+    bounds = []
+    for desc in (False, True):
+        res = _safe_execute(
+            sb.table("entries").select("recorded_at").eq("metric_id", metric_id).order("recorded_at", desc=desc).limit(1),
+            "Failed to fetch entry range",
+        )
+        if res is None:
+            return None
+        bounds.append(res.data[0]["recorded_at"] if res.data else None)
+    return tuple(bounds)
+
+def iter_change_events(columns: str = "*", page_size: int = ENTRY_PAGE_SIZE, descending: bool = False):
+    """Streams change events page by page, same keyset contract as `iter_entries`."""
+    return _iter_keyset("change_events", columns, None, page_size, descending)
+
 def get_entries(metric_id=None):
-    """Fetches data entries, optionally filtered by metric."""
-    query = sb.table("entries").select("*")
+    """
+    Fetches data entries (oldest first), optionally filtered by metric.
+    Per-metric reads are served from an incrementally synced snapshot; other
+    reads, or any read while delta sync is unavailable, page directly.
+    Returns None when the read fails.
+    """
     if metric_id:
-        query = query.eq("metric_id", metric_id)
-    res = _safe_execute(query, "Failed to fetch entries")
-    return res.data if res else []
+        rows = _take_prefetched(metric_id)
+        if rows is not None:
+            return rows
+    return _load_entries(metric_id)
+
+def _read_entries(metric_id=None):
+    """Snapshot or paged read of entries; raises on failure (safe off the script thread)."""
+    rows = _snapshot_entries(metric_id) if metric_id else None  # All-metric reads are not snapshotted
+    if rows is None:
+        return list(iter_entries(metric_id))
+    return rows
+
+def _load_entries(metric_id=None):
+    try:
+        return _read_entries(metric_id)
+    except Exception as e:
+        st.error(f"⚠️ Failed to fetch entries: {e}")
+        return None
+
+# --- INCREMENTAL ENTRY SYNC ---
+# Each (user, metric) pair read through `get_entries` keeps a process-local
+# snapshot. Refreshes fetch only the metric's rows whose `updated_at` moved past
+# the watermark, plus its `entry_tombstones` for deletes (migration 20261019),
+# so steady-state traffic follows new activity. Snapshots share one row budget.
+
+ENTRY_SYNC_INTERVAL = 10  # Seconds between delta polls without local writes
+ENTRY_SYNC_OVERLAP = timedelta(seconds=30)  # Re-reads rows whose transaction committed late
+ENTRY_TOMBSTONE_RETENTION = timedelta(days=29)  # Server keeps 30; older snapshots resync fully
+ENTRY_SNAPSHOT_MAX_ROWS = 200_000  # All snapshots together (~0.5 KB/row, within CACHE_MAX_BYTES)
+
+@dataclass
+class _EntrySnapshot:
+    rows: dict  # entry_id -> row
+    watermark: datetime | None = None  # Max `updated_at` seen
+    tombstone_watermark: datetime | None = None  # Max `deleted_at` seen
+    synced_at: float = 0.0  # time.monotonic() of the last successful sync
+    full_synced_at: datetime | None = None
+    dirty: bool = False
+
+_ENTRY_SNAPSHOTS: OrderedDict = OrderedDict()  # (user id, metric id) -> _EntrySnapshot, LRU order
+_SNAPSHOT_LOCK = threading.RLock()
+_delta_sync_supported = True  # Flipped off when `entries.updated_at` is missing
+_MISSING_SCHEMA_CODES = {"42703", "42P01", "PGRST204", "PGRST205"}  # Undefined column/table
+
+def _parse_watermark(value) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+def _fetch_changed(table: str, order_column: str, id_column: str, since: datetime | None, metric_id, page_size: int = ENTRY_PAGE_SIZE):
+    """
+    Pages one metric's rows with `order_column >= since` in (order_column, id)
+    order. Unlike the UI readers this raises, so a failed sync is never
+    mistaken for "nothing changed".
+    """
+    rows, last_row = [], None
+    while True:
+        query = sb.table(table).select("*").eq("metric_id", metric_id)
+        if since is not None:
+            query = query.gte(order_column, since.isoformat())
+        if last_row is not None:
+            query = query.or_(_keyset_filter(last_row, False, order_column, id_column))
+        page = _execute(query.order(order_column).order(id_column).limit(page_size)).data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        last_row = page[-1]
+
+def _max_watermark(current, rows, column):
+    stamps = [_parse_watermark(r.get(column)) for r in rows if r.get(column)]
+    return max([current, *stamps] if current else stamps, default=None)
+
+def _store_snapshot(key, snap):
+    """Stores `snap` as most recent; evicts least recently used snapshots over the row budget."""
+    with _SNAPSHOT_LOCK:
+        if len(snap.rows) > ENTRY_SNAPSHOT_MAX_ROWS:
+            _ENTRY_SNAPSHOTS.pop(key, None)  # A single metric above the budget is not kept
+            return
+        _ENTRY_SNAPSHOTS[key] = snap
+        _ENTRY_SNAPSHOTS.move_to_end(key)
+        total = sum(len(s.rows) for s in _ENTRY_SNAPSHOTS.values())
+        while total > ENTRY_SNAPSHOT_MAX_ROWS:
+            _, evicted = _ENTRY_SNAPSHOTS.popitem(last=False)
+            total -= len(evicted.rows)
+
+def sync_entries(metric_id, user_id=None):
+    """
+    Brings the (user, metric) entry snapshot up to date and returns it, or
+    None when delta sync is unavailable (e.g. migration not applied, network
+    error). Polls at most every ENTRY_SYNC_INTERVAL seconds unless a write
+    marked it dirty; with push invalidation active only notifications trigger a poll.
+    """
+    global _delta_sync_supported
+    if not _delta_sync_supported:
+        return None
+    user_id = _current_user_id() if user_id is None else user_id
+    key = (user_id, metric_id)
+    with _SNAPSHOT_LOCK:
+        snap = _ENTRY_SNAPSHOTS.get(key)
+        if snap is not None:
+            _ENTRY_SNAPSHOTS.move_to_end(key)
+            interval = PUSH_CACHE_TTL if _push_invalidation else ENTRY_SYNC_INTERVAL
+            if not snap.dirty and time.monotonic() - snap.synced_at < interval:
+                return snap
+            since = snap.watermark - ENTRY_SYNC_OVERLAP if snap.watermark else None
+            tomb_since = snap.tombstone_watermark - ENTRY_SYNC_OVERLAP if snap.tombstone_watermark else None
+            stale = datetime.now(timezone.utc) - snap.full_synced_at > ENTRY_TOMBSTONE_RETENTION
+
+    try:
+        if snap is None or stale:
+            rows = _fetch_changed("entries", "updated_at", "id", None, metric_id)
+            fresh = _EntrySnapshot({row["id"]: row for row in rows}, full_synced_at=datetime.now(timezone.utc))
+            fresh.watermark = _max_watermark(None, rows, "updated_at")
+            fresh.synced_at = time.monotonic()
+            _store_snapshot(key, fresh)
+            return fresh
+
+        with _SNAPSHOT_LOCK:
+            snap.dirty = False  # Writes landing from here on re-mark it
+        changed = _fetch_changed("entries", "updated_at", "id", since, metric_id)
+        deleted = _fetch_changed("entry_tombstones", "deleted_at", "entry_id", tomb_since, metric_id)
+    except Exception as e:
+        if isinstance(e, APIError) and e.code in _MISSING_SCHEMA_CODES:
+            _delta_sync_supported = False  # Migration not applied yet: stop probing
+        with _SNAPSHOT_LOCK:
+            _ENTRY_SNAPSHOTS.pop(key, None)
+        return None
+
+    with _SNAPSHOT_LOCK:
+        for row in changed:
+            snap.rows[row["id"]] = row
+        for tomb in deleted:
+            snap.rows.pop(tomb["entry_id"], None)
+        snap.watermark = _max_watermark(snap.watermark, changed, "updated_at")
+        snap.tombstone_watermark = _max_watermark(snap.tombstone_watermark, deleted, "deleted_at")
+        snap.synced_at = time.monotonic()
+    if changed:
+        _store_snapshot(key, snap)  # Re-checks the row budget
+    return snap
+
+def _snapshot_entries(metric_id):
+    """Copies of the metric's snapshot rows in (recorded_at, id) order, or None."""
+    snap = sync_entries(metric_id)
+    if snap is None:
+        return None
+    with _SNAPSHOT_LOCK:
+        rows = [dict(row) for row in snap.rows.values()]
+    rows.sort(key=lambda r: (r["recorded_at"], str(r["id"])))  # ISO strings sort chronologically
+    return rows
+
+def _entries_changed(user_id):
+    """Marks the user's snapshots for an immediate delta poll after a local write."""
+    with _SNAPSHOT_LOCK:
+        for (owner, _), snap in _ENTRY_SNAPSHOTS.items():
+            if owner == user_id:
+                snap.dirty = True
+    with _PREFETCH_LOCK:
+        for key in [k for k in _PREFETCHES if k[0] == user_id]:
+            del _PREFETCHES[key]
+
+# --- ENTRY PREFETCH ---
+# Record, Analytics and Edit all read the selected metric's entries. Pages call
+# `prefetch_entries` as soon as the metric is known; a worker thread loads the
+# rows while the rest of the page renders and `get_entries` shares the result
+# until it expires or a write/notification invalidates it.
+
+PREFETCH_WORKERS = 4
+
+@dataclass
+class _Prefetch:
+    future: object  # concurrent.futures.Future -> list of rows
+    started_at: float
+
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="entries-prefetch")
+_PREFETCHES: dict = {}  # (user_id, metric_id) -> _Prefetch
+_PREFETCH_LOCK = threading.Lock()
+
+def _prefetch_ttl() -> float:
+    return PUSH_CACHE_TTL if _push_invalidation else ENTRY_SYNC_INTERVAL
+
+def _run_in_script_context(ctx, func, *args):
+    """Workers borrow the page's script context so `sb` resolves to that user's client."""
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    try:
+        return func(*args)
+    finally:
+        add_script_run_ctx(thread, None)
+
+def prefetch_entries(metric_id) -> None:
+    """Starts loading `metric_id`'s entries in the background (no-op while a fresh load exists)."""
+    if not metric_id:
+        return
+    key = (_current_user_id(), metric_id)
+    with _PREFETCH_LOCK:
+        current = _PREFETCHES.get(key)
+        if current is not None and time.monotonic() - current.started_at < _prefetch_ttl():
+            return
+        now = time.monotonic()
+        for stale in [k for k, p in _PREFETCHES.items() if now - p.started_at >= _prefetch_ttl()]:
+            del _PREFETCHES[stale]
+        ctx = get_script_run_ctx(suppress_warning=True)
+        _PREFETCHES[key] = _Prefetch(_PREFETCH_POOL.submit(_run_in_script_context, ctx, _read_entries, metric_id), now)
+
+def _take_prefetched(metric_id):
+    """Copies of a fresh prefetched load (waiting for it if still running), or None."""
+    key = (_current_user_id(), metric_id)
+    with _PREFETCH_LOCK:
+        current = _PREFETCHES.get(key)
+    if current is None or time.monotonic() - current.started_at >= _prefetch_ttl():
+        return None
+    try:
+        rows = current.future.result()
+    except Exception:
+        with _PREFETCH_LOCK:
+            if _PREFETCHES.get(key) is current:
+                del _PREFETCHES[key]
+        return None  # Caller reads directly and reports any error on the script thread
+    return [dict(row) for row in rows]
 
 def get_metric_by_name(name: str):
     """
@@ -134,19 +1109,20 @@ def get_category_by_name(name: str):
     )
     return res.data[0] if res and res.data else None
 
-@st.cache_data(ttl=120)
-def get_all_entries_bulk():
-    res = _safe_execute(
-        sb.table("entries")
-        .select("*, metrics!inner(is_archived)")
-        .eq("metrics.is_archived", False), 
-        "Bulk fetch failed"
-    )
+@cached(("entries", "metrics"), ttl=120)
+def get_overview_summary():
+    """
+    Fetches one precomputed row per active metric for the Overview grid
+    (latest value, 7-point MA, last change, latest target, sparkline).
+    Payload size and server time depend on the number of metrics, not on
+    entry history.
+    """
+    res = _safe_execute(sb.rpc("get_overview_summary"), "Overview fetch failed")
     if res is None:
         return None  # Prevents showing '0 entries' flash
     return res.data
 
-@st.cache_data(ttl=30) # Short TTL for active recording
+@cached("entries", ttl=30, metric_arg="metric_id") # Short TTL for active recording
 def get_latest_entry_only(metric_id):
     """Fetches ONLY the single most recent record for smart defaults."""
     res = _safe_execute(
@@ -159,79 +1135,654 @@ def get_latest_entry_only(metric_id):
     )
     return res.data[0] if res and res.data else None
 
+# --- ASYNC READS ---
+# `*_async` variants of the cached reads for pages that need several
+# independent queries on first render: `prefetch` runs them concurrently
+# on one process-wide event loop (async PostgREST client, pooled transport),
+# so the render waits for the slowest query instead of the sum. They share
+# cache entries with their sync counterparts.
+
+@dataclass
+class _AsyncContext:
+    user_id: str | None
+    client: AsyncPostgrestClient
+    trace: QueryTrace | None = None
+
+_ASYNC_CONTEXT: contextvars.ContextVar = contextvars.ContextVar("models_async_context")
+_ASYNC_LOOP = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+def _async_loop() -> asyncio.AbstractEventLoop:
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="models-async-reads", daemon=True).start()
+            _ASYNC_LOOP = loop
+        return _ASYNC_LOOP
+
+def _async_postgrest() -> AsyncPostgrestClient:
+    """Async PostgREST client carrying the current session's auth headers."""
+    rest = sb.postgrest
+    return AsyncPostgrestClient(str(rest.base_url), headers=dict(rest.headers), http_client=get_async_http_client())
+
+async def _execute_async(query_func, policy: ExecutionPolicy = DEFAULT_POLICY):
+    """Async `_execute`: same timeout, retry and circuit breaker policy."""
+    attempts = _prepare(query_func, policy)
+    for attempt in range(attempts):
+        _before_attempt()
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(query_func.execute(), policy.timeout)
+        except Exception as e:
+            _trace(query_func, time.perf_counter() - start, error=e)
+            delay = _after_failure(e, time.perf_counter() - start, attempt, attempts, policy)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            continue
+        _EXEC_STATS.record(time.perf_counter() - start)
+        _BREAKER.record_success()
+        _trace(query_func, time.perf_counter() - start, result)
+        return result
+
+async def _safe_execute_async(query_func, error_message="Database operation failed"):
+    """Async `_safe_execute` for prefetches: errors are logged, the sync read reports them."""
+    try:
+        return await _execute_async(query_func)
+    except Exception as e:
+        logger.info("Prefetch skipped (%s): %s", error_message, e)
+        return None
+
+def async_read(sync_func):
+    """
+    Makes an async read share `sync_func`'s per-user cache entries. Calling the
+    read (on the script thread) returns its coroutine, or None when the cache
+    entry is already warm, so `prefetch` submits nothing for it.
+    """
+    name, signature, tables, ttl, metric_arg = sync_func.cache_spec
+
+    def decorator(func):
+        async def _read(bound, key):
+            user_id = _ASYNC_CONTEXT.get().user_id
+            value = _QUERY_CACHE.get(user_id, key)
+            if value is not _MISS:
+                return value
+            value = await func(*bound.args, **bound.kwargs)
+            if value is not None:
+                metric_id = bound.arguments.get(metric_arg) if metric_arg else None
+                _QUERY_CACHE.put(user_id, key, value, _effective_ttl(ttl), tables, metric_id)
+            return value
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, tuple(bound.arguments.items()))
+            if _QUERY_CACHE.get(_current_user_id(), key) is not _MISS:
+                return None
+            return _read(bound, key)
+
+        return wrapper
+
+    return decorator
+
+def _run_reads(reads):
+    try:
+        context = _AsyncContext(_current_user_id(), _async_postgrest(), trace=_current_trace())
+
+        async def _main():
+            _ASYNC_CONTEXT.set(context)
+            return await asyncio.gather(*reads)
+
+        return asyncio.run_coroutine_threadsafe(_main(), _async_loop()).result()
+    except Exception:
+        for read in reads:
+            read.close()  # Avoid "never awaited" warnings
+        raise
+
+def prefetch(*reads) -> bool:
+    """
+    Runs `*_async` read coroutines concurrently to warm the cache for the sync
+    reads that follow. Best-effort: a failed read returns None and is not
+    cached, so its sync counterpart retries and reports the error. Reads that
+    are already cached arrive as None and are skipped, so widget-only reruns
+    submit nothing. Call from the Streamlit script thread.
+    """
+    reads = [read for read in reads if read is not None]
+    if not reads:
+        return True
+    try:
+        _run_reads(reads)
+        return True
+    except Exception:
+        return False
+
+@async_read(get_categories)
+async def get_categories_async():
+    client = _ASYNC_CONTEXT.get().client
+    res = await _safe_execute_async(client.table("categories").select("*"), "Failed to fetch categories")
+    return res.data if res else None  # None is not cached: the sync read retries
+
+@async_read(get_metrics)
+async def get_metrics_async(include_archived=False):
+    query = _ASYNC_CONTEXT.get().client.table("metrics").select("*")
+    if not include_archived:
+        query = query.eq("is_archived", False)
+    res = await _safe_execute_async(query, "Failed to fetch metrics")
+    return res.data if res else None
+
+@async_read(get_change_events)
+async def get_change_events_async(limit: int = 200):
+    res = await _safe_execute_async(
+        _ASYNC_CONTEXT.get().client.table("change_events")
+        .select("id, title, notes, recorded_at, created_at, category_id, categories(name)")
+        .order("recorded_at", desc=True)
+        .limit(limit),
+        "Failed to fetch change events",
+    )
+    return res.data if res else None
+
+@async_read(get_overview_summary)
+async def get_overview_summary_async():
+    res = await _safe_execute_async(_ASYNC_CONTEXT.get().client.rpc("get_overview_summary", {}), "Overview fetch failed")
+    return res.data if res else None
+
+@async_read(get_latest_entry_only)
+async def get_latest_entry_only_async(metric_id):
+    res = await _safe_execute_async(
+        _ASYNC_CONTEXT.get().client.table("entries")
+        .select("*")
+        .eq("metric_id", metric_id)
+        .order("recorded_at", desc=True)
+        .limit(1),
+        "Failed to fetch latest entry",
+    )
+    return res.data[0] if res and res.data else None
+
 # --- WRITE OPERATIONS ---
 
+# Single-row writes return the written row (PostgREST `return=representation`)
+# and patch it into the cached reads it affects, so the next render is served
+# from cache instead of refetching. Reads that cannot be patched are evicted.
+
+def _write_through(res, tables, patches=(), metric_id=None):
+    """
+    Returns the first written row (or None). `patches` are (cached_func,
+    updater, args) triples; `updater(cached_value, row)` returns the new value
+    or _MISS. Every other cached read of `tables` is evicted.
+    """
+    row = res.data[0] if res and res.data else None
+    kept = set()
+    if row is not None:
+        for func, updater, args in patches:
+            key = func.patch(lambda value, updater=updater: updater(value, row), *args)
+            if key:
+                kept.add(key)
+    user_id = _current_user_id()
+    for table in tables:
+        _QUERY_CACHE.invalidate(user_id, table, metric_id, keep=kept)
+        if kept:
+            _expect_echo(user_id, table, _change_key(table, row))
+    if "entries" in tables:
+        _entries_changed(user_id)
+    return row
+
+def _unchanged(value, _row):
+    return value
+
+def _upsert_row(rows, row):
+    """Replaces the row with the same id in a cached list, or appends it."""
+    out = [r for r in rows if r.get("id") != row.get("id")]
+    out.append(row)
+    return out
+
+def _metrics_with(include_archived):
+    def updater(rows, row):
+        if row.get("is_archived") and not include_archived:
+            return [r for r in rows if r.get("id") != row.get("id")]
+        return _upsert_row(rows, row)
+    return updater
+
+def _newest_entry(cached, row):
+    if pd.Timestamp(row["recorded_at"]) >= pd.Timestamp(cached["recorded_at"]):
+        return row
+    return cached
+
+def _summary_with_entry(summary, row):
+    """
+    Folds a new entry into the cached Overview summary when it is the metric's
+    newest measured value (the common record-now case); otherwise _MISS.
+    Mirrors the aggregates of the `get_overview_summary` RPC.
+    """
+    value = row.get("value")
+    index = next((i for i, s in enumerate(summary) if s.get("metric_id") == row.get("metric_id")), None)
+    if value is None or index is None:
+        return _MISS
+    current = summary[index]
+    count = current.get("entry_count") or 0
+    latest_ts = current.get("latest_recorded_at")
+    if count and latest_ts and pd.Timestamp(row["recorded_at"]) < pd.Timestamp(latest_ts):
+        return _MISS  # Backdated: stats need the server-side window
+    value = float(value)
+    spark = [float(v) for v in (current.get("spark_values") or [])][-11:] + [value]
+    avg = current.get("avg_value")
+    patched = dict(
+        current,
+        entry_count=count + 1,
+        avg_value=((float(avg) * count) + value) / (count + 1) if count and avg is not None else value,
+        prev_value=current.get("latest_value") if count else None,
+        latest_value=value,
+        latest_recorded_at=row["recorded_at"],
+        latest_target=row.get("target_action"),
+        ma7=sum(spark[-7:]) / 7 if count + 1 >= 7 else None,
+        spark_values=spark,
+    )
+    return summary[:index] + [patched] + summary[index + 1:]
+
 def create_category(name: str):
-    return _safe_execute(sb.table("categories").insert({"name": name}), "Failed to create category")
+    res = _safe_execute(sb.table("categories").insert({"name": name}), "Failed to create category")
+    return _write_through(
+        res, ["categories"],
+        [(get_categories, _upsert_row, ()), (get_change_events, _unchanged, ())],
+    )
 
 def create_metric(payload: dict):
-    return _safe_execute(sb.table("metrics").insert(payload), "Failed to create metric")
+    res = _safe_execute(sb.table("metrics").insert(payload), "Failed to create metric")
+    return _write_through(
+        res, ["metrics"],
+        [
+            (get_metrics, _metrics_with(False), (False,)),
+            (get_metrics, _metrics_with(True), (True,)),
+            (get_overview_summary, _unchanged, ()),  # No entries yet
+        ],
+    )
 
 def create_entry(payload: dict):
-    return _safe_execute(sb.table("entries").insert(payload), "Failed to save entry")
+    res = _safe_execute(sb.table("entries").insert(payload), "Failed to save entry")
+    metric_id = payload.get("metric_id")
+    return _write_through(
+        res, ["entries"],
+        [
+            (get_latest_entry_only, _newest_entry, (metric_id,)),
+            (get_overview_summary, _summary_with_entry, ()),
+        ],
+        metric_id=metric_id,
+    )
 
 def create_change_event(payload: dict):
-    return _safe_execute(sb.table("change_events").insert(payload), "Failed to create change event")
+    with _invalidating("change_events"):
+        return _safe_execute(sb.table("change_events").insert(payload), "Failed to create change event")
 
 def update_change_event(change_event_id: str, payload: dict):
-    return _safe_execute(
-        sb.table("change_events").update(payload).eq("id", change_event_id),
-        "Failed to update change event",
-    )
+    with _invalidating("change_events"):
+        return _safe_execute(
+            sb.table("change_events").update(payload).eq("id", change_event_id),
+            "Failed to update change event",
+        )
 
 # --- UPDATE OPERATIONS ---
 
-def update_entry(entry_id, payload: dict):
-    return _safe_execute(sb.table("entries").update(payload).eq("id", entry_id), "Failed to update entry")
+def update_entry(entry_id, payload: dict, metric_id=None):
+    with _invalidating("entries", metric_id=metric_id):
+        return _safe_execute(sb.table("entries").update(payload).eq("id", entry_id), "Failed to update entry")
 
 def update_category(cat_id: str, name: str):
     """UPDATED: Re-added missing attribute to fix category rename errors."""
-    return _safe_execute(sb.table("categories").update({"name": name}).eq("id", cat_id), "Failed to update category")
+    res = _safe_execute(sb.table("categories").update({"name": name}).eq("id", cat_id), "Failed to update category")
+    return _write_through(res, ["categories"], [(get_categories, _upsert_row, ())])
 
 def update_metric(metric_id: str, payload: dict):
-    return _safe_execute(sb.table("metrics").update(payload).eq("id", metric_id), "Failed to update metric")
+    return _update_metric(metric_id, payload, "Failed to update metric")
+
+def _update_metric(metric_id: str, payload: dict, error_message: str):
+    res = _safe_execute(sb.table("metrics").update(payload).eq("id", metric_id), error_message)
+    patches = [
+        (get_metrics, _metrics_with(False), (False,)),
+        (get_metrics, _metrics_with(True), (True,)),
+    ]
+    if "is_archived" not in payload:
+        patches.append((get_overview_summary, _unchanged, ()))  # Summary rows hold no metadata
+    return _write_through(res, ["metrics"], patches, metric_id=metric_id)
 
 # --- DELETE OPERATIONS ---
 
-def delete_entry(entry_id):
-    return _safe_execute(sb.table("entries").delete().eq("id", entry_id), "Failed to delete entry")
+def delete_entry(entry_id, metric_id=None):
+    with _invalidating("entries", metric_id=metric_id):
+        return _safe_execute(sb.table("entries").delete().eq("id", entry_id), "Failed to delete entry")
+
+_commit_rpc_supported = True  # Flipped off when `commit_entry_edits` is not deployed
+
+def commit_entry_edits(metric_id, deletes=(), updates=(), inserts=()):
+    """
+    Applies one metric's data-editor diff: `deletes` are entry ids, `updates`
+    are {id, value, recorded_at}, `inserts` are {value, recorded_at}. Uses the
+    `commit_entry_edits` RPC (one transaction, one round trip), else one
+    delete-in, one update per edited row and one insert. Returns {"deleted": [ids],
+    "updated": [rows], "inserted": [rows]}, or None on failure.
+    """
+    global _commit_rpc_supported
+    deletes, updates, inserts = list(deletes), list(updates), list(inserts)
+    with _invalidating("entries", metric_id=metric_id):
+        if _commit_rpc_supported:
+            params = {"p_metric_id": metric_id, "p_deletes": deletes, "p_updates": updates, "p_inserts": inserts}
+            try:
+                return _execute(sb.rpc("commit_entry_edits", params), BULK_POLICY).data
+            except APIError as e:
+                if e.code != "PGRST202":  # Function not found
+                    st.error(f"⚠️ Failed to save changes: {e}")
+                    return None
+                _commit_rpc_supported = False
+            except Exception as e:
+                st.error(f"⚠️ Failed to save changes: {e}")
+                return None
+
+        result = {"deleted": [], "updated": [], "inserted": []}
+        if deletes:
+            res = _safe_execute(
+                sb.table("entries").delete().in_("id", deletes).eq("metric_id", metric_id),
+                "Failed to delete entries", policy=BULK_POLICY,
+            )
+            if res is None:
+                return None
+            result["deleted"] = [row["id"] for row in res.data or []]
+        for row in updates:
+            # Update by id, like the RPC: an upsert would re-create rows deleted
+            # by another session in the meantime.
+            values = {k: v for k, v in row.items() if k != "id"}
+            res = _safe_execute(
+                sb.table("entries").update(values).eq("id", row["id"]).eq("metric_id", metric_id),
+                "Failed to update entries",
+            )
+            if res is None:
+                return None
+            result["updated"].extend(res.data or [])
+        if inserts:
+            res = _safe_execute(
+                sb.table("entries").insert([{**row, "metric_id": metric_id} for row in inserts]),
+                "Failed to save entries", policy=BULK_POLICY,
+            )
+            if res is None:
+                return None
+            result["inserted"] = res.data or []
+        return result
 
 def delete_metric(metric_id: str):
-    return _safe_execute(sb.table("metrics").delete().eq("id", metric_id), "Failed to delete metric")
+    with _invalidating("metrics", "entries", metric_id=metric_id):  # entries cascade
+        return _safe_execute(sb.table("metrics").delete().eq("id", metric_id), "Failed to delete metric")
 
 def delete_category(cat_id: str):
     """UPDATED: Added for complete category management capability."""
-    return _safe_execute(sb.table("categories").delete().eq("id", cat_id), "Failed to delete category")
+    with _invalidating("categories", "metrics", "change_events"):  # category_id is set null
+        return _safe_execute(sb.table("categories").delete().eq("id", cat_id), "Failed to delete category")
 
 def delete_change_event(change_event_id: str):
-    return _safe_execute(
-        sb.table("change_events").delete().eq("id", change_event_id),
-        "Failed to delete change event",
-    )
+    with _invalidating("change_events"):
+        return _safe_execute(
+            sb.table("change_events").delete().eq("id", change_event_id),
+            "Failed to delete change event",
+        )
 
 # --- DATA EXPORT & LIFECYCLE ---
 
+EXPORT_COLUMNS = [
+    "RowType", "Date", "Category", "Metric", "Description", "Archived", "Value", "Unit",
+    "Type", "Kind", "Min", "Max", "HigherIsBetter", "Target", "Title", "Notes",
+]
+EXPORT_ENTRY_COLUMNS = (
+    "recorded_at, value, target_action, metrics(name, description, unit_name, unit_type, "
+    "metric_kind, higher_is_better, range_start, range_end, is_archived, categories(name))"
+)
+EXPORT_CHANGE_COLUMNS = "recorded_at, title, notes, categories(name)"
+
 def get_flat_export_data():
     """
     MODIFIED: Fetches flattened dataset including metric metadata 
     (Type, Min, Max) for a complete round-trip backup.
+    Materializes the whole history; prefer `write_export_csv` for large ones.
+    """
+    return _export_frame_records(get_export_frame())
+
+
+def get_export_frame() -> pd.DataFrame:
+    """
+    Fetches the full backup as a DataFrame in `EXPORT_COLUMNS` order, newest
+    first. Raises when a page fails rather than returning a partial backup.
+    """
+    entries = list(iter_entries(columns=EXPORT_ENTRY_COLUMNS, descending=True))
+    changes = list(iter_change_events(columns=EXPORT_CHANGE_COLUMNS, descending=True))
+    return build_export_frame(entries, changes)
+
+
+BACKUP_METRIC_COLUMNS = (
+    "id, name, description, unit_name, unit_type, metric_kind, range_start, "
+    "range_end, higher_is_better, is_archived, category_id"
+)
+BACKUP_DTYPES = {
+    "categories": {"id": "string", "name": "string"},
+    "metrics": {
+        "id": "string", "name": "string", "description": "string", "unit_name": "string",
+        "unit_type": "string", "metric_kind": "string", "range_start": "Int64",
+        "range_end": "Int64", "higher_is_better": "boolean", "is_archived": "boolean",
+        "category_id": "string",
+    },
+    "entries": {"metric_id": "string", "value": "float64", "recorded_at": "datetime64[us]", "target_action": "string"},
+    "changes": {"category_id": "string", "title": "string", "notes": "string", "recorded_at": "datetime64[us]"},
+}
+
+def _typed_backup_frame(table: str, rows: list[dict]) -> pd.DataFrame:
+    # Text columns use the nullable "string" dtype: "str" turns None into the
+    # literal "None" on pandas < 3.
+    dtypes = BACKUP_DTYPES[table]
+    frame = pd.DataFrame(rows, columns=list(dtypes))
+    if "recorded_at" in frame:
+        # Stored as naive UTC, like the `timestamp` columns themselves.
+        frame["recorded_at"] = pd.to_datetime(frame["recorded_at"], format="ISO8601", utc=True).dt.tz_localize(None)
+    return frame.astype(dtypes)
+
+def get_backup_tables():
+    """
+    Fetches the normalized backup layout: categories, metrics, entries
+    (metric_id, float value, timestamp) and change events, as typed frames.
+    Returns None when any table could not be read completely.
+    """
+    cats_res = _safe_execute(sb.table("categories").select("id, name"), "Failed to fetch categories for export")
+    metrics_res = _safe_execute(sb.table("metrics").select(BACKUP_METRIC_COLUMNS), "Failed to fetch metrics for export")
+    if cats_res is None or metrics_res is None:
+        return None
+    try:
+        entries = list(iter_entries(columns="metric_id, value, recorded_at, target_action"))
+        changes = list(iter_change_events(columns="category_id, title, notes, recorded_at"))
+    except Exception as e:
+        st.error(f"⚠️ Failed to fetch rows for export: {e}")
+        return None
+    return {
+        "categories": _typed_backup_frame("categories", cats_res.data or []),
+        "metrics": _typed_backup_frame("metrics", metrics_res.data or []),
+        "entries": _typed_backup_frame("entries", entries),
+        "changes": _typed_backup_frame("changes", changes),
+    }
+
+
+def _export_pages(rows, page_size: int):
+    """Groups a row stream into lists of `page_size` rows."""
+    rows = iter(rows)
+    while page := list(itertools.islice(rows, page_size)):
+        yield page
+
+
+def iter_export_frames(page_size: int = ENTRY_PAGE_SIZE):
+    """
+    Streams the backup newest first as `EXPORT_COLUMNS` frames, one per merge
+    step. Entries and change events are each paged in `recorded_at desc` order
+    and formatted column-wise per page (`_entry_export_frame`); a step emits
+    every buffered row newer than the oldest row still buffered by a stream
+    that has more pages, so only about one page of each is held in memory.
+    Entries come before changes on equal timestamps, as in `build_export_frame`.
+    """
+    streams = [
+        [map(_entry_export_frame, _export_pages(
+            iter_entries(columns=EXPORT_ENTRY_COLUMNS, page_size=page_size, descending=True), page_size))],
+        [map(_change_export_frame, _export_pages(
+            iter_change_events(columns=EXPORT_CHANGE_COLUMNS, page_size=page_size, descending=True), page_size))],
+    ]
+    for stream in streams:
+        stream.extend([pd.DataFrame(columns=EXPORT_COLUMNS), False])  # [pages, buffer, exhausted]
+
+    def _pull(stream):
+        page = next(stream[0], None)
+        if page is None:
+            stream[2] = True
+        else:
+            stream[1] = pd.concat([stream[1], page], ignore_index=True) if len(stream[1]) else page
+
+    while True:
+        for stream in streams:
+            if not stream[2] and stream[1].empty:
+                _pull(stream)
+        live = [stream for stream in streams if not stream[2]]
+        if not live:
+            rest = [stream[1] for stream in streams if len(stream[1])]
+            if rest:
+                yield _sort_export_frame(pd.concat(rest, ignore_index=True))
+            return
+        cutoff = max(stream[1]["Date"].iloc[-1] for stream in live)
+        ready = []
+        for stream in streams:
+            newer = stream[1]["Date"] > cutoff
+            if newer.any():
+                ready.append(stream[1][newer])
+                stream[1] = stream[1][~newer].reset_index(drop=True)
+        if ready:
+            yield _sort_export_frame(pd.concat(ready, ignore_index=True))
+        else:
+            for stream in live:  # Only rows at the cutoff remain: read past them
+                if stream[1]["Date"].iloc[-1] == cutoff:
+                    _pull(stream)
+
+
+def write_export_csv(fileobj, frames=None) -> int:
+    """
+    Writes the backup CSV incrementally to a binary file object, one
+    `iter_export_frames` chunk at a time. Returns the number of data rows
+    written (0 means nothing to export). Raises when a page fails; the
+    partial file must then be discarded.
+    """
+    count = 0
+    fileobj.write((",".join(EXPORT_COLUMNS) + "\n").encode("utf-8"))
+    for frame in iter_export_frames() if frames is None else frames:
+        fileobj.write(frame.to_csv(header=False, index=False, lineterminator="\n").encode("utf-8"))
+        count += len(frame)
+    return count
+
+
+_UTC_SUFFIXES = ["", "Z", "+00:00", "+00"]
+
+def _format_export_dates(raw: pd.Series) -> pd.Series:
+    """
+    Formats PostgREST timestamps as the backup's 'YYYY-MM-DD HH:MM:SS' (UTC).
+    Naive and UTC ISO strings are formatted by slicing; only rows carrying
+    another offset go through `pd.to_datetime`.
     """
-    entries_res = _safe_execute(
-        sb.table("entries").select(
-            "recorded_at, value, target_action, metrics(name, description, unit_name, unit_type, metric_kind, higher_is_better, range_start, range_end, is_archived, categories(name))"
-        ),
-        "Failed to fetch export data"
+    raw = raw.astype("str")
+    out = raw.str.slice(0, 19).str.replace("T", " ", regex=False)
+    suffix = raw.str.slice(19).str.replace(r"^\.\d+", "", regex=True)
+    needs_parse = ~suffix.isin(_UTC_SUFFIXES)
+    if needs_parse.any():
+        parsed = pd.to_datetime(raw[needs_parse], format="ISO8601", utc=True)
+        out[needs_parse] = parsed.dt.strftime("%Y-%m-%d %H:%M:%S")
+    return out
+
+
+def _entry_export_frame(entries_data: list[dict]) -> pd.DataFrame:
+    # PostgREST repeats the embedded metric on every entry, so only the distinct
+    # metric objects are normalized and then broadcast back by name.
+    names = [(e.get("metrics") or {}).get("name") for e in entries_data]
+    distinct: dict = {}
+    for entry in entries_data:
+        meta = entry.get("metrics")
+        if meta and meta.get("name") not in distinct:
+            distinct[meta.get("name")] = meta
+    # object dtype keeps integer Value/Min/Max as ints (5, not 5.0) in the CSV.
+    flat = [
+        {**{k: v for k, v in m.items() if k != "categories"}, "categories.name": (m.get("categories") or {}).get("name")}
+        for m in distinct.values()
+    ]
+    meta = pd.DataFrame(flat, dtype=object) if flat else pd.DataFrame()
+    meta = meta.set_index("name", drop=False) if "name" in meta else meta
+    meta = meta.reindex(names).reset_index(drop=True)
+
+    def _col(df, name, default=None):
+        return df[name] if name in df else pd.Series(default, index=df.index, dtype=object)
+
+    top = pd.DataFrame(
+        {
+            "recorded_at": [e["recorded_at"] for e in entries_data],
+            "value": pd.Series([e.get("value") for e in entries_data], dtype=object),
+            "target_action": [e.get("target_action", "") for e in entries_data],
+        }
     )
-    if not entries_res:
-        return []
+    return pd.DataFrame(
+        {
+            "RowType": "entry",
+            "Date": _format_export_dates(top["recorded_at"]),
+            "Category": _col(meta, "categories.name").astype(object).fillna("None"),
+            "Metric": _col(meta, "name").astype(object).fillna("Unknown"),
+            "Description": _col(meta, "description", ""),
+            "Archived": _col(meta, "is_archived").astype(object).fillna(False),
+            "Value": top["value"],
+            "Unit": _col(meta, "unit_name", ""),
+            "Type": _col(meta, "unit_type").astype(object).fillna("float"),
+            "Kind": _col(meta, "metric_kind"),
+            "Min": _col(meta, "range_start"),
+            "Max": _col(meta, "range_end"),
+            "HigherIsBetter": _col(meta, "higher_is_better").astype(object).fillna(True),
+            "Target": top["target_action"],
+            "Title": "",
+            "Notes": "",
+        },
+        index=top.index,
+    )
+
 
-    changes_res = _safe_execute(
-        sb.table("change_events").select("recorded_at, title, notes, categories(name)"),
-        "Failed to fetch change events for export",
+def _change_export_frame(change_events_data: list[dict]) -> pd.DataFrame:
+    frame = pd.DataFrame(
+        {
+            "RowType": "change",
+            "Date": _format_export_dates(pd.Series([ev["recorded_at"] for ev in change_events_data], dtype=object)),
+            "Category": [(ev.get("categories") or {}).get("name") if ev.get("categories") else "None" for ev in change_events_data],
+            "Title": [ev.get("title", "") for ev in change_events_data],
+            "Notes": [ev.get("notes", "") or "" for ev in change_events_data],
+        }
     )
-    changes_data = changes_res.data if changes_res and changes_res.data else []
-    
-    return build_export_rows(entries_res.data or [], changes_data)
+    for column in EXPORT_COLUMNS:
+        if column not in frame:
+            frame[column] = ""
+    return frame[EXPORT_COLUMNS]
+
+
+def build_export_frame(entries_data: list[dict], change_events_data: list[dict]) -> pd.DataFrame:
+    """
+    Column-wise version of `build_export_rows`: one frame in `EXPORT_COLUMNS`
+    order, newest first, entries ahead of changes on equal timestamps.
+    """
+    parts = []
+    if entries_data:
+        parts.append(_entry_export_frame(entries_data))
+    if change_events_data:
+        parts.append(_change_export_frame(change_events_data))
+    if not parts:
+        return pd.DataFrame(columns=EXPORT_COLUMNS)
+    return _sort_export_frame(pd.concat(parts, ignore_index=True))
+
+
+def _sort_export_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Newest first; the stable sort keeps entries ahead of changes on equal dates."""
+    return frame[EXPORT_COLUMNS].sort_values("Date", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _export_frame_records(frame: pd.DataFrame) -> list[dict]:
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
 
 
 def build_export_rows(entries_data: list[dict], change_events_data: list[dict]) -> list[dict]:
@@ -241,61 +1792,48 @@ def build_export_rows(entries_data: list[dict], change_events_data: list[dict])
     - Lifestyle changes (RowType='change')
 
     This is pure formatting logic and is safe to unit test without Supabase.
+    Thin wrapper over `build_export_frame`.
     """
-    rows: list[dict] = []
+    return _export_frame_records(build_export_frame(entries_data, change_events_data))
 
-    for entry in entries_data:
-        ts = pd.to_datetime(entry["recorded_at"], format="ISO8601", utc=True)
-        m_meta = entry.get("metrics", {})
-        rows.append(
-            {
-                "RowType": "entry",
-                "Date": ts.strftime("%Y-%m-%d %H:%M:%S"),
-                "Category": m_meta.get("categories", {}).get("name") if m_meta.get("categories") else "None",
-                "Metric": m_meta.get("name", "Unknown"),
-                "Description": m_meta.get("description", ""),
-                "Archived": m_meta.get("is_archived", False),
-                "Value": entry.get("value"),
-                "Unit": m_meta.get("unit_name", ""),
-                "Type": m_meta.get("unit_type", "float"),
-                "Kind": m_meta.get("metric_kind"),
-                "Min": m_meta.get("range_start"),
-                "Max": m_meta.get("range_end"),
-                "HigherIsBetter": m_meta.get("higher_is_better", True),
-                "Target": entry.get("target_action", ""),
-                "Title": "",
-                "Notes": "",
-            }
-        )
-
-    for ev in change_events_data:
-        ts = pd.to_datetime(ev["recorded_at"], format="ISO8601", utc=True)
-        rows.append(
-            {
-                "RowType": "change",
-                "Date": ts.strftime("%Y-%m-%d %H:%M:%S"),
-                "Category": (ev.get("categories", {}) or {}).get("name") if ev.get("categories") else "None",
-                "Metric": "",
-                "Description": "",
-                "Archived": "",
-                "Value": "",
-                "Unit": "",
-                "Type": "",
-                "Kind": "",
-                "Min": "",
-                "Max": "",
-                "HigherIsBetter": "",
-                "Target": "",
-                "Title": ev.get("title", ""),
-                "Notes": ev.get("notes", "") or "",
-            }
-        )
+def import_bundle(bundle: dict):
+    """
+    Sends one chunk of a backup restore to the `import_bundle` RPC.
+    Chunks sent with commit=False are staged server-side under `import_id`; the
+    call with commit=True applies wipe + upserts + inserts in one transaction.
+    Returns the RPC summary (counts per table), or None on failure. A commit
+    that was sent but got no answer (timeout, dropped connection) is not
+    cancelled server-side, so it returns {"committed": None}: outcome unknown.
+    """
+    if not bundle.get("commit", True):
+        res = _safe_execute(sb.rpc("import_bundle", {"p_bundle": bundle}), "Import failed", policy=BULK_POLICY)
+        return res.data if res else None
+    try:
+        return _execute(sb.rpc("import_bundle", {"p_bundle": bundle}), BULK_POLICY).data
+    except Exception as e:
+        if _may_have_run(e):
+            return {"committed": None}
+        st.error(f"⚠️ Import failed: {e}")
+        return None
+    finally:
+        invalidate_user(_current_user_id())
 
-    def _sort_key(row: dict):
-        # Stable sort: newest first, changes/entries interleaved by timestamp.
-        return row.get("Date", "")
+def _may_have_run(error: Exception) -> bool:
+    """True when a request may have reached the server before failing client-side."""
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, BackendUnavailable)):
+        return False  # Never sent
+    return isinstance(error, (TimeoutError, httpx.TransportError))
 
-    return sorted(rows, key=_sort_key, reverse=True)
+def discard_import(import_id: str):
+    """
+    Drops the rows staged under `import_id` after an aborted restore, so a
+    failed upload does not leave bundles behind until the daily cleanup.
+    """
+    _safe_execute(
+        sb.table("import_staging").delete().eq("import_id", import_id),
+        "Error discarding staged import",
+        policy=BULK_POLICY,
+    )
 
 def wipe_user_data():
     """Wipes all data for the authenticated user."""
@@ -303,14 +1841,12 @@ def wipe_user_data():
     _safe_execute(sb.table("entries").delete().neq("id", "00000000-0000-0000-0000-000000000000"), "Error wiping entries")
     _safe_execute(sb.table("metrics").delete().neq("id", "00000000-0000-0000-0000-000000000000"), "Error wiping metrics")
     _safe_execute(sb.table("categories").delete().neq("id", "00000000-0000-0000-0000-000000000000"), "Error wiping categories")
+    invalidate_user(_current_user_id())
 
 
 def archive_metric(metric_id: str):
     """Soft-deletes a metric by setting the archive flag."""
-    return _safe_execute(
-        sb.table("metrics").update({"is_archived": True}).eq("id", metric_id),
-        "Failed to archive metric"
-    )
+    return _update_metric(metric_id, {"is_archived": True}, "Failed to archive metric")
 
 # --- LOCAL BACKUP HELPERS (Restored) ---
 
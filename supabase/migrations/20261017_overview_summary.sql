@@ -0,0 +1,76 @@
+-- Server-side Overview summary: one compact row per metric instead of
+-- shipping every entry to the client.
+
+-- The Overview reads the latest target; make sure the column exists.
+alter table entries
+  add column if not exists target_action text;
+
+-- Supports "latest N per metric" scans used by the summary below.
+create index if not exists entries_metric_recorded_at_idx
+  on entries (metric_id, recorded_at desc);
+
+create or replace function get_overview_summary()
+returns table (
+  metric_id uuid,
+  entry_count bigint,
+  latest_value numeric,
+  latest_recorded_at timestamp,
+  prev_value numeric,
+  ma7 numeric,
+  avg_value numeric,
+  latest_target text,
+  spark_values numeric[]
+)
+language sql
+stable
+security invoker  -- RLS on entries/metrics still applies
+as $$
+  with measured as (
+    -- NULL values are "not measured" and never count towards stats.
+    select
+      e.metric_id,
+      e.value,
+      e.recorded_at,
+      row_number() over (partition by e.metric_id order by e.recorded_at desc) as rn
+    from entries e
+    join metrics m on m.id = e.metric_id
+    where not m.is_archived
+      and e.value is not null
+  ),
+  stats as (
+    select
+      metric_id,
+      count(*) as entry_count,
+      avg(value) as avg_value,
+      max(recorded_at) as latest_recorded_at,
+      max(value) filter (where rn = 1) as latest_value,
+      max(value) filter (where rn = 2) as prev_value,
+      case when count(*) >= 7 then avg(value) filter (where rn <= 7) end as ma7,
+      array_agg(value order by recorded_at) filter (where rn <= 12) as spark_values
+    from measured
+    group by metric_id
+  ),
+  targets as (
+    select distinct on (e.metric_id)
+      e.metric_id,
+      e.target_action
+    from entries e
+    join metrics m on m.id = e.metric_id
+    where not m.is_archived
+    order by e.metric_id, e.recorded_at desc
+  )
+  select
+    t.metric_id,
+    coalesce(s.entry_count, 0),
+    s.latest_value,
+    s.latest_recorded_at,
+    s.prev_value,
+    s.ma7,
+    s.avg_value,
+    t.target_action,
+    coalesce(s.spark_values, '{}')
+  from targets t
+  left join stats s on s.metric_id = t.metric_id;
+$$;
+
+grant execute on function get_overview_summary() to authenticated;
@@ -0,0 +1,57 @@
+-- Incremental entry sync.
+-- Clients keep a local copy of their entries and only fetch rows changed since
+-- their last watermark: `updated_at` marks inserts/updates, `entry_tombstones`
+-- records deletes (including cascades from deleted metrics).
+
+alter table entries
+  add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists entries_user_updated_at_idx on entries (user_id, updated_at);
+
+create or replace function set_entry_updated_at()
+returns trigger as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists trg_entries_updated_at on entries;
+create trigger trg_entries_updated_at
+before update on entries
+for each row
+execute function set_entry_updated_at();
+
+create table if not exists entry_tombstones (
+  entry_id uuid primary key,
+  metric_id uuid,
+  user_id uuid not null references auth.users default auth.uid(),
+  deleted_at timestamptz not null default now()
+);
+
+create index if not exists entry_tombstones_user_deleted_at_idx on entry_tombstones (user_id, deleted_at);
+
+alter table entry_tombstones enable row level security;
+
+create policy "Users can manage their own entry tombstones" on entry_tombstones
+  for all to authenticated using (auth.uid() = user_id);
+
+-- Tombstones are kept for 30 days; clients whose watermark is older resync fully.
+create or replace function record_entry_tombstone()
+returns trigger as $$
+begin
+  insert into entry_tombstones (entry_id, metric_id, user_id)
+  values (old.id, old.metric_id, old.user_id)
+  on conflict (entry_id) do update set deleted_at = excluded.deleted_at;
+
+  delete from entry_tombstones
+  where user_id = old.user_id and deleted_at < now() - interval '30 days';
+  return old;
+end;
+$$ language plpgsql;
+
+drop trigger if exists trg_entries_tombstone on entries;
+create trigger trg_entries_tombstone
+after delete on entries
+for each row
+execute function record_entry_tombstone();
@@ -0,0 +1,83 @@
+-- Push invalidation.
+-- Statement-level triggers announce committed row changes on the
+-- `quantifi_changes` channel so app servers (change_listener.py) can evict the
+-- affected user's caches instead of waiting for TTLs.
+-- Payload: {"table": ..., "user_id": ..., "metric_id": ... | null}. One
+-- notification per (table, user, metric); statements touching more than 20
+-- metrics of a user collapse to one table-wide notification, so bulk imports
+-- stay cheap. Postgres delivers them on commit and drops duplicates.
+
+create or replace function change_notification_key(p_table text, p_row jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+  select jsonb_build_object(
+    'user_id', p_row->>'user_id',
+    'metric_id', case p_table
+      when 'entries' then p_row->>'metric_id'
+      when 'metrics' then p_row->>'id'
+    end
+  )
+$$;
+
+create or replace function notify_row_changes()
+returns trigger as $$
+declare
+  v_keys jsonb;
+  r record;
+begin
+  -- Transition tables only exist for their own event, hence one branch each.
+  if tg_op = 'INSERT' then
+    select jsonb_agg(distinct change_notification_key(tg_table_name, to_jsonb(n))) into v_keys from new_rows n;
+  elsif tg_op = 'DELETE' then
+    select jsonb_agg(distinct change_notification_key(tg_table_name, to_jsonb(o))) into v_keys from old_rows o;
+  else
+    select jsonb_agg(distinct k) into v_keys
+    from (
+      select change_notification_key(tg_table_name, to_jsonb(n)) as k from new_rows n
+      union all
+      select change_notification_key(tg_table_name, to_jsonb(o)) from old_rows o
+    ) s;
+  end if;
+
+  for r in
+    select distinct user_id, metric_id
+    from (
+      select
+        k->>'user_id' as user_id,
+        case when count(*) over (partition by k->>'user_id') > 20 then null else k->>'metric_id' end as metric_id
+      from jsonb_array_elements(coalesce(v_keys, '[]')) k
+    ) s
+  loop
+    perform pg_notify(
+      'quantifi_changes',
+      json_build_object('table', tg_table_name, 'user_id', r.user_id, 'metric_id', r.metric_id)::text
+    );
+  end loop;
+  return null;
+end;
+$$ language plpgsql;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['entries', 'metrics', 'categories', 'change_events'] loop
+    execute format('drop trigger if exists trg_%1$s_notify_insert on %1$I', t);
+    execute format('drop trigger if exists trg_%1$s_notify_update on %1$I', t);
+    execute format('drop trigger if exists trg_%1$s_notify_delete on %1$I', t);
+    execute format(
+      'create trigger trg_%1$s_notify_insert after insert on %1$I
+         referencing new table as new_rows
+         for each statement execute function notify_row_changes()', t);
+    execute format(
+      'create trigger trg_%1$s_notify_update after update on %1$I
+         referencing old table as old_rows new table as new_rows
+         for each statement execute function notify_row_changes()', t);
+    execute format(
+      'create trigger trg_%1$s_notify_delete after delete on %1$I
+         referencing old table as old_rows
+         for each statement execute function notify_row_changes()', t);
+  end loop;
+end $$;
@@ -0,0 +1,50 @@
+-- Batched data-editor save.
+-- The editor sends its whole diff for one metric (deletes, updates, inserts) in
+-- a single call that applies it in one transaction and returns the written rows,
+-- so the client merges them into its draft instead of refetching the metric.
+-- Updates/inserts: [{id (updates only), value, recorded_at, target_action (inserts only)}].
+
+create or replace function commit_entry_edits(
+  p_metric_id uuid,
+  p_deletes uuid[] default '{}',
+  p_updates jsonb default '[]',
+  p_inserts jsonb default '[]'
+)
+returns jsonb
+language plpgsql
+security invoker  -- RLS on entries still applies
+as $$
+declare
+  v_deleted jsonb;
+  v_updated jsonb;
+  v_inserted jsonb;
+begin
+  with d as (
+    delete from entries
+    where metric_id = p_metric_id and id = any(coalesce(p_deletes, '{}'))
+    returning id
+  )
+  select coalesce(jsonb_agg(id), '[]') into v_deleted from d;
+
+  with u as (
+    update entries e
+    set value = x.value, recorded_at = x.recorded_at
+    from jsonb_to_recordset(coalesce(p_updates, '[]')) as x(id uuid, value numeric, recorded_at timestamp)
+    where e.id = x.id and e.metric_id = p_metric_id
+    returning e.*
+  )
+  select coalesce(jsonb_agg(to_jsonb(u)), '[]') into v_updated from u;
+
+  with i as (
+    insert into entries (metric_id, value, recorded_at, target_action)
+    select p_metric_id, x.value, x.recorded_at, x.target_action
+    from jsonb_to_recordset(coalesce(p_inserts, '[]')) as x(value numeric, recorded_at timestamp, target_action text)
+    returning *
+  )
+  select coalesce(jsonb_agg(to_jsonb(i)), '[]') into v_inserted from i;
+
+  return jsonb_build_object('deleted', v_deleted, 'updated', v_updated, 'inserted', v_inserted);
+end;
+$$;
+
+grant execute on function commit_entry_edits(uuid, uuid[], jsonb, jsonb) to authenticated;
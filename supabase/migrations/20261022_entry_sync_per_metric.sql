@@ -0,0 +1,35 @@
+-- Per-metric incremental sync.
+-- Clients now keep one snapshot per (user, metric), so deltas and tombstones
+-- are read by metric. Tombstone retention moves from the per-row delete
+-- trigger (one cleanup DELETE per deleted entry) to a statement-level trigger
+-- that prunes once per DELETE statement, however many rows it removed.
+
+create index if not exists entries_metric_updated_at_idx on entries (metric_id, updated_at);
+create index if not exists entry_tombstones_metric_deleted_at_idx on entry_tombstones (metric_id, deleted_at);
+
+create or replace function record_entry_tombstone()
+returns trigger as $$
+begin
+  insert into entry_tombstones (entry_id, metric_id, user_id)
+  values (old.id, old.metric_id, old.user_id)
+  on conflict (entry_id) do update set deleted_at = excluded.deleted_at;
+  return old;
+end;
+$$ language plpgsql;
+
+-- Tombstones are kept for 30 days; clients whose watermark is older resync fully.
+-- Runs as the deleting user, so RLS scopes the prune to their own tombstones.
+create or replace function prune_entry_tombstones()
+returns trigger as $$
+begin
+  delete from entry_tombstones
+  where deleted_at < now() - interval '30 days';
+  return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists trg_entries_prune_tombstones on entries;
+create trigger trg_entries_prune_tombstones
+after delete on entries
+for each statement
+execute function prune_entry_tombstones();
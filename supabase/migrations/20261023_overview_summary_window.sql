@@ -0,0 +1,135 @@
+-- Overview summary without full-history scans.
+-- entry_count/avg_value come from per-metric running totals maintained by
+-- statement-level triggers; latest/prev/ma7/sparkline read only each metric's
+-- newest 12 measured rows through entries (metric_id, recorded_at desc).
+
+create table if not exists metric_entry_stats (
+  metric_id uuid primary key references metrics(id) on delete cascade,
+  user_id uuid not null references auth.users default auth.uid(),
+  entry_count bigint not null default 0, -- measured (non-NULL) entries only
+  value_sum numeric not null default 0
+);
+
+alter table metric_entry_stats enable row level security;
+
+drop policy if exists "Users can manage their own entry stats" on metric_entry_stats;
+create policy "Users can manage their own entry stats" on metric_entry_stats
+  for all to authenticated using (auth.uid() = user_id);
+
+create or replace function maintain_metric_entry_stats()
+returns trigger as $$
+begin
+  -- Transition tables only exist for their own event; UPDATE subtracts the old
+  -- rows, then adds the new ones. Deletes never insert, so cascades from a
+  -- deleted metric leave nothing behind.
+  if tg_op in ('UPDATE', 'DELETE') then
+    update metric_entry_stats s
+    set entry_count = s.entry_count - d.n,
+        value_sum = s.value_sum - d.total
+    from (
+      select metric_id, count(*) as n, sum(value) as total
+      from old_rows
+      where value is not null and metric_id is not null
+      group by metric_id
+    ) d
+    where s.metric_id = d.metric_id;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into metric_entry_stats (metric_id, user_id, entry_count, value_sum)
+    select metric_id, user_id, count(*), sum(value)
+    from new_rows
+    where value is not null and metric_id is not null
+    group by metric_id, user_id
+    on conflict (metric_id) do update
+      set entry_count = metric_entry_stats.entry_count + excluded.entry_count,
+          value_sum = metric_entry_stats.value_sum + excluded.value_sum;
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists trg_entries_stats_insert on entries;
+create trigger trg_entries_stats_insert after insert on entries
+  referencing new table as new_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+drop trigger if exists trg_entries_stats_update on entries;
+create trigger trg_entries_stats_update after update on entries
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+drop trigger if exists trg_entries_stats_delete on entries;
+create trigger trg_entries_stats_delete after delete on entries
+  referencing old table as old_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+-- Backfill once; the triggers keep the totals current from here on.
+insert into metric_entry_stats (metric_id, user_id, entry_count, value_sum)
+select metric_id, user_id, count(*), sum(value)
+from entries
+where value is not null and metric_id is not null
+group by metric_id, user_id
+on conflict (metric_id) do update
+  set entry_count = excluded.entry_count,
+      value_sum = excluded.value_sum;
+
+create or replace function get_overview_summary()
+returns table (
+  metric_id uuid,
+  entry_count bigint,
+  latest_value numeric,
+  latest_recorded_at timestamp,
+  prev_value numeric,
+  ma7 numeric,
+  avg_value numeric,
+  latest_target text,
+  spark_values numeric[]
+)
+language sql
+stable
+security invoker  -- RLS on entries/metrics still applies
+as $$
+  select
+    m.id,
+    coalesce(s.entry_count, 0),
+    w.latest_value,
+    w.latest_recorded_at,
+    w.prev_value,
+    case when s.entry_count >= 7 then w.ma7 end,
+    s.value_sum / nullif(s.entry_count, 0),
+    t.target_action,
+    coalesce(w.spark_values, '{}')
+  from metrics m
+  -- Only metrics with at least one entry are listed.
+  cross join lateral (
+    select e.target_action
+    from entries e
+    where e.metric_id = m.id
+    order by e.recorded_at desc
+    limit 1
+  ) t
+  left join metric_entry_stats s on s.metric_id = m.id
+  left join lateral (
+    -- NULL values are "not measured" and never count towards stats.
+    select
+      max(r.recorded_at) as latest_recorded_at,
+      max(r.value) filter (where r.rn = 1) as latest_value,
+      max(r.value) filter (where r.rn = 2) as prev_value,
+      avg(r.value) filter (where r.rn <= 7) as ma7,
+      array_agg(r.value order by r.recorded_at) as spark_values
+    from (
+      select latest.value, latest.recorded_at, row_number() over (order by latest.recorded_at desc) as rn
+      from (
+        select e.value, e.recorded_at
+        from entries e
+        where e.metric_id = m.id
+          and e.value is not null
+        order by e.recorded_at desc
+        limit 12
+      ) latest
+    ) r
+  ) w on true
+  where not m.is_archived;
+$$;
+
+grant execute on function get_overview_summary() to authenticated;
@@ -0,0 +1,135 @@
+-- Lossless Parquet restore.
+-- import_bundle accepts a "categories" list, so a backup's categories are
+-- recreated even when no metric or change event references them.
+
+-- Bundle shape (all keys optional):
+-- {
+--   "import_id": uuid, "wipe": bool, "commit": bool (default true),
+--   "categories": [name],  (categories to create even when nothing references them)
+--   "metrics":  [{name, description, unit_name, category, unit_type, metric_kind,
+--                 range_start, range_end, is_archived, higher_is_better}],
+--   "entries":  [{metric, value, recorded_at, target_action}],
+--   "changes":  [{title, notes, category, recorded_at}]
+-- }
+-- Metrics and categories are referenced by (case-insensitive) name.
+create or replace function import_bundle(p_bundle jsonb)
+returns jsonb
+language plpgsql
+security invoker  -- RLS still applies to every table touched
+as $$
+declare
+  v_import_id uuid := coalesce((p_bundle->>'import_id')::uuid, gen_random_uuid());
+  v_categories int := 0;
+  v_metrics int := 0;
+  v_entries int := 0;
+  v_changes int := 0;
+begin
+  -- Abandoned imports should not pile up.
+  delete from import_staging
+  where user_id = auth.uid() and created_at < now() - interval '1 day';
+
+  insert into import_staging (import_id, bundle)
+  values (v_import_id, p_bundle - 'import_id' - 'wipe' - 'commit');
+
+  if not coalesce((p_bundle->>'commit')::boolean, true) then
+    return jsonb_build_object('import_id', v_import_id, 'committed', false);
+  end if;
+
+  if coalesce((p_bundle->>'wipe')::boolean, false) then
+    delete from change_events where user_id = auth.uid();
+    delete from entries where user_id = auth.uid();
+    delete from metrics where user_id = auth.uid();
+    delete from categories where user_id = auth.uid();
+  end if;
+
+  -- 1. Listed categories and those referenced by metrics or changes
+  --    (unique on lower(name), user_id).
+  insert into categories (name)
+  select distinct lower(trim(c.name))
+  from import_staging s
+  cross join lateral (
+    select x as name from jsonb_array_elements_text(coalesce(s.bundle->'categories', '[]')) x
+    union all
+    select x->>'category' from jsonb_array_elements(coalesce(s.bundle->'metrics', '[]')) x
+    union all
+    select x->>'category' from jsonb_array_elements(coalesce(s.bundle->'changes', '[]')) x
+  ) c
+  where s.import_id = v_import_id
+    and coalesce(trim(c.name), '') <> ''
+  on conflict do nothing;
+  get diagnostics v_categories = row_count;
+
+  -- 2. Metrics not present yet (first definition in the file wins).
+  insert into metrics (
+    name, description, unit_name, category_id, unit_type, metric_kind,
+    range_start, range_end, is_archived, higher_is_better
+  )
+  select distinct on (lower(trim(x->>'name')))
+    lower(trim(x->>'name')),
+    x->>'description',
+    x->>'unit_name',
+    cat.id,
+    coalesce(x->>'unit_type', 'float'),
+    x->>'metric_kind',
+    (x->>'range_start')::integer,
+    (x->>'range_end')::integer,
+    coalesce((x->>'is_archived')::boolean, false),
+    coalesce((x->>'higher_is_better')::boolean, true)
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'metrics', '[]')) with ordinality as t(x, ord)
+  left join categories cat
+    on lower(cat.name) = lower(trim(x->>'category')) and cat.user_id = auth.uid()
+  where s.import_id = v_import_id
+    and not exists (
+      select 1 from metrics m
+      where lower(m.name) = lower(trim(x->>'name')) and m.user_id = auth.uid()
+    )
+  order by lower(trim(x->>'name')), s.id, t.ord;
+  get diagnostics v_metrics = row_count;
+
+  -- 3. Entries, resolved by metric name.
+  insert into entries (metric_id, value, recorded_at, target_action)
+  select
+    m.id,
+    (x->>'value')::numeric,
+    (x->>'recorded_at')::timestamp,
+    nullif(trim(x->>'target_action'), '')
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'entries', '[]')) x
+  join (
+    select distinct on (lower(name)) id, lower(name) as key
+    from metrics
+    where user_id = auth.uid()
+    order by lower(name), created_at
+  ) m on m.key = lower(trim(x->>'metric'))
+  where s.import_id = v_import_id;
+  get diagnostics v_entries = row_count;
+
+  -- 4. Change events, resolved by category name.
+  insert into change_events (title, notes, category_id, recorded_at)
+  select
+    x->>'title',
+    nullif(trim(x->>'notes'), ''),
+    cat.id,
+    (x->>'recorded_at')::timestamp
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'changes', '[]')) x
+  left join categories cat
+    on lower(cat.name) = lower(trim(x->>'category')) and cat.user_id = auth.uid()
+  where s.import_id = v_import_id;
+  get diagnostics v_changes = row_count;
+
+  delete from import_staging where import_id = v_import_id;
+
+  return jsonb_build_object(
+    'import_id', v_import_id,
+    'committed', true,
+    'categories', v_categories,
+    'metrics', v_metrics,
+    'entries', v_entries,
+    'changes', v_changes
+  );
+end;
+$$;
+
+grant execute on function import_bundle(jsonb) to authenticated;
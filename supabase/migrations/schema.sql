@@ -49,8 +49,10 @@ create table entries (
   metric_id uuid references metrics(id) on delete cascade,
   value numeric,
   recorded_at timestamp not null, -- Support for specific times
+  target_action text,
   user_id uuid not null references auth.users default auth.uid(),
-  created_at timestamptz default now()
+  created_at timestamptz default now(),
+  updated_at timestamptz not null default now() -- Delta sync watermark
 );
 
 create table change_events (
@@ -67,6 +69,9 @@ create table change_events (
 create unique index categories_name_user_idx on categories (lower(name), user_id);
 create index entries_metric_id_idx on entries (metric_id);
 create index entries_recorded_at_idx on entries (recorded_at);
+create index entries_metric_recorded_at_idx on entries (metric_id, recorded_at desc);
+create index entries_user_updated_at_idx on entries (user_id, updated_at);
+create index entries_metric_updated_at_idx on entries (metric_id, updated_at);
 create index metrics_category_id_idx on metrics (category_id);
 create index idx_active_metrics on metrics (user_id) where is_archived = false;
 create index change_events_user_id_idx on change_events (user_id);
@@ -123,3 +128,466 @@ CREATE TRIGGER trg_validate_entry_range
 BEFORE INSERT OR UPDATE ON entries
 FOR EACH ROW
 EXECUTE FUNCTION validate_entry_range();
+
+-- 7. OVERVIEW SUMMARY
+-- One compact row per metric for the Overview grid (see models.get_overview_summary).
+-- entry_count/avg_value come from running totals kept by statement-level triggers;
+-- the rest reads each metric's newest 12 measured rows, so load time does not grow
+-- with history.
+
+create table metric_entry_stats (
+  metric_id uuid primary key references metrics(id) on delete cascade,
+  user_id uuid not null references auth.users default auth.uid(),
+  entry_count bigint not null default 0, -- measured (non-NULL) entries only
+  value_sum numeric not null default 0
+);
+
+alter table metric_entry_stats enable row level security;
+
+create policy "Users can manage their own entry stats" on metric_entry_stats
+  for all to authenticated using (auth.uid() = user_id);
+
+create or replace function maintain_metric_entry_stats()
+returns trigger as $$
+begin
+  -- Transition tables only exist for their own event; UPDATE subtracts the old
+  -- rows, then adds the new ones. Deletes never insert, so cascades from a
+  -- deleted metric leave nothing behind.
+  if tg_op in ('UPDATE', 'DELETE') then
+    update metric_entry_stats s
+    set entry_count = s.entry_count - d.n,
+        value_sum = s.value_sum - d.total
+    from (
+      select metric_id, count(*) as n, sum(value) as total
+      from old_rows
+      where value is not null and metric_id is not null
+      group by metric_id
+    ) d
+    where s.metric_id = d.metric_id;
+  end if;
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into metric_entry_stats (metric_id, user_id, entry_count, value_sum)
+    select metric_id, user_id, count(*), sum(value)
+    from new_rows
+    where value is not null and metric_id is not null
+    group by metric_id, user_id
+    on conflict (metric_id) do update
+      set entry_count = metric_entry_stats.entry_count + excluded.entry_count,
+          value_sum = metric_entry_stats.value_sum + excluded.value_sum;
+  end if;
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_entries_stats_insert after insert on entries
+  referencing new table as new_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+create trigger trg_entries_stats_update after update on entries
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+create trigger trg_entries_stats_delete after delete on entries
+  referencing old table as old_rows
+  for each statement execute function maintain_metric_entry_stats();
+
+create or replace function get_overview_summary()
+returns table (
+  metric_id uuid,
+  entry_count bigint,
+  latest_value numeric,
+  latest_recorded_at timestamp,
+  prev_value numeric,
+  ma7 numeric,
+  avg_value numeric,
+  latest_target text,
+  spark_values numeric[]
+)
+language sql
+stable
+security invoker  -- RLS on entries/metrics still applies
+as $$
+  select
+    m.id,
+    coalesce(s.entry_count, 0),
+    w.latest_value,
+    w.latest_recorded_at,
+    w.prev_value,
+    case when s.entry_count >= 7 then w.ma7 end,
+    s.value_sum / nullif(s.entry_count, 0),
+    t.target_action,
+    coalesce(w.spark_values, '{}')
+  from metrics m
+  -- Only metrics with at least one entry are listed.
+  cross join lateral (
+    select e.target_action
+    from entries e
+    where e.metric_id = m.id
+    order by e.recorded_at desc
+    limit 1
+  ) t
+  left join metric_entry_stats s on s.metric_id = m.id
+  left join lateral (
+    -- NULL values are "not measured" and never count towards stats.
+    select
+      max(r.recorded_at) as latest_recorded_at,
+      max(r.value) filter (where r.rn = 1) as latest_value,
+      max(r.value) filter (where r.rn = 2) as prev_value,
+      avg(r.value) filter (where r.rn <= 7) as ma7,
+      array_agg(r.value order by r.recorded_at) as spark_values
+    from (
+      select latest.value, latest.recorded_at, row_number() over (order by latest.recorded_at desc) as rn
+      from (
+        select e.value, e.recorded_at
+        from entries e
+        where e.metric_id = m.id
+          and e.value is not null
+        order by e.recorded_at desc
+        limit 12
+      ) latest
+    ) r
+  ) w on true
+  where not m.is_archived;
+$$;
+
+grant execute on function get_overview_summary() to authenticated;
+
+-- 8. TRANSACTIONAL IMPORT
+-- Backup restore stages chunks here and applies them atomically (see models.import_bundle).
+
+create table import_staging (
+  id bigserial primary key,
+  import_id uuid not null,
+  bundle jsonb not null,
+  user_id uuid not null references auth.users default auth.uid(),
+  created_at timestamptz default now()
+);
+
+create index import_staging_import_id_idx on import_staging (import_id);
+
+alter table import_staging enable row level security;
+
+create policy "Users can manage their own import staging" on import_staging
+  for all to authenticated using (auth.uid() = user_id);
+
+-- Bundle shape (all keys optional):
+-- {
+--   "import_id": uuid, "wipe": bool, "commit": bool (default true),
+--   "categories": [name],  (categories to create even when nothing references them)
+--   "metrics":  [{name, description, unit_name, category, unit_type, metric_kind,
+--                 range_start, range_end, is_archived, higher_is_better}],
+--   "entries":  [{metric, value, recorded_at, target_action}],
+--   "changes":  [{title, notes, category, recorded_at}]
+-- }
+-- Metrics and categories are referenced by (case-insensitive) name.
+create or replace function import_bundle(p_bundle jsonb)
+returns jsonb
+language plpgsql
+security invoker  -- RLS still applies to every table touched
+as $$
+declare
+  v_import_id uuid := coalesce((p_bundle->>'import_id')::uuid, gen_random_uuid());
+  v_categories int := 0;
+  v_metrics int := 0;
+  v_entries int := 0;
+  v_changes int := 0;
+begin
+  -- Abandoned imports should not pile up.
+  delete from import_staging
+  where user_id = auth.uid() and created_at < now() - interval '1 day';
+
+  insert into import_staging (import_id, bundle)
+  values (v_import_id, p_bundle - 'import_id' - 'wipe' - 'commit');
+
+  if not coalesce((p_bundle->>'commit')::boolean, true) then
+    return jsonb_build_object('import_id', v_import_id, 'committed', false);
+  end if;
+
+  if coalesce((p_bundle->>'wipe')::boolean, false) then
+    delete from change_events where user_id = auth.uid();
+    delete from entries where user_id = auth.uid();
+    delete from metrics where user_id = auth.uid();
+    delete from categories where user_id = auth.uid();
+  end if;
+
+  -- 1. Listed categories and those referenced by metrics or changes
+  --    (unique on lower(name), user_id).
+  insert into categories (name)
+  select distinct lower(trim(c.name))
+  from import_staging s
+  cross join lateral (
+    select x as name from jsonb_array_elements_text(coalesce(s.bundle->'categories', '[]')) x
+    union all
+    select x->>'category' from jsonb_array_elements(coalesce(s.bundle->'metrics', '[]')) x
+    union all
+    select x->>'category' from jsonb_array_elements(coalesce(s.bundle->'changes', '[]')) x
+  ) c
+  where s.import_id = v_import_id
+    and coalesce(trim(c.name), '') <> ''
+  on conflict do nothing;
+  get diagnostics v_categories = row_count;
+
+  -- 2. Metrics not present yet (first definition in the file wins).
+  insert into metrics (
+    name, description, unit_name, category_id, unit_type, metric_kind,
+    range_start, range_end, is_archived, higher_is_better
+  )
+  select distinct on (lower(trim(x->>'name')))
+    lower(trim(x->>'name')),
+    x->>'description',
+    x->>'unit_name',
+    cat.id,
+    coalesce(x->>'unit_type', 'float'),
+    x->>'metric_kind',
+    (x->>'range_start')::integer,
+    (x->>'range_end')::integer,
+    coalesce((x->>'is_archived')::boolean, false),
+    coalesce((x->>'higher_is_better')::boolean, true)
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'metrics', '[]')) with ordinality as t(x, ord)
+  left join categories cat
+    on lower(cat.name) = lower(trim(x->>'category')) and cat.user_id = auth.uid()
+  where s.import_id = v_import_id
+    and not exists (
+      select 1 from metrics m
+      where lower(m.name) = lower(trim(x->>'name')) and m.user_id = auth.uid()
+    )
+  order by lower(trim(x->>'name')), s.id, t.ord;
+  get diagnostics v_metrics = row_count;
+
+  -- 3. Entries, resolved by metric name.
+  insert into entries (metric_id, value, recorded_at, target_action)
+  select
+    m.id,
+    (x->>'value')::numeric,
+    (x->>'recorded_at')::timestamp,
+    nullif(trim(x->>'target_action'), '')
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'entries', '[]')) x
+  join (
+    select distinct on (lower(name)) id, lower(name) as key
+    from metrics
+    where user_id = auth.uid()
+    order by lower(name), created_at
+  ) m on m.key = lower(trim(x->>'metric'))
+  where s.import_id = v_import_id;
+  get diagnostics v_entries = row_count;
+
+  -- 4. Change events, resolved by category name.
+  insert into change_events (title, notes, category_id, recorded_at)
+  select
+    x->>'title',
+    nullif(trim(x->>'notes'), ''),
+    cat.id,
+    (x->>'recorded_at')::timestamp
+  from import_staging s
+  cross join lateral jsonb_array_elements(coalesce(s.bundle->'changes', '[]')) x
+  left join categories cat
+    on lower(cat.name) = lower(trim(x->>'category')) and cat.user_id = auth.uid()
+  where s.import_id = v_import_id;
+  get diagnostics v_changes = row_count;
+
+  delete from import_staging where import_id = v_import_id;
+
+  return jsonb_build_object(
+    'import_id', v_import_id,
+    'committed', true,
+    'categories', v_categories,
+    'metrics', v_metrics,
+    'entries', v_entries,
+    'changes', v_changes
+  );
+end;
+$$;
+
+grant execute on function import_bundle(jsonb) to authenticated;
+
+-- 9. INCREMENTAL SYNC
+-- `updated_at` plus delete tombstones let clients fetch only entries changed
+-- since their last watermark (see models.get_entries).
+
+create or replace function set_entry_updated_at()
+returns trigger as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$ language plpgsql;
+
+create trigger trg_entries_updated_at
+before update on entries
+for each row
+execute function set_entry_updated_at();
+
+create table entry_tombstones (
+  entry_id uuid primary key,
+  metric_id uuid,
+  user_id uuid not null references auth.users default auth.uid(),
+  deleted_at timestamptz not null default now()
+);
+
+create index entry_tombstones_user_deleted_at_idx on entry_tombstones (user_id, deleted_at);
+create index entry_tombstones_metric_deleted_at_idx on entry_tombstones (metric_id, deleted_at);
+
+alter table entry_tombstones enable row level security;
+
+create policy "Users can manage their own entry tombstones" on entry_tombstones
+  for all to authenticated using (auth.uid() = user_id);
+
+create or replace function record_entry_tombstone()
+returns trigger as $$
+begin
+  insert into entry_tombstones (entry_id, metric_id, user_id)
+  values (old.id, old.metric_id, old.user_id)
+  on conflict (entry_id) do update set deleted_at = excluded.deleted_at;
+  return old;
+end;
+$$ language plpgsql;
+
+create trigger trg_entries_tombstone
+after delete on entries
+for each row
+execute function record_entry_tombstone();
+
+-- Tombstones are kept for 30 days; clients whose watermark is older resync fully.
+-- Pruned once per DELETE statement (bulk wipes and cascades included), not per row.
+-- Runs as the deleting user, so RLS scopes the prune to their own tombstones.
+create or replace function prune_entry_tombstones()
+returns trigger as $$
+begin
+  delete from entry_tombstones
+  where deleted_at < now() - interval '30 days';
+  return null;
+end;
+$$ language plpgsql;
+
+create trigger trg_entries_prune_tombstones
+after delete on entries
+for each statement
+execute function prune_entry_tombstones();
+
+-- 10. PUSH INVALIDATION
+-- Statement-level triggers announce committed changes on `quantifi_changes`
+-- so app servers (change_listener.py) evict only the affected user's caches.
+
+create or replace function change_notification_key(p_table text, p_row jsonb)
+returns jsonb
+language sql
+immutable
+as $$
+  select jsonb_build_object(
+    'user_id', p_row->>'user_id',
+    'metric_id', case p_table
+      when 'entries' then p_row->>'metric_id'
+      when 'metrics' then p_row->>'id'
+    end
+  )
+$$;
+
+create or replace function notify_row_changes()
+returns trigger as $$
+declare
+  v_keys jsonb;
+  r record;
+begin
+  -- Transition tables only exist for their own event, hence one branch each.
+  if tg_op = 'INSERT' then
+    select jsonb_agg(distinct change_notification_key(tg_table_name, to_jsonb(n))) into v_keys from new_rows n;
+  elsif tg_op = 'DELETE' then
+    select jsonb_agg(distinct change_notification_key(tg_table_name, to_jsonb(o))) into v_keys from old_rows o;
+  else
+    select jsonb_agg(distinct k) into v_keys
+    from (
+      select change_notification_key(tg_table_name, to_jsonb(n)) as k from new_rows n
+      union all
+      select change_notification_key(tg_table_name, to_jsonb(o)) from old_rows o
+    ) s;
+  end if;
+
+  for r in
+    select distinct user_id, metric_id
+    from (
+      select
+        k->>'user_id' as user_id,
+        case when count(*) over (partition by k->>'user_id') > 20 then null else k->>'metric_id' end as metric_id
+      from jsonb_array_elements(coalesce(v_keys, '[]')) k
+    ) s
+  loop
+    perform pg_notify(
+      'quantifi_changes',
+      json_build_object('table', tg_table_name, 'user_id', r.user_id, 'metric_id', r.metric_id)::text
+    );
+  end loop;
+  return null;
+end;
+$$ language plpgsql;
+
+do $$
+declare
+  t text;
+begin
+  foreach t in array array['entries', 'metrics', 'categories', 'change_events'] loop
+    execute format(
+      'create trigger trg_%1$s_notify_insert after insert on %1$I
+         referencing new table as new_rows
+         for each statement execute function notify_row_changes()', t);
+    execute format(
+      'create trigger trg_%1$s_notify_update after update on %1$I
+         referencing old table as old_rows new table as new_rows
+         for each statement execute function notify_row_changes()', t);
+    execute format(
+      'create trigger trg_%1$s_notify_delete after delete on %1$I
+         referencing old table as old_rows
+         for each statement execute function notify_row_changes()', t);
+  end loop;
+end $$;
+
+-- 11. BATCHED EDITOR SAVE
+-- Applies one metric's data-editor diff in a single transaction and returns
+-- the written rows (see models.commit_entry_edits).
+-- Updates/inserts: [{id (updates only), value, recorded_at, target_action (inserts only)}].
+
+create or replace function commit_entry_edits(
+  p_metric_id uuid,
+  p_deletes uuid[] default '{}',
+  p_updates jsonb default '[]',
+  p_inserts jsonb default '[]'
+)
+returns jsonb
+language plpgsql
+security invoker  -- RLS on entries still applies
+as $$
+declare
+  v_deleted jsonb;
+  v_updated jsonb;
+  v_inserted jsonb;
+begin
+  with d as (
+    delete from entries
+    where metric_id = p_metric_id and id = any(coalesce(p_deletes, '{}'))
+    returning id
+  )
+  select coalesce(jsonb_agg(id), '[]') into v_deleted from d;
+
+  with u as (
+    update entries e
+    set value = x.value, recorded_at = x.recorded_at
+    from jsonb_to_recordset(coalesce(p_updates, '[]')) as x(id uuid, value numeric, recorded_at timestamp)
+    where e.id = x.id and e.metric_id = p_metric_id
+    returning e.*
+  )
+  select coalesce(jsonb_agg(to_jsonb(u)), '[]') into v_updated from u;
+
+  with i as (
+    insert into entries (metric_id, value, recorded_at, target_action)
+    select p_metric_id, x.value, x.recorded_at, x.target_action
+    from jsonb_to_recordset(coalesce(p_inserts, '[]')) as x(value numeric, recorded_at timestamp, target_action text)
+    returning *
+  )
+  select coalesce(jsonb_agg(to_jsonb(i)), '[]') into v_inserted from i;
+
+  return jsonb_build_object('deleted', v_deleted, 'updated', v_updated, 'inserted', v_inserted);
+end;
+$$;
+
+grant execute on function commit_entry_edits(uuid, uuid[], jsonb, jsonb) to authenticated;
@@ -1,3 +1,7 @@
+import importlib.util
+import threading
+
+import httpx
 import streamlit as st
 from supabase import create_client, ClientOptions
 
@@ -7,6 +11,67 @@ _SB_ADMIN_CACHE_KEY = "supabase_admin_client"
 _sb_fallback = None
 _sb_admin_fallback = None
 
+# One keep-alive pool per server process, shared by every session's client.
+# Auth headers are sent per request by supabase-py, so nothing user-specific
+# lives on the transport; only the session/token stays in session state.
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE = 16
+HTTP_KEEPALIVE_EXPIRY = 60
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=10.0)  # Default; models sends each query with its policy's timeout
+
+_http_client = None
+_http_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """Process-wide pooled transport (HTTP/2 when the optional `h2` package is installed)."""
+    global _http_client
+    with _http_lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+            )
+        return _http_client
+
+_async_http_client = None
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Process-wide async pool for models' concurrent reads. Only use it from the
+    models background event loop: async connections belong to one loop.
+    """
+    global _async_http_client
+    with _http_lock:
+        if _async_http_client is None or _async_http_client.is_closed:
+            _async_http_client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=HTTP_TIMEOUT,
+                follow_redirects=True,
+            )
+        return _async_http_client
+
+def _user_options() -> ClientOptions:
+    return ClientOptions(
+        auto_refresh_token=True,
+        persist_session=True,
+        flow_type="pkce",
+        httpx_client=get_http_client(),
+    )
+
+def _admin_options() -> ClientOptions:
+    return ClientOptions(httpx_client=get_http_client())
+
 def _can_use_session_state() -> bool:
     try:
         _ = st.session_state
@@ -23,28 +88,18 @@ def get_supabase():
 
     if _can_use_session_state():
         if _SB_CACHE_KEY not in st.session_state:
-            options = ClientOptions(
-                auto_refresh_token=True,
-                persist_session=True,
-                flow_type="pkce",
-            )
             st.session_state[_SB_CACHE_KEY] = create_client(
                 st.secrets["SUPABASE_URL"],
                 st.secrets["SUPABASE_KEY"],
-                options=options,
+                options=_user_options(),
             )
         return st.session_state[_SB_CACHE_KEY]
 
     if _sb_fallback is None:
-        options = ClientOptions(
-            auto_refresh_token=True,
-            persist_session=True,
-            flow_type="pkce",
-        )
         _sb_fallback = create_client(
             st.secrets["SUPABASE_URL"],
             st.secrets["SUPABASE_KEY"],
-            options=options,
+            options=_user_options(),
         )
     return _sb_fallback
 
@@ -56,6 +111,7 @@ def get_supabase_admin():
             st.session_state[_SB_ADMIN_CACHE_KEY] = create_client(
                 st.secrets["SUPABASE_URL"],
                 st.secrets["SUPABASE_SERVICE_ROLE_KEY"],
+                options=_admin_options(),
             )
         return st.session_state[_SB_ADMIN_CACHE_KEY]
 
@@ -63,6 +119,7 @@ def get_supabase_admin():
         _sb_admin_fallback = create_client(
             st.secrets["SUPABASE_URL"],
             st.secrets["SUPABASE_SERVICE_ROLE_KEY"],
+            options=_admin_options(),
         )
     return _sb_admin_fallback
 
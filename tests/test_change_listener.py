@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+
+pytest.importorskip("streamlit")
+
+
+import change_listener  # noqa: E402
+import models  # noqa: E402
+
+
+def _notify(table, user_id, metric_id=None):
+    return json.dumps({"table": table, "user_id": user_id, "metric_id": metric_id})
+
+
+def test_notifications_evict_only_the_affected_user_and_metric(monkeypatch):
+    """A change notification evicts only the named user's reads of that table (and metric)."""
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    cache = models._QUERY_CACHE
+    for user_id in ("u1", "u2"):
+        for mid in ("m1", "m2"):
+            cache.put(user_id, ("get_latest_entry_only", (("metric_id", mid),)), {"id": mid}, 60, frozenset({"entries"}), mid)
+        cache.put(user_id, ("get_metrics", ()), [], 60, frozenset({"metrics"}))
+
+    assert change_listener.handle_notification(_notify("entries", "u1", "m1"))
+    assert cache.get("u1", ("get_latest_entry_only", (("metric_id", "m1"),))) is models._MISS
+    assert cache.get("u1", ("get_latest_entry_only", (("metric_id", "m2"),))) == {"id": "m2"}
+    assert cache.get("u2", ("get_latest_entry_only", (("metric_id", "m1"),))) == {"id": "m1"}
+    assert cache.get("u1", ("get_metrics", ())) == []
+
+    # Collapsed (metric_id null) notifications evict every read of the table.
+    assert change_listener.handle_notification(_notify("entries", "u2"))
+    assert cache.get("u2", ("get_latest_entry_only", (("metric_id", "m2"),))) is models._MISS
+    assert cache.get("u2", ("get_metrics", ())) == []
+
+    assert not change_listener.handle_notification("not json")
+    assert not change_listener.handle_notification(_notify("auth_users", "u1"))
+
+
+def test_write_through_echo_is_not_evicted(monkeypatch):
+    """The echo of this session's own write-through keeps the patched cache; later changes evict."""
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    monkeypatch.setattr(models, "_echo_tokens", {})
+    monkeypatch.setattr(models, "_push_invalidation", True)
+    key = ("get_latest_entry_only", (("metric_id", "m1"),))
+    models._QUERY_CACHE.put("u1", key, {"id": "e7"}, 60, frozenset({"entries"}), "m1")
+
+    models._expect_echo("u1", "entries", "m1")
+    assert not change_listener.handle_notification(_notify("entries", "u1", "m1"))
+    assert models._QUERY_CACHE.get("u1", key) == {"id": "e7"}
+
+    # A second change (another session or device) still evicts.
+    assert change_listener.handle_notification(_notify("entries", "u1", "m1"))
+    assert models._QUERY_CACHE.get("u1", key) is models._MISS
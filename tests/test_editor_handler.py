@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+
+pytest.importorskip("streamlit")
+
+
+from logic.editor_handler import EntryDraft, build_entry_diff  # noqa: E402
+
+
+def _base():
+    return pd.DataFrame({
+        "id": ["a", "b", "c", "d"],
+        "value": [1.0, 2.0, 3.0, 4.0],
+        "recorded_at": pd.to_datetime(["2026-02-01T08:00", "2026-02-02T08:00", "2026-02-03T08:00", "2026-02-04T08:00"], utc=True),
+    })
+
+
+def _draft():
+    draft = EntryDraft(_base())
+    draft.apply("a", {"Select": True})
+    draft.apply("b", {"value": 2.0})
+    draft.apply("c", {"value": None})
+    draft.added = [{"value": 7, "recorded_at": "2026-02-05T08:00:00"}, {"value": None}]
+    return draft
+
+
+def test_build_entry_diff_splits_deletes_updates_and_inserts():
+    """The whole edit session becomes one diff; 'not measured' stays null."""
+    deletes, updates, inserts = build_entry_diff(_draft())
+    assert deletes == ["a"]
+    assert [u["id"] for u in updates] == ["b", "c"]
+    assert updates[0]["value"] == 2.0 and updates[1]["value"] is None
+    assert updates[0]["recorded_at"].startswith("2026-02-02T08:00:00")
+    assert inserts == [{"value": 7.0, "recorded_at": "2026-02-05T08:00:00"}]
+
+
+def test_draft_overlay_leaves_the_base_untouched():
+    """Edits live in the overlay; the view applies them and clearing is O(edits)."""
+    base = _base()
+    draft = EntryDraft(base)
+    draft.apply("b", {"value": 9.5})
+    draft.apply("d", {"Select": True})
+    draft.apply("d", {"Select": False})
+    draft.apply("c", {"Select": True})
+
+    view = draft.view()
+    assert list(view["Change Log"]) == ["", "🟡", "🔴", ""]
+    assert list(view["Select"]) == [False, False, True, False]
+    assert view.loc[view["id"] == "b", "value"].item() == 9.5
+    assert draft.base is base and base["value"].tolist() == [1.0, 2.0, 3.0, 4.0]
+
+    # Rows with pending edits stay visible after the base moves to another window.
+    draft.rebase(base.iloc[:1])
+    assert set(draft.view()["id"]) == {"a", "b", "c"}
+
+    draft.clear()
+    assert not draft.dirty and draft.view()["Change Log"].eq("").all()
+
+
+def test_batched_editor_rows_keep_counters_in_step():
+    """One `edited_rows` batch lands in the overlay; counters match the pending table."""
+    draft = EntryDraft(_base())
+    draft.apply_rows({
+        "a": {"recorded_at": "2026-03-01T10:00:00"},
+        "b": {"value": 5, "Select": True},
+        "c": {"value": None},
+    })
+    draft.added = [{"value": 7, "recorded_at": "2026-02-05T08:00:00"}, {"value": None}]
+    assert draft.counts == {"del": 1, "upd": 2, "add": 2}
+    assert draft.edits["a"]["value"] == 1.0  # Untouched column keeps the base value
+    assert str(draft.edits["a"]["recorded_at"]) == "2026-03-01 10:00:00+00:00"
+    assert pd.isna(draft.edits["c"]["value"])
+
+    draft.apply("b", {"Select": False})
+    assert draft.counts["upd"] == 3
+    assert list(draft.pending()["Change Log"]) == ["🟡", "🟡", "🟡", "🟢"]
+
+
+def test_data_editor_fetches_only_the_selected_window():
+    """The editor queries bounds + the selected range instead of the full history."""
+    import logging
+
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger(
+        "streamlit.runtime.scriptrunner_utils.script_run_context"
+    ).setLevel(logging.ERROR)
+
+    script = """
+import streamlit as st
+import models
+from ui import data_editor
+
+calls = st.session_state.setdefault("window_calls", [])
+
+def _fake_window(mid, start, end):
+    calls.append((start.isoformat(), end.isoformat()))
+    return [{"id": "e1", "metric_id": mid, "value": 3, "recorded_at": "2026-03-10T08:00:00"}]
+
+def _no_full_load(metric_id=None):
+    raise AssertionError("full history loaded")
+
+patches = {
+    (models, "get_entry_bounds"): lambda mid: ("2024-01-01T08:00:00", "2026-03-10T08:00:00"),
+    (models, "get_entries_window"): _fake_window,
+    (models, "get_entries"): _no_full_load,
+    (data_editor.visualize, "show_visualizations"): lambda *a, **k: st.text("viz-ok"),
+}
+originals = {key: getattr(*key) for key in patches}
+try:
+    for (module, name), fake in patches.items():
+        setattr(module, name, fake)
+    data_editor.show_data_management_suite({"id": "m1", "name": "weight", "unit_name": "kg"})
+finally:
+    for (module, name), original in originals.items():
+        setattr(module, name, original)
+"""
+    at = AppTest.from_string(script)
+    at.run()
+
+    assert len(at.exception) == 0
+    assert at.session_state["window_calls"] == [("2026-02-07", "2026-03-10")]  # Default "Month" pill
+    assert list(at.session_state["data_m1"].base["id"]) == ["e1"]
+    assert any(el.value == "viz-ok" for el in at.text)
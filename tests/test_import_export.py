@@ -98,3 +98,334 @@ def test_validate_import_frames_reports_entry_and_change_errors():
     assert any("Invalid Type" in e for e in errors)
     assert any("Change Title cannot be empty" in e for e in errors)
 
+
+
+def test_build_metric_payload_normalizes_category_and_aligns_kind():
+    """Metric payloads reference categories by normalized name and align unit_type to kind."""
+    from ui.importer import build_metric_payload
+
+    row = pd.Series(
+        {
+            "Metric": " Sleep ",
+            "Description": None,
+            "Unit": "Quality",
+            "Category": " Health ",
+            "Type": "float",
+            "Kind": "score",
+            "Min": 1,
+            "Max": 5,
+            "Archived": None,
+            "HigherIsBetter": None,
+        }
+    )
+    payload = build_metric_payload(row)
+    assert payload["name"] == "sleep"
+    assert payload["category"] == "health"
+    assert payload["metric_kind"] == "score"
+    assert payload["unit_type"] == "integer_range"
+    assert payload["range_start"] == 1 and payload["range_end"] == 5
+    assert payload["higher_is_better"] is True
+    assert payload["is_archived"] is False
+
+
+def test_validate_import_frames_large_csv_is_capped(tmp_path):
+    """A 500k-row CSV dry run reports each check's errors capped with one overflow line."""
+    import numpy as np
+
+    from ui.importer import MAX_ERRORS_PER_CHECK, parse_import_frames, validate_import_frames
+
+    n = 500_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "RowType": "entry",
+            "Metric": rng.choice(["weight", "sleep", "steps"], size=n),
+            "Value": rng.normal(50, 10, size=n).round(2).astype(str),
+            "Date": "2026-02-01 12:00:00",
+            "Type": rng.choice(["float", "integer", "integer_range"], size=n),
+            "Kind": "",
+            "Min": 1,
+            "Max": 5,
+            "Archived": False,
+        }
+    )
+    df.loc[::1000, "Value"] = "oops"  # 500 invalid values
+    path = tmp_path / "big.csv"
+    df.to_csv(path, index=False)
+
+    df_entries, df_changes = parse_import_frames(pd.read_csv(path))
+    errors = validate_import_frames(df_entries, df_changes)
+
+    value_errors = [e for e in errors if "is not a valid number" in e]
+    assert len(value_errors) == MAX_ERRORS_PER_CHECK
+    assert value_errors[0] == "Row 2: Value 'oops' is not a valid number."
+    assert errors[-1] == f"... and {500 - MAX_ERRORS_PER_CHECK} more rows with an invalid Value."
+    assert len(errors) == MAX_ERRORS_PER_CHECK + 1
+
+
+def test_build_export_frame_large_history_is_ordered():
+    """100k entries build the export frame column-wise, newest first, with every row kept."""
+    from models import EXPORT_COLUMNS, build_export_frame
+
+    metrics = [
+        {
+            "name": name,
+            "description": "",
+            "unit_name": "u",
+            "unit_type": "float",
+            "metric_kind": "quantitative",
+            "higher_is_better": True,
+            "range_start": None,
+            "range_end": None,
+            "is_archived": False,
+            "categories": {"name": "body"},
+        }
+        for name in ("weight", "sleep", "steps")
+    ]
+    entries = [
+        {
+            "recorded_at": f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00.{i % 1000:03d}",
+            "value": i,
+            "target_action": None,
+            "metrics": dict(metrics[i % 3]),
+        }
+        for i in range(100_000)
+    ]
+    changes = [{"recorded_at": "2026-06-01T08:00:00+02:00", "title": "Moved", "notes": None, "categories": None}]
+
+    frame = build_export_frame(entries, changes)
+
+    assert list(frame.columns) == EXPORT_COLUMNS
+    assert len(frame) == 100_001
+    assert frame["Date"].is_monotonic_decreasing
+    change = frame[frame["RowType"] == "change"].iloc[0]
+    assert change["Date"] == "2026-06-01 06:00:00"
+    assert change["Category"] == "None"
+    assert set(frame.loc[frame["RowType"] == "entry", "Metric"]) == {"weight", "sleep", "steps"}
+    assert (frame["RowType"] == "entry").sum() == 100_000
+
+
+def test_build_import_bundles_splits_rows_and_sends_metrics_once():
+    """Import bundles respect the per-call row limit and carry metric definitions once."""
+    from ui.importer import build_import_bundles
+
+    df_entries = pd.DataFrame(
+        {
+            "Metric": ["Weight", "weight", "steps"],
+            "Value": [80, None, 1000],
+            "Date": ["2026-02-01 12:00:00", "2026-02-02 12:00:00", "2026-02-03 12:00:00"],
+            "Type": ["float", "float", "integer"],
+            "Archived": [False, False, False],
+        }
+    )
+    df_changes = pd.DataFrame(
+        [{"Title": "Started running", "Notes": None, "Date": "2026-02-04", "Category": "Fitness"}]
+    )
+
+    bundles = build_import_bundles(df_entries, df_changes, rows_per_call=2)
+
+    assert [len(b["entries"]) for b in bundles] == [2, 1, 0]
+    assert [len(b["changes"]) for b in bundles] == [0, 0, 1]
+    assert [m["name"] for m in bundles[0]["metrics"]] == ["weight", "steps"]
+    assert all(not b["metrics"] for b in bundles[1:])
+    assert bundles[0]["entries"][1] == {
+        "metric": "weight",
+        "value": None,
+        "recorded_at": "2026-02-02T12:00:00",
+        "target_action": None,
+    }
+    assert bundles[2]["changes"][0]["category"] == "fitness"
+
+
+def test_import_payloads_parse_dates_column_wise():
+    """Entry/change payloads parse the Date column once and normalize mixed offsets to UTC."""
+    from ui.importer import _build_change_payloads, _build_entry_payloads
+
+    df_entries = pd.DataFrame(
+        {
+            "Metric": [" Mood ", "mood"],
+            "Value": ["3", " "],
+            "Date": ["2026-02-01T08:00:00+02:00", "2026-02-02T08:00:00.5Z"],
+            "Target": [None, " Increase "],
+        }
+    )
+    assert _build_entry_payloads(df_entries) == [
+        {"metric": "mood", "value": 3.0, "recorded_at": "2026-02-01T06:00:00+00:00", "target_action": None},
+        {"metric": "mood", "value": None, "recorded_at": "2026-02-02T08:00:00.500000+00:00", "target_action": "Increase"},
+    ]
+
+    df_changes = pd.DataFrame([{"Title": " Moved ", "Notes": " ", "Date": "2026-02-04", "Category": " Home "}])
+    assert _build_change_payloads(df_changes) == [
+        {"title": "Moved", "notes": None, "category": "home", "recorded_at": "2026-02-04T00:00:00"}
+    ]
+
+
+def test_validate_import_frames_reports_bad_dates():
+    """The dry run flags empty and unparseable entry/change dates before anything is staged."""
+    from ui.importer import validate_import_frames
+
+    df_entries = pd.DataFrame(
+        {
+            "Metric": ["weight"] * 3,
+            "Value": [80, 81, 82],
+            "Date": ["2026-02-01", "someday", None],
+            "Type": ["float"] * 3,
+            "Archived": [False] * 3,
+        }
+    )
+    df_changes = pd.DataFrame([{"Title": "Moved", "Date": "2026-13-45"}])
+
+    assert validate_import_frames(df_entries, df_changes) == [
+        "Row 4: Entry Date cannot be empty.",
+        "Row 3: Date 'someday' is not a valid date.",
+        "Row 2: Change Date '2026-13-45' is not a valid date.",
+    ]
+
+
+def test_failed_upload_discards_staged_bundles(monkeypatch):
+    """A bundle that fails after earlier ones were staged drops the staged rows for that import."""
+    import io
+
+    import models
+    import ui.importer as importer
+
+    sent, discarded = [], []
+
+    def fake_import_bundle(bundle):
+        sent.append(bundle)
+        return None if len(sent) == 2 else {"committed": False}
+
+    bundles = importer.build_import_bundles
+    monkeypatch.setattr(importer, "build_import_bundles", lambda e, c, **kw: bundles(e, c, rows_per_call=1, **kw))
+    monkeypatch.setattr(importer.st, "button", lambda *a, **k: True)
+    monkeypatch.setattr(models, "import_bundle", fake_import_bundle)
+    monkeypatch.setattr(models, "discard_import", discarded.append)
+
+    csv = io.StringIO(
+        "RowType,Metric,Value,Date,Type,Archived\n"
+        "entry,weight,80,2026-02-01,float,False\n"
+        "entry,weight,81,2026-02-02,float,False\n"
+    )
+    importer._handle_import_logic(csv, wipe_first=False)
+
+    assert len(sent) == 2
+    assert discarded == [sent[0]["import_id"]]
+    assert not any(b.get("commit") for b in sent)
+
+
+def test_commit_timeout_keeps_staged_rows_and_reports_unknown_outcome(monkeypatch):
+    """A commit that times out is not reported as rolled back and its staged rows are kept."""
+    import io
+
+    import models
+    import ui.importer as importer
+
+    sent, discarded, warnings = [], [], []
+
+    def fake_import_bundle(bundle):
+        sent.append(bundle)
+        return {"committed": None} if bundle.get("commit") else {"committed": False}
+
+    monkeypatch.setattr(importer.st, "button", lambda *a, **k: True)
+    monkeypatch.setattr(importer.st, "warning", warnings.append)
+    monkeypatch.setattr(models, "import_bundle", fake_import_bundle)
+    monkeypatch.setattr(models, "discard_import", discarded.append)
+    monkeypatch.setattr(models, "get_metrics", lambda include_archived=False: [{"id": "m1"}])
+
+    csv = io.StringIO("RowType,Metric,Value,Date,Type,Archived\nentry,weight,80,2026-02-01,float,False\n")
+    importer._handle_import_logic(csv, wipe_first=True)
+
+    assert [b.get("commit") for b in sent] == [False, True]
+    assert discarded == []
+    assert len(warnings) == 1 and "may still complete" in warnings[0] and "1 metrics" in warnings[0]
+
+
+def test_read_import_chunks_keeps_file_row_numbers():
+    """Chunked import reading validates each chunk with file-level row numbers."""
+    import io
+
+    from ui.importer import _read_import_chunks, validate_import_frames
+
+    csv = io.StringIO(
+        "RowType,Metric,Value,Date,Type,Archived,Title\n"
+        "entry,weight,80,2026-02-01,float,False,\n"
+        "entry,weight,81,2026-02-02,float,False,\n"
+        "entry,weight,bad,2026-02-03,float,False,\n"
+        "change,,,2026-02-04,,,Started running\n"
+    )
+    chunks = list(_read_import_chunks(csv, chunksize=2))
+    assert len(chunks) == 2
+    assert sum(len(e) for e, _ in chunks) == 3
+    assert sum(len(c) for _, c in chunks) == 1
+
+    errors = [err for e, c in chunks for err in validate_import_frames(e, c)]
+    assert errors == ["Row 4: Value 'bad' is not a valid number."]
+
+
+def test_parquet_backup_round_trips_into_typed_import_frames():
+    """Parquet backup archive restores into typed frames that validate and bundle."""
+    import io
+
+    from models import _typed_backup_frame
+    from ui.importer import (
+        build_import_bundles,
+        parquet_backup_definitions,
+        parquet_backup_to_frames,
+        read_parquet_backup,
+        validate_import_frames,
+        write_parquet_backup,
+    )
+
+    tables = {
+        "categories": _typed_backup_frame("categories", [{"id": "c1", "name": "health"}, {"id": "c2", "name": "Work"}]),
+        "metrics": _typed_backup_frame(
+            "metrics",
+            [
+                {"id": "m1", "name": "mood", "unit_type": "integer_range", "metric_kind": "score",
+                 "range_start": 1, "range_end": 5, "higher_is_better": True, "is_archived": False,
+                 "category_id": "c1"},
+                {"id": "m2", "name": "focus", "unit_type": "float", "metric_kind": None,
+                 "higher_is_better": None, "is_archived": True, "category_id": "c2"},
+            ],
+        ),
+        "entries": _typed_backup_frame(
+            "entries",
+            [
+                {"metric_id": "m1", "value": 4, "recorded_at": "2026-02-01T08:00:00", "target_action": None},
+                {"metric_id": "m1", "value": 3.5, "recorded_at": "2026-02-02T08:00:00", "target_action": "Increase"},
+            ],
+        ),
+        "changes": _typed_backup_frame(
+            "changes", [{"category_id": None, "title": "Moved", "notes": None, "recorded_at": "2026-02-03T09:00:00"}]
+        ),
+    }
+
+    restored = read_parquet_backup(io.BytesIO(write_parquet_backup(tables)))
+    df_entries, df_changes = parquet_backup_to_frames(restored)
+
+    assert df_entries["Value"].dtype == "float64"
+    assert restored["changes"]["notes"].isna().all()
+    assert restored["entries"]["target_action"].isna().tolist() == [True, False]
+    assert pd.api.types.is_datetime64_any_dtype(df_entries["Date"])
+    assert df_entries["Category"].tolist() == ["health", "health"]
+    assert validate_import_frames(df_entries, df_changes) == []
+
+    bundle, change_bundle = build_import_bundles(
+        df_entries, df_changes, definitions=parquet_backup_definitions(restored)
+    )
+    assert bundle["metrics"][0]["range_start"] == 1
+    assert bundle["metrics"][0]["category"] == "health"
+    # Metrics and categories without any rows survive the round trip.
+    assert bundle["metrics"][1] == {
+        "name": "focus", "description": None, "is_archived": True, "unit_name": None, "category": "work",
+        "unit_type": "float", "metric_kind": "quantitative", "range_start": None, "range_end": None,
+        "higher_is_better": True,
+    }
+    assert bundle["categories"] == ["health", "work"]
+    assert "categories" not in change_bundle
+    assert bundle["entries"][1] == {
+        "metric": "mood", "value": 3.5, "recorded_at": "2026-02-02T08:00:00", "target_action": "Increase",
+    }
+    assert change_bundle["changes"] == [
+        {"title": "Moved", "notes": None, "category": None, "recorded_at": "2026-02-03T09:00:00"}
+    ]
@@ -0,0 +1,635 @@
+import io
+import pickle
+import time
+
+import pandas as pd
+import pytest
+
+
+pytest.importorskip("streamlit")
+
+
+import models  # noqa: E402
+
+
+class _FakeResult:
+    def __init__(self, data):
+        self.data = data
+        self.count = None
+
+
+class _FakeQuery:
+    """Chainable stand-in for a PostgREST query builder; records calls."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.calls = []
+
+    _METHODS = {"insert": "POST", "upsert": "POST", "update": "PATCH", "delete": "DELETE", "rpc": "POST"}
+
+    @property
+    def request(self):
+        """Just enough of postgrest's request config for the execution policy."""
+        from types import SimpleNamespace
+
+        writes = [self._METHODS[name] for name, _, _ in self.calls if name in self._METHODS]
+        return SimpleNamespace(http_method=writes[0] if writes else "GET")
+
+    def __getattr__(self, name):
+        def _method(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return _method
+
+    def execute(self):
+        self.client.executed.append(self)
+        for name, args, _ in self.calls:
+            if name in ("order", "gte") and args and args[0] in self.client.missing_columns:
+                from postgrest.exceptions import APIError
+
+                raise APIError({"code": "42703", "message": f"column {self.table}.{args[0]} does not exist"})
+        response = self.client.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return _FakeResult(response)
+
+
+class _FakeClient:
+    def __init__(self, responses, missing_columns=()):
+        self.responses = list(responses)
+        self.executed = []
+        self.missing_columns = set(missing_columns)  # Filtering/ordering on these fails like PostgREST
+
+    def table(self, name):
+        return _FakeQuery(self, name)
+
+    def rpc(self, name, params=None):
+        query = _FakeQuery(self, name)
+        query.calls.append(("rpc", (name, params), {}))  # postgrest POSTs RPCs
+        return query
+
+
+def test_keyset_filter_quotes_timestamp_and_tiebreaks_on_id():
+    """Keyset filter pages strictly after (recorded_at, id) in either direction."""
+    row = {"recorded_at": "2026-02-01T12:00:00", "id": "abc"}
+    assert models._keyset_filter(row) == (
+        'recorded_at.gt."2026-02-01T12:00:00",and(recorded_at.eq."2026-02-01T12:00:00",id.gt.abc)'
+    )
+    assert 'recorded_at.lt."2026-02-01T12:00:00"' in models._keyset_filter(row, descending=True)
+
+
+def test_iter_entries_pages_until_short_page(monkeypatch):
+    """Streaming reader keeps fetching pages until one comes back short."""
+    pages = [
+        [{"id": "1", "recorded_at": "2026-02-01T00:00:00"}, {"id": "2", "recorded_at": "2026-02-02T00:00:00"}],
+        [{"id": "3", "recorded_at": "2026-02-03T00:00:00"}],
+    ]
+    client = _FakeClient(pages)
+    monkeypatch.setattr(models, "sb", client)
+
+    rows = list(models.iter_entries("m1", columns="value", page_size=2))
+
+    assert [r["id"] for r in rows] == ["1", "2", "3"]
+    assert len(client.executed) == 2
+    first, second = client.executed
+    assert ("select", ("value, recorded_at, id",), {}) in first.calls
+    assert not any(name == "or_" for name, _, _ in first.calls)
+    assert any(name == "or_" and "id.gt.2" in args[0] for name, args, _ in second.calls)
+
+
+def test_failed_page_aborts_the_stream_instead_of_truncating(monkeypatch):
+    """A page failing mid-stream raises from the pager; entry reads return None, not page 1."""
+    from postgrest.exceptions import APIError
+
+    _fresh_execution_policy(monkeypatch)
+    monkeypatch.setattr(models, "_delta_sync_supported", False)
+    monkeypatch.setattr(models, "_PREFETCHES", {})
+    monkeypatch.setattr(models.st, "error", lambda *a, **k: None)
+    page = [{"id": "1", "recorded_at": "2026-02-01T00:00:00"}, {"id": "2", "recorded_at": "2026-02-02T00:00:00"}]
+    unavailable = APIError({"code": "503", "message": "Service Unavailable"})
+    client = _FakeClient([page] + [unavailable] * 3)
+    monkeypatch.setattr(models, "sb", client)
+
+    with pytest.raises(APIError):
+        list(models.iter_entries("m1", page_size=2))
+    assert len(client.executed) == 1 + 1 + models.DEFAULT_POLICY.retries
+
+    full_page = [{"id": str(i), "recorded_at": "2026-02-01T00:00:00"} for i in range(models.ENTRY_PAGE_SIZE)]
+    client.responses = [full_page, ValueError("bad gateway")]
+    assert models.get_entries("m1") is None
+
+
+def test_export_stream_merges_pages_newest_first_and_writes_csv(monkeypatch):
+    """Streaming export merges entry/change pages by date and writes each merged chunk as CSV."""
+    metric = {"name": "weight", "unit_name": "kg", "unit_type": "float", "categories": {"name": "health"}}
+    client = _FakeClient(
+        [
+            [
+                {"id": "e2", "recorded_at": "2026-02-03T08:00:00", "value": 81, "metrics": metric},
+                {"id": "e1", "recorded_at": "2026-02-01T08:00:00", "value": 80, "metrics": metric},
+            ],
+            [{"id": "c1", "recorded_at": "2026-02-02T09:00:00", "title": "New diet", "categories": None}],
+            [],
+        ]
+    )
+    monkeypatch.setattr(models, "sb", client)
+
+    out = io.BytesIO()
+    count = models.write_export_csv(out, models.iter_export_frames(page_size=2))
+
+    assert count == 3
+    lines = out.getvalue().decode("utf-8").splitlines()
+    assert lines[0] == ",".join(models.EXPORT_COLUMNS)
+    assert [line.split(",")[:2] for line in lines[1:]] == [
+        ["entry", "2026-02-03 08:00:00"],
+        ["change", "2026-02-02 09:00:00"],
+        ["entry", "2026-02-01 08:00:00"],
+    ]
+    entry_query = client.executed[0]
+    assert entry_query.table == "entries"
+    assert ("order", ("recorded_at",), {"desc": True}) in entry_query.calls
+    assert entry_query.calls[0][1][0].endswith("categories(name)), id")
+
+
+def test_export_aborts_when_a_change_events_page_fails(monkeypatch):
+    """A failed change-events read aborts the CSV export instead of writing only the entries."""
+    _fresh_execution_policy(monkeypatch)
+    metric = {"name": "weight", "unit_name": "kg", "unit_type": "float", "categories": {"name": "health"}}
+    client = _FakeClient(
+        [
+            [{"id": "e1", "recorded_at": "2026-02-01T08:00:00", "value": 80, "metrics": metric}],
+            ValueError("change_events unavailable"),
+        ]
+    )
+    monkeypatch.setattr(models, "sb", client)
+
+    with pytest.raises(ValueError):
+        models.write_export_csv(io.BytesIO(), models.iter_export_frames(page_size=2))
+    assert [q.table for q in client.executed] == ["entries", "change_events"]
+
+
+def test_backup_tables_fail_when_a_row_page_fails(monkeypatch):
+    """A failed change-events page makes the Parquet backup fail instead of looking complete."""
+    _fresh_execution_policy(monkeypatch)
+    monkeypatch.setattr(models.st, "error", lambda *a, **k: None)
+    client = _FakeClient(
+        [
+            [{"id": "c1", "name": "health"}],
+            [],
+            [{"id": "e1", "metric_id": "m1", "value": 1, "recorded_at": "2026-02-01T08:00:00"}],
+            ValueError("change_events unavailable"),
+        ]
+    )
+    monkeypatch.setattr(models, "sb", client)
+
+    assert models.get_backup_tables() is None
+
+
+def test_export_frames_match_the_in_memory_builder_across_pages(monkeypatch):
+    """Page-wise merging yields the same rows and order as build_export_frame, ties included."""
+    import random
+
+    metric = {"name": "weight", "unit_name": "kg", "unit_type": "integer", "range_start": 1, "range_end": 9,
+              "categories": {"name": "health"}}
+    rng = random.Random(7)
+    stamps = sorted((f"2026-02-{rng.randint(1, 5):02d}T08:00:00" for _ in range(40)), reverse=True)
+    entries = [{"recorded_at": ts, "value": i, "metrics": metric} for i, ts in enumerate(stamps[:25])]
+    changes = [{"recorded_at": ts, "title": f"c{i}", "categories": None} for i, ts in enumerate(stamps[25:])]
+    monkeypatch.setattr(models, "iter_entries", lambda **kw: iter(entries))
+    monkeypatch.setattr(models, "iter_change_events", lambda **kw: iter(changes))
+
+    chunks = list(models.iter_export_frames(page_size=4))
+    streamed = pd.concat(chunks, ignore_index=True)
+
+    pd.testing.assert_frame_equal(streamed, models.build_export_frame(entries, changes))
+    assert len(chunks) > 2
+    out = io.BytesIO()
+    models.write_export_csv(out, chunks)
+    assert ",5,kg,integer,,1,9," in out.getvalue().decode("utf-8")  # Integers are not written as 5.0
+
+
+def test_cached_reads_are_per_user_and_invalidated_by_tag(monkeypatch):
+    """Cache keys include the user; writes evict only that user's affected tags."""
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    calls = []
+
+    @models.cached("entries", ttl=60, metric_arg="metric_id")
+    def latest(metric_id):
+        calls.append(metric_id)
+        return {"metric_id": metric_id}
+
+    @models.cached(("entries", "metrics"), ttl=60)
+    def summary():
+        calls.append("summary")
+        return ["row"]
+
+    for user in ("u1", "u2"):
+        monkeypatch.setattr(models, "_current_user_id", lambda user=user: user)
+        latest("m1"), latest("m2"), summary()
+        latest("m1"), summary()
+    assert calls == ["m1", "m2", "summary"] * 2
+
+    # u1 writes an entry for m1: u1's m1 read and table-wide summary go, the rest stays.
+    assert models.invalidate("u1", "entries", "m1") == 2
+    calls.clear()
+    for user in ("u1", "u2"):
+        monkeypatch.setattr(models, "_current_user_id", lambda user=user: user)
+        latest("m1"), latest("m2"), summary()
+    assert calls == ["m1", "summary"]
+
+    # Cached values are copies; callers cannot corrupt the cache.
+    latest("m2")["metric_id"] = "mutated"
+    assert latest("m2") == {"metric_id": "m2"}
+    assert models.invalidate_user("u2") == 3
+
+
+def test_query_cache_bounds_each_user_and_total_bytes():
+    """Per-user LRU evicts the least recently used key; the byte budget drops idle users."""
+    big = "y" * 1_000
+    budget = 2 * len(pickle.dumps(big)) + 10  # room for two big values, not for u1 too
+    cache = models.QueryCache(max_entries_per_user=2, max_bytes_per_user=10_000, max_bytes=budget)
+    tables = frozenset({"entries"})
+
+    cache.put("u1", "a", "x", 60, tables)
+    cache.put("u1", "b", "x", 60, tables)
+    assert cache.get("u1", "a") == "x"  # "a" is now most recent
+    cache.put("u1", "c", "x", 60, tables)
+    assert cache.get("u1", "b") is models._MISS
+    assert cache.get("u1", "a") == "x"
+
+    cache.put("u2", "k", big, 60, tables)
+    cache.put("u3", "k", big, 60, tables)  # over budget: u1 is least recently active
+    stats = cache.stats()
+    assert stats["users"] == 2 and stats["bytes"] <= budget
+    assert cache.get("u1", "a") is models._MISS
+    assert cache.get("u2", "k") == big
+
+    cache.put("u2", "huge", "z" * 20_000, 60, tables)  # larger than a user's budget: skipped
+    assert cache.get("u2", "huge") is models._MISS
+    assert cache.invalidate_user("u3") == 1
+    assert cache.stats()["bytes"] == len(pickle.dumps(big))
+
+
+def test_create_entry_writes_through_to_cached_reads(monkeypatch):
+    """Recording an entry patches latest-entry and Overview caches instead of refetching."""
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+    summary = [
+        {"metric_id": "m1", "entry_count": 6, "latest_value": 6, "latest_recorded_at": "2026-02-06T08:00:00",
+         "prev_value": 5, "ma7": None, "avg_value": 3.5, "latest_target": None, "spark_values": [1, 2, 3, 4, 5, 6]},
+        {"metric_id": "m2", "entry_count": 1, "latest_value": 1, "latest_recorded_at": "2026-02-01T08:00:00",
+         "prev_value": None, "ma7": None, "avg_value": 1, "latest_target": None, "spark_values": [1]},
+    ]
+    old_latest = {"id": "e6", "metric_id": "m1", "value": 6, "recorded_at": "2026-02-06T08:00:00"}
+    new_row = {"id": "e7", "metric_id": "m1", "value": 7, "recorded_at": "2026-02-07T08:00:00", "target_action": "Increase"}
+    client = _FakeClient([summary, [old_latest], [new_row]])
+    monkeypatch.setattr(models, "sb", client)
+
+    models.get_overview_summary(), models.get_latest_entry_only("m1")
+    assert models.create_entry({"metric_id": "m1", "value": 7, "recorded_at": new_row["recorded_at"]}) == new_row
+
+    assert models.get_latest_entry_only("m1") == new_row
+    m1 = models.get_overview_summary()[0]
+    assert len(client.executed) == 3  # No refetch after the insert
+    assert (m1["entry_count"], m1["latest_value"], m1["prev_value"]) == (7, 7.0, 6)
+    assert m1["avg_value"] == 4.0 and m1["ma7"] == 4.0
+    assert m1["spark_values"][-1] == 7.0 and m1["latest_target"] == "Increase"
+
+    # A backdated entry cannot be folded in locally: the summary is evicted.
+    client.responses.append([{**new_row, "id": "e0", "recorded_at": "2026-01-01T08:00:00"}])
+    models.create_entry({"metric_id": "m1", "value": 1, "recorded_at": "2026-01-01T08:00:00"})
+    assert models.get_latest_entry_only("m1") == new_row
+    assert models._QUERY_CACHE.get("u1", ("get_overview_summary", ())) is models._MISS
+
+
+def test_get_entries_syncs_deltas_and_tombstones(monkeypatch):
+    """After one full load, refreshes fetch only changed rows and apply delete tombstones."""
+    from collections import OrderedDict
+
+    monkeypatch.setattr(models, "_ENTRY_SNAPSHOTS", OrderedDict())
+    monkeypatch.setattr(models, "_delta_sync_supported", True)
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+
+    def row(entry_id, recorded_at, value, updated_at, metric_id="m1"):
+        return {"id": entry_id, "metric_id": metric_id, "value": value,
+                "recorded_at": recorded_at, "updated_at": updated_at}
+
+    full = [
+        row("a", "2026-02-02T08:00:00", 1, "2026-02-02T08:00:00+00:00"),
+        row("b", "2026-02-01T08:00:00", 2, "2026-02-02T09:00:00+00:00"),
+    ]
+    other = [row("c", "2026-02-03T08:00:00", 3, "2026-02-02T10:00:00+00:00", metric_id="m2")]
+    changed = [
+        row("a", "2026-02-02T08:00:00", 10, "2026-02-05T08:00:00+00:00"),
+        row("d", "2026-02-04T08:00:00", 4, "2026-02-05T08:00:01+00:00"),
+    ]
+    tombstones = [{"entry_id": "b", "metric_id": "m1", "deleted_at": "2026-02-05T08:00:02+00:00"}]
+    client = _FakeClient([full, other, changed, tombstones])
+    monkeypatch.setattr(models, "sb", client)
+
+    assert [r["id"] for r in models.get_entries("m1")] == ["b", "a"]
+    assert [r["id"] for r in models.get_entries("m1")] == ["b", "a"]
+    assert [r["id"] for r in models.get_entries("m2")] == ["c"]
+    assert len(client.executed) == 2  # One load per metric; repeats are served inside the poll interval
+    assert ("eq", ("metric_id", "m1"), {}) in client.executed[0].calls
+
+    models.invalidate("u1", "entries", "m1")  # A local write marks the user's snapshots dirty
+    assert [(r["id"], r["value"]) for r in models.get_entries("m1")] == [("a", 10), ("d", 4)]
+
+    delta, tombs = client.executed[2:]
+    assert (delta.table, tombs.table) == ("entries", "entry_tombstones")
+    # Watermark minus the overlap window guards against late-committing writes.
+    assert ("gte", ("updated_at", "2026-02-02T08:59:30+00:00"), {}) in delta.calls
+    assert ("eq", ("metric_id", "m1"), {}) in tombs.calls
+    assert not any(name == "gte" for name, _, _ in tombs.calls)
+    snap = models._ENTRY_SNAPSHOTS[("u1", "m1")]
+    assert snap.tombstone_watermark.isoformat() == "2026-02-05T08:00:02+00:00"
+
+
+def test_entry_snapshots_share_one_row_budget(monkeypatch):
+    """Least recently read snapshots are evicted once all snapshots exceed the row budget."""
+    from collections import OrderedDict
+
+    monkeypatch.setattr(models, "_ENTRY_SNAPSHOTS", OrderedDict())
+    monkeypatch.setattr(models, "_delta_sync_supported", True)
+    monkeypatch.setattr(models, "ENTRY_SNAPSHOT_MAX_ROWS", 3)
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+
+    def rows(metric_id, n):
+        return [{"id": f"{metric_id}-{i}", "metric_id": metric_id, "value": i,
+                 "recorded_at": f"2026-02-0{i + 1}T08:00:00", "updated_at": "2026-02-05T08:00:00+00:00"}
+                for i in range(n)]
+
+    monkeypatch.setattr(models, "sb", _FakeClient([rows("m1", 2), rows("m2", 2), rows("m3", 4)]))
+    models.get_entries("m1")
+    models.get_entries("m2")
+    assert list(models._ENTRY_SNAPSHOTS) == [("u1", "m2")]
+    assert len(models.get_entries("m3")) == 4  # Above the budget on its own: served, not kept
+    assert list(models._ENTRY_SNAPSHOTS) == [("u1", "m2")]
+
+
+def test_get_entries_falls_back_without_delta_sync_column(monkeypatch):
+    """Before the migration, ordering by updated_at fails (42703): sync is disabled and reads page directly."""
+    from collections import OrderedDict
+
+    monkeypatch.setattr(models, "_ENTRY_SNAPSHOTS", OrderedDict())
+    monkeypatch.setattr(models, "_delta_sync_supported", True)
+    legacy = [{"id": "a", "metric_id": "m1", "value": 1, "recorded_at": "2026-02-01T08:00:00"}]
+    client = _FakeClient([legacy, legacy], missing_columns={"updated_at"})
+    monkeypatch.setattr(models, "sb", client)
+
+    assert models.get_entries("m1") == legacy
+    assert models._delta_sync_supported is False
+    assert models.get_entries("m1") == legacy
+    assert len(client.executed) == 3  # Failed probe once, then one direct read per call
+
+
+def test_prefetch_runs_reads_concurrently_and_never_caches_failures(monkeypatch):
+    """Independent first-render reads cost the slowest round trip; failures are left to the sync call; warm reads are skipped."""
+    import asyncio
+    import httpx
+    from postgrest import AsyncPostgrestClient
+
+    requests = []
+
+    async def handler(request):
+        requests.append(request.url.path)
+        await asyncio.sleep(0.2)
+        if request.url.path.endswith("/rpc/get_overview_summary"):
+            return httpx.Response(200, json=[{"metric_id": "m1"}])
+        if request.url.path.endswith("/metrics"):
+            return httpx.Response(400, json={"code": "PGRST100", "message": "bad request"})
+        return httpx.Response(200, json=[{"id": request.url.path.rsplit("/", 1)[-1]}])
+
+    transport = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+    monkeypatch.setattr(models, "_async_postgrest", lambda: AsyncPostgrestClient("https://x/rest/v1", http_client=transport))
+    client = _FakeClient([[{"id": "m1"}]])  # Only the failed read may reach the sync client
+    monkeypatch.setattr(models, "sb", client)
+
+    start = time.perf_counter()
+    assert models.prefetch(
+        models.get_metrics_async(include_archived=True),
+        models.get_overview_summary_async(),
+        models.get_categories_async(),
+    )
+    assert time.perf_counter() - start < 0.45
+    assert models.get_overview_summary() == [{"metric_id": "m1"}]
+    assert models.get_metrics(include_archived=True) == [{"id": "m1"}]
+    assert [q.table for q in client.executed] == ["metrics"]
+
+    # A rerun with everything cached submits no work at all.
+    sent = len(requests)
+    assert models.get_categories_async() is None
+    assert models.prefetch(models.get_metrics_async(include_archived=True), models.get_overview_summary_async())
+    assert len(requests) == sent
+
+
+def test_prefetched_entries_are_shared_until_a_write(monkeypatch):
+    """Record/Analytics/Edit reuse one background load of the selected metric."""
+    monkeypatch.setattr(models, "_PREFETCHES", {})
+    monkeypatch.setattr(models, "_delta_sync_supported", False)
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+    rows = [{"id": "a", "metric_id": "m1", "value": 1, "recorded_at": "2026-02-01T08:00:00"}]
+    client = _FakeClient([rows, rows])
+    monkeypatch.setattr(models, "sb", client)
+
+    models.prefetch_entries("m1")
+    models.prefetch_entries("m1")  # Already in flight
+    first = models.get_entries("m1")
+    first[0]["value"] = 99  # Callers get private copies
+    assert models.get_entries("m1") == models.get_entries(metric_id="m1") == rows
+    assert len(client.executed) == 1
+
+    models._entries_changed("u1")
+    assert models.get_entries("m1") == rows
+    assert len(client.executed) == 2
+
+
+def test_failed_prefetch_falls_back_to_a_direct_read(monkeypatch):
+    """A prefetch that fails is not served; get_entries reads again and reports on the script thread."""
+    import threading
+
+    monkeypatch.setattr(models, "_PREFETCHES", {})
+    monkeypatch.setattr(models, "_delta_sync_supported", False)
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+    errors = []
+    monkeypatch.setattr(models.st, "error", lambda msg: errors.append(threading.current_thread().name))
+    rows = [{"id": "a", "metric_id": "m1", "value": 1, "recorded_at": "2026-02-01T08:00:00"}]
+    client = _FakeClient([ValueError("bad gateway"), rows])
+    monkeypatch.setattr(models, "sb", client)
+
+    models.prefetch_entries("m1")
+    assert models.get_entries("m1") == rows
+    assert len(client.executed) == 2
+    assert errors == []
+    assert ("u1", "m1") not in models._PREFETCHES
+
+    client.responses = [ValueError("bad gateway"), ValueError("still down")]
+    models.prefetch_entries("m1")
+    assert models.get_entries("m1") is None
+    assert errors == [threading.current_thread().name]
+
+
+def test_import_commit_timeout_is_reported_as_unknown(monkeypatch):
+    """An import commit that timed out after sending returns committed=None; a server error returns None."""
+    import httpx
+    from postgrest.exceptions import APIError
+
+    monkeypatch.setattr(models, "_BREAKER", models.CircuitBreaker())
+    monkeypatch.setattr(models, "_current_user_id", lambda: "u1")
+    monkeypatch.setattr(models.st, "error", lambda *a, **k: None)
+    client = _FakeClient([httpx.ReadTimeout("slow"), APIError({"code": "23505", "message": "duplicate"})])
+    monkeypatch.setattr(models, "sb", client)
+
+    assert models.import_bundle({"import_id": "i1", "commit": True}) == {"committed": None}
+    assert models.import_bundle({"import_id": "i1", "commit": True}) is None
+    assert len(client.executed) == 2  # The write is never retried
+
+
+def _fresh_execution_policy(monkeypatch, **breaker):
+    monkeypatch.setattr(models, "_BREAKER", models.CircuitBreaker(**breaker))
+    monkeypatch.setattr(models, "_EXEC_STATS", models._ExecutionStats())
+    monkeypatch.setattr(models.random, "uniform", lambda a, b: 0)  # No backoff sleeps
+
+
+def test_safe_execute_retries_transient_read_errors(monkeypatch):
+    """Idempotent reads retry on network errors; bad requests fail at once."""
+    import httpx
+
+    _fresh_execution_policy(monkeypatch)
+    client = _FakeClient([httpx.ConnectError("reset"), httpx.ReadTimeout("slow"), [{"id": "c1"}]])
+    monkeypatch.setattr(models, "sb", client)
+    assert models._safe_execute(client.table("categories").select("*")).data == [{"id": "c1"}]
+
+    client.responses.append(ValueError("bad filter"))
+    errors = []
+    monkeypatch.setattr(models.st, "error", errors.append)
+    assert models._safe_execute(client.table("categories").select("*"), "Nope") is None
+    assert len(client.executed) == 4 and errors == ["⚠️ Nope: bad filter"]
+    stats = models.execution_stats()
+    assert (stats["calls"], stats["errors"], stats["retries"], stats["breaker"]) == (4, 3, 2, "closed")
+
+
+def test_safe_execute_times_out_and_opens_the_breaker(monkeypatch):
+    """A hung backend costs one timeout per attempt, then calls fail fast."""
+    import threading
+
+    _fresh_execution_policy(monkeypatch, threshold=2, cooldown=60)
+    release = threading.Event()
+
+    class _HungQuery:
+        calls = 0
+        request = None  # Method unknown: not retried
+
+        def execute(self):
+            _HungQuery.calls += 1
+            release.wait(5)
+
+    policy = models.ExecutionPolicy(timeout=0.05, retries=1)
+    monkeypatch.setattr(models.st, "error", lambda msg: None)
+    start = time.perf_counter()
+    for _ in range(3):
+        assert models._safe_execute(_HungQuery(), policy=policy) is None
+    assert time.perf_counter() - start < 0.5
+    assert _HungQuery.calls == 2  # Breaker opened after two timeouts
+    stats = models.execution_stats()
+    assert (stats["timeouts"], stats["short_circuits"], stats["breaker"]) == (2, 1, "open")
+    release.set()
+
+
+def test_query_trace_records_tables_filters_and_sizes(monkeypatch, tmp_path):
+    """Traced queries are grouped per table/operation and flag N+1 patterns."""
+    import httpx
+    from postgrest import SyncPostgrestClient
+
+    def handler(request):
+        if request.method == "POST":
+            return httpx.Response(201, json=[{"id": "e9"}])
+        return httpx.Response(200, json=[{"id": "e1"}, {"id": "e2"}])
+
+    rest = SyncPostgrestClient("https://x/rest/v1", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    trace = models.QueryTrace()
+    _fresh_execution_policy(monkeypatch)
+    monkeypatch.setattr(models, "_current_trace", lambda: trace)
+
+    for _ in range(models.N_PLUS_ONE_THRESHOLD):
+        models._safe_execute(rest.from_("entries").select("*").eq("metric_id", "m1").order("recorded_at"))
+    models._safe_execute(rest.from_("entries").insert({"metric_id": "m1", "value": 3}))
+
+    select, insert = trace.records[0], trace.records[-1]
+    assert (select.table, select.operation, select.filters, select.rows) == ("entries", "select", "metric_id=eq.m1", 2)
+    assert select.response_bytes > 0 and insert.operation == "insert" and insert.request_bytes > 0
+    groups = {(g["operation"], g["calls"], g["n_plus_one"]) for g in trace.summary()}
+    assert groups == {("select", models.N_PLUS_ONE_THRESHOLD, True), ("insert", 1, False)}
+
+    log = tmp_path / "queries.jsonl"
+    monkeypatch.setenv(models.QUERY_LOG_ENV, str(log))
+    monkeypatch.setattr(models.st, "session_state", {models.QUERY_TRACE_KEY: trace})
+    assert models.end_query_trace() is trace
+    lines = log.read_text().splitlines()
+    assert len(lines) == len(trace.records) and '"table": "entries"' in lines[0]
+
+
+def test_policy_timeout_reaches_httpx_and_timed_out_writes_are_not_retried(monkeypatch):
+    """Each attempt's HTTP request carries the policy timeout; a write that timed out is sent once."""
+    import httpx
+    from postgrest import SyncPostgrestClient
+
+    _fresh_execution_policy(monkeypatch)
+    seen = []
+
+    def handler(request):
+        seen.append((request.method, request.extensions["timeout"]["read"]))
+        raise httpx.ReadTimeout("slow", request=request)
+
+    rest = SyncPostgrestClient("https://x/rest/v1", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    policy = models.ExecutionPolicy(timeout=3.0, retries=2)
+    for query in (rest.from_("entries").select("*"), rest.from_("entries").insert({"value": 1})):
+        with pytest.raises(httpx.ReadTimeout):
+            models._execute(query, policy)
+    assert seen == [("GET", 3.0)] * 3 + [("POST", 3.0)]
+
+
+def test_commit_entry_edits_uses_one_rpc_and_falls_back_without_upserting(monkeypatch):
+    """A data-editor save is one round trip; before the migration, updates go by id and never re-create rows."""
+    from postgrest.exceptions import APIError
+
+    _fresh_execution_policy(monkeypatch)
+    monkeypatch.setattr(models, "_commit_rpc_supported", True)
+    result = {"deleted": ["a"], "updated": [{"id": "b"}], "inserted": [{"id": "e"}]}
+    client = _FakeClient([result])
+    monkeypatch.setattr(models, "sb", client)
+    updates, inserts = [{"id": "b", "value": 2}, {"id": "gone", "value": 3}], [{"value": 7}]
+    assert models.commit_entry_edits("m1", ["a"], updates, inserts) == result
+    assert [q.table for q in client.executed] == ["commit_entry_edits"]
+
+    missing = APIError({"message": "Could not find the function", "code": "PGRST202"})
+    client = _FakeClient([missing, [{"id": "a"}], [{"id": "b"}], [], [{"id": "e"}]])
+    monkeypatch.setattr(models, "sb", client)
+    assert models.commit_entry_edits("m1", ["a"], updates, inserts) == result  # "gone" was deleted elsewhere
+    assert models._commit_rpc_supported is False
+    assert [q.table for q in client.executed] == ["commit_entry_edits"] + ["entries"] * 4
+    delete, update, _, insert = client.executed[1:]
+    assert ("in_", ("id", ["a"]), {}) in delete.calls
+    assert update.calls[0] == ("update", ({"value": 2},), {})
+    assert ("eq", ("id", "b"), {}) in update.calls
+    assert not any(name == "upsert" for q in client.executed for name, _, _ in q.calls)
+    assert insert.calls[0] == ("insert", ([{"value": 7, "metric_id": "m1"}],), {})
+
+
+def test_entries_window_filters_recorded_at_in_postgres(monkeypatch):
+    """The editor's date window becomes gte/lt filters on the keyset query."""
+    import datetime as dt
+
+    monkeypatch.setattr(models, "_QUERY_CACHE", models.QueryCache())
+    client = _FakeClient([[{"id": "a", "recorded_at": "2026-02-01T08:00:00"}]])
+    monkeypatch.setattr(models, "sb", client)
+
+    assert len(models.get_entries_window("m1", dt.date(2026, 2, 1), dt.date(2026, 2, 7))) == 1
+    calls = client.executed[0].calls
+    assert ("gte", ("recorded_at", "2026-02-01T00:00:00"), {}) in calls
+    assert ("lt", ("recorded_at", "2026-02-08T00:00:00"), {}) in calls
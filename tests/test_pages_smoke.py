@@ -18,9 +18,9 @@ import streamlit as st
 from ui import pages
 
 pages.models.get_metrics = lambda include_archived=True: [{"id": "m1", "name": "x"}]
-pages.models.get_all_entries_bulk = lambda: []
+pages.models.get_overview_summary = lambda: []
 
-def _fake_show_landing_page(all_metrics, all_entries):
+def _fake_show_landing_page(all_metrics, summary):
     st.text("landing-ok")  # sentinel
 
 pages.landing_page.show_landing_page = _fake_show_landing_page
@@ -49,9 +49,9 @@ import streamlit as st
 from ui import pages
 
 pages.models.get_metrics = lambda include_archived=True: []
-pages.models.get_all_entries_bulk = lambda: []
+pages.models.get_overview_summary = lambda: []
 
-def _fake_show_landing_page(all_metrics, all_entries):
+def _fake_show_landing_page(all_metrics, summary):
     assert all_metrics == []
     st.text("landing-empty-ok")  # sentinel
 
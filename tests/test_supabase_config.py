@@ -0,0 +1,41 @@
+import httpx
+import pytest
+
+
+pytest.importorskip("streamlit")
+
+
+import supabase_config  # noqa: E402
+
+
+def test_clients_share_one_pool_but_keep_their_own_token(monkeypatch):
+    """Per-user clients reuse one httpx connection pool but send their own auth token."""
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        return httpx.Response(200, json=[])
+
+    shared = httpx.Client(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(supabase_config, "_http_client", shared)
+    url, key = "https://example.supabase.co", "anon-key"
+
+    alice = supabase_config.create_client(url, key, options=supabase_config._user_options())
+    bob = supabase_config.create_client(url, key, options=supabase_config._user_options())
+    alice.postgrest.auth("alice-token")
+
+    alice.table("metrics").select("*").execute()
+    bob.table("metrics").select("*").execute()
+
+    assert alice.postgrest.session is bob.postgrest.session is shared
+    assert seen == ["Bearer alice-token", f"Bearer {key}"]
+
+
+def test_http_client_is_reused_until_closed(monkeypatch):
+    """The shared httpx client is created once and rebuilt after it is closed."""
+    monkeypatch.setattr(supabase_config, "_http_client", None)
+    first = supabase_config.get_http_client()
+    assert supabase_config.get_http_client() is first
+    first.close()
+    assert supabase_config.get_http_client() is not first
+    supabase_config.get_http_client().close()
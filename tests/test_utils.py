@@ -5,6 +5,8 @@ pytest.importorskip("streamlit")
 
 
 from utils import (  # noqa: E402
+    as_entry_frame,
+    entry_frame,
     format_metric_label,
     normalize_name,
     to_datetz,
@@ -30,3 +32,16 @@ def test_to_datetz_midday():
     out = to_datetz(d)
     assert out.date() == d
     assert out.time() == dt.time(12, 0)
+
+
+def test_entry_frame_types_once_and_caches_the_date():
+    """recorded_at becomes tz-aware UTC, value float64 (blank -> NaN) and the UTC date is cached."""
+    df = entry_frame([
+        {"id": "a", "value": "3", "recorded_at": "2026-02-01T23:30:00-02:00"},
+        {"id": "b", "value": "", "recorded_at": "2026-02-01T08:00:00Z"},
+    ])
+    assert str(df["recorded_at"].dt.tz) == "UTC"
+    assert df["value"].dtype == "float64" and df["value"].isna().tolist() == [False, True]
+    assert [d.isoformat() for d in df["recorded_date"]] == ["2026-02-02", "2026-02-01"]
+    assert as_entry_frame(df) is df  # Already typed: no re-parse, no copy
+    assert list(entry_frame([]).columns) == ["id", "metric_id", "value", "recorded_at", "recorded_date"]
@@ -6,7 +6,7 @@ pytest.importorskip("streamlit")
 
 import pandas as pd  # noqa: E402
 
-from ui.visualize import get_metric_stats  # noqa: E402
+from ui.visualize import get_metric_stats, get_summary_stats  # noqa: E402
 
 
 def test_get_metric_stats_excludes_not_measured_but_keeps_zero():
@@ -38,3 +38,30 @@ def test_get_metric_stats_all_not_measured_returns_no_data():
     assert stats["avg"] is None
     assert stats["latest"] is None
     assert stats["last_date"] == "No Data"
+
+
+def test_get_summary_stats_matches_metric_stats_shape():
+    """Overview summary rows map onto the same stats dict as get_metric_stats."""
+    row = {
+        "metric_id": "m1",
+        "entry_count": 2,
+        "latest_value": 2,
+        "latest_recorded_at": "2026-02-03T12:00:00",
+        "prev_value": 0,
+        "ma7": None,
+        "avg_value": 1.0,
+        "latest_target": "Increase",
+        "spark_values": [0, 2],
+    }
+    stats = get_summary_stats(row)
+    assert stats["count"] == 2
+    assert stats["latest"] == 2.0
+    assert stats["change"] == pytest.approx(2.0)
+    assert stats["ma7"] is None
+    assert stats["last_date"] == "03 Feb"
+    assert stats["spark_values"] == [0.0, 2.0]
+
+    empty = get_summary_stats(None)
+    assert empty["count"] == 0
+    assert empty["last_date"] == "No Data"
+    assert empty["latest_ts"] is None
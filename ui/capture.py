@@ -208,14 +208,8 @@ def show_capture(selected_metric):
                     "target_action": target_action 
                 })
                 
-                # Cleanup & Cache Clearing
+                # Cleanup (create_entry already evicted this metric's cached reads)
                 editor_handler.reset_editor_state(f"data_{mid}", mid)
-                
-                if hasattr(models.get_latest_entry_only, "clear"):
-                    models.get_latest_entry_only.clear()
-                
-                # CRITICAL: Clear the landing page cache so the badge appears instantly
-                models.get_all_entries_bulk.clear()
 
                 st.success(f"Saved: {val} {unit_name}")
                 
@@ -88,8 +88,6 @@ def show_changes():
                         "recorded_at": recorded_at.isoformat(),
                     }
                 )
-                if hasattr(models.get_change_events, "clear"):
-                    models.get_change_events.clear()
                 utils.finalize_action("Change saved", icon="📝")
                 st.rerun()
 
@@ -121,8 +119,6 @@ def show_changes():
                 with col_delete:
                     if ev_id and st.button("Delete", key=f"delete_change_{ev_id}", type="secondary", use_container_width=True):
                         models.delete_change_event(ev_id)
-                        if hasattr(models.get_change_events, "clear"):
-                            models.get_change_events.clear()
                         if st.session_state.get("edit_change_event_id") == ev_id:
                             st.session_state["edit_change_event_id"] = None
                         utils.finalize_action("Deleted", icon="🗑️")
@@ -194,8 +190,6 @@ def show_changes():
                                     "recorded_at": recorded_at.isoformat(),
                                 },
                             )
-                            if hasattr(models.get_change_events, "clear"):
-                                models.get_change_events.clear()
                             st.session_state["edit_change_event_id"] = None
                             utils.finalize_action("Updated", icon="✏️")
                             st.rerun()
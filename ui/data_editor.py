@@ -8,22 +8,24 @@ from logic import editor_handler
 def _confirm_save_dialog(mid, editor_key, state_key):
     """Review changes before committing to the database."""
     summary = editor_handler.get_change_summary(state_key, editor_key)
-    master_draft = st.session_state[state_key]
+    draft = st.session_state[state_key]
     
     st.markdown("### 📋 Review Edits")
     st.write(f"✅ **New:** {summary['add']} | 📝 **Edited:** {summary['upd']} | 🗑️ **Deleted:** {summary['del']}")
     st.divider()
     
-    changes = master_draft[master_draft["Change Log"] != ""]
+    changes = draft.pending()
     if not changes.empty:
-        for _, row in changes.iterrows():
-            with st.container(border=True):
-                if row["Change Log"] == "🔴":
-                    st.markdown("**🔴 DELETING ENTRY**")
-                else:
-                    st.markdown("**🟡 UPDATED ENTRY**")
-                st.write(f"**Value:** {row['value']}")
-                st.caption(f"📅 {pd.to_datetime(row['recorded_at']).strftime('%d %b, %H:%M')}")
+        st.dataframe(
+            changes,
+            column_config={
+                "Change Log": st.column_config.TextColumn("Status", width="small"),
+                "recorded_at": st.column_config.DatetimeColumn("Date", format="D MMM, HH:mm"),
+                "value": st.column_config.NumberColumn("Value"),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
     
     if st.button("Confirm & Save", type="primary", use_container_width=True):
         editor_handler.execute_save(mid, state_key, editor_key)
@@ -49,7 +51,7 @@ def _render_editable_table(view_df, m_unit, mid, state_key, selected_metric):
             "Change Log": st.column_config.TextColumn("Status", disabled=True),
         },
         key=editor_key,
-        on_change=lambda: editor_handler.sync_editor_changes(state_key, editor_key, view_df.index),
+        on_change=lambda: editor_handler.sync_editor_changes(state_key, editor_key, list(ui_view_df["id"])),
         use_container_width=True,
         num_rows="dynamic",
         hide_index=True
@@ -76,22 +78,14 @@ def _render_conflict_warning(mid, state_key):
 
 def show_data_management_suite(selected_metric):
     """Main entry point for the metric editor."""
-    dfe, m_unit, m_name = utils.collect_data(selected_metric)
     mid = selected_metric.get("id")
     state_key = f"data_{mid}"
-    
-    if dfe is None or dfe.empty:
+
+    # 1. Unified Filters & Navigation (bounds are queried; the history is never loaded whole)
+    abs_min, abs_max = editor_handler.get_date_bounds(mid)
+    if abs_min is None:
         st.info("No data recorded yet.")
         return
-
-    # Initialize states
-    if state_key not in st.session_state or st.session_state[state_key].empty:
-        st.session_state[state_key] = dfe.assign(**{"Change Log": "", "Select": False})
-    if f"saved_data_{mid}" not in st.session_state:
-        st.session_state[f"saved_data_{mid}"] = dfe.copy()
-
-    # 1. Unified Filters & Navigation
-    abs_min, abs_max = editor_handler.get_date_bounds(dfe, mid)
     days_diff = (pd.to_datetime(abs_max) - pd.to_datetime(abs_min)).days
     pill_options = ["Week"]
     if days_diff > 7:
@@ -118,30 +112,30 @@ def show_data_management_suite(selected_metric):
         st.session_state[f"start_date_{mid}"] = start_date
         st.session_state[f"end_date_{mid}"] = end_date
 
-    # 2. Table Logic
+    # 2. Table Logic: only the selected window is fetched (plus rows with pending edits)
+    m_unit = selected_metric.get("unit_name", "")
+    m_name = selected_metric.get("name", "Metric").title()
     if start_date and end_date:
         if editor_handler.is_date_conflict(mid, state_key):
             _render_conflict_warning(mid, state_key)
-        
-        master_draft = st.session_state[state_key]
-        d_mask = (
-            ((pd.to_datetime(master_draft['recorded_at']).dt.date >= start_date) & 
-             (pd.to_datetime(master_draft['recorded_at']).dt.date <= end_date)) | 
-            (master_draft["Change Log"] != "")
-        )
+
+        dfe, m_unit, m_name = utils.collect_data(selected_metric, start=start_date, end=end_date)
+        editor_handler.load_window(mid, state_key, dfe, (start_date, end_date))
+        draft = st.session_state[state_key]
         _render_editable_table(
-            master_draft.loc[d_mask].sort_values("recorded_at", ascending=False), 
+            draft.view().sort_values("recorded_at", ascending=False), 
             m_unit, mid, state_key, selected_metric
         )
 
     # 3. Visualizations synced with the editor's pill selection
     st.divider()
-    saved_df = st.session_state.get(f"saved_data_{mid}")
+    draft = st.session_state.get(state_key)
+    saved_df = draft.base if draft is not None else None
     
     # NEW DEFENSIVE CHECK: Ensure data exists before mask application
     if saved_df is not None and not saved_df.empty and 'recorded_at' in saved_df.columns:
-        s_mask = (pd.to_datetime(saved_df['recorded_at']).dt.date >= start_date) & \
-                 (pd.to_datetime(saved_df['recorded_at']).dt.date <= end_date)
+        saved_df = utils.as_entry_frame(saved_df)  # Typed at load: the cached date column is reused
+        s_mask = saved_df["recorded_date"].between(start_date, end_date)
         
         visualize.show_visualizations(
             saved_df.loc[s_mask].sort_values("recorded_at"), 
@@ -0,0 +1,43 @@
+import pandas as pd
+import streamlit as st
+import models
+
+
+def show_query_trace(trace):
+    """Per-rerun query breakdown (see models.QueryTrace) for spotting N+1 loops and large payloads."""
+    with st.expander("🛠 Query Debug", expanded=False):
+        records = list(trace.records)
+        total_ms = sum(r.ms for r in records)
+        total_kb = sum(r.request_bytes + r.response_bytes for r in records) / 1024
+        st.caption(f"This rerun: **{len(records)}** queries · **{total_ms:.0f} ms** · **{total_kb:.1f} KB**")
+        if not records:
+            st.info("No queries captured.")
+            return
+
+        summary = pd.DataFrame(trace.summary())
+        suspects = summary[summary["n_plus_one"]]
+        for _, row in suspects.iterrows():
+            st.warning(f"Possible N+1: {row['operation']} on `{row['table']}` ran {row['calls']}×")
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+
+        slow = trace.slow_queries()
+        if slow:
+            st.caption(f"Slow queries (≥ {models.SLOW_QUERY_MS} ms)")
+            st.dataframe(pd.DataFrame([r.__dict__ for r in slow]), hide_index=True, use_container_width=True)
+
+        with st.popover("All queries", use_container_width=True):
+            st.dataframe(pd.DataFrame([r.__dict__ for r in records]), hide_index=True)
+
+        stats = models.execution_stats()
+        cache = models.cache_stats()
+        st.caption(
+            f"Process: {stats['calls']} calls · {stats['errors']} errors · {stats['retries']} retries · "
+            f"breaker {stats['breaker']} · cache {cache['hits']} hits / {cache['misses']} misses"
+        )
+        st.download_button(
+            "Download JSONL",
+            data=trace.to_jsonl(),
+            file_name="query_trace.jsonl",
+            mime="application/jsonl",
+            use_container_width=True,
+        )
@@ -1,14 +1,25 @@
 # importer.py
 import streamlit as st
 import pandas as pd
+import numpy as np
 import models
 import utils
-import time
+import uuid
 import auth
+import io
+import tempfile
+import zipfile
 from datetime import datetime
 
 ALLOWED_TYPES = ["float", "integer", "integer_range"]
 ALLOWED_KINDS = ["quantitative", "count", "score"]
+MAX_ERRORS_PER_CHECK = 20
+MAX_IMPORT_ERRORS = 100
+IMPORT_CHUNK_ROWS = 50_000
+IMPORT_RPC_ROWS = 5_000
+STREAM_IMPORT_MIN_BYTES = 20 * 1024 * 1024
+EXPORT_SPOOL_BYTES = 32 * 1024 * 1024
+PARQUET_BACKUP_TABLES = ("categories", "metrics", "entries", "changes")
 
 
 def parse_import_frames(df_import: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -35,12 +46,65 @@ def parse_import_frames(df_import: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataF
     return df_entries, df_changes
 
 
-def validate_import_frames(df_entries: pd.DataFrame, df_changes: pd.DataFrame) -> list[str]:
+def _cell_text(series: pd.Series) -> pd.Series:
+    """Stripped string view of a column (NaN stays NaN)."""
+    return series.astype("string").str.strip()
+
+
+def _coerce_numeric(series: pd.Series) -> pd.Series:
+    """Vectorized float(): blanks and non-numbers become NaN."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    return pd.to_numeric(_cell_text(series), errors="coerce").astype("float64")
+
+
+def _has_content(series: pd.Series) -> pd.Series:
+    """True where a cell is neither NaN nor a blank string."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.notna()
+    return (series.notna() & (_cell_text(series) != "")).fillna(False).astype(bool)
+
+
+def _parse_import_dates(series: pd.Series) -> pd.Series:
+    """
+    Parses a Date column in one pass (unparseable cells become NaT). Columns
+    mixing UTC offsets, or naive and aware stamps, are normalized to UTC.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    text = _cell_text(series)
+    try:
+        return pd.to_datetime(text, errors="coerce", format="mixed")
+    except (ValueError, TypeError):
+        return pd.to_datetime(text, errors="coerce", format="mixed", utc=True)
+
+
+def _report(errors: list[str], mask: pd.Series, index: pd.Index, fmt, label: str, limit: int):
+    """
+    Appends `fmt(pos, row_num)` for the first `limit` flagged rows, then one
+    overflow line, so huge files produce a readable error list.
+    """
+    positions = np.flatnonzero(mask.to_numpy(dtype=bool))
+    for pos in positions[:limit]:
+        errors.append(fmt(pos, index[pos] + 2))
+    if len(positions) > limit:
+        errors.append(f"... and {len(positions) - limit} more rows with {label}.")
+
+
+def validate_import_frames(
+    df_entries: pd.DataFrame,
+    df_changes: pd.DataFrame,
+    max_errors_per_check: int = MAX_ERRORS_PER_CHECK,
+) -> list[str]:
     """
     Validates entry/change rows without touching Streamlit or Supabase.
-    Returns a list of human-readable error strings.
+    Returns a list of human-readable error strings, grouped by check and
+    capped at `max_errors_per_check` rows each.
+
+    Checks run column-wise (boolean masks), so large files validate quickly.
     """
     errors: list[str] = []
+    limit = max_errors_per_check
 
     if df_entries is not None and not df_entries.empty:
         required_cols = ["Metric", "Value", "Date", "Type", "Archived"]
@@ -48,46 +112,74 @@ def validate_import_frames(df_entries: pd.DataFrame, df_changes: pd.DataFrame) -
         if missing:
             errors.append(f"Missing mandatory columns for entries: {', '.join(missing)}")
         else:
-            for idx, row in df_entries.iterrows():
-                row_num = idx + 2
-                m_name = str(row.get("Metric", "Unknown"))
-
-                m_type = str(row.get("Type")).strip().lower()
-                if m_type not in ALLOWED_TYPES:
-                    errors.append(
-                        f"Row {row_num}: Invalid Type '{m_type}'. Must be one of {ALLOWED_TYPES}"
-                    )
+            idx = df_entries.index
+            names = df_entries["Metric"]
+            raw_types = df_entries["Type"]
+
+            types = _cell_text(raw_types).str.lower()
+            bad_type = ~types.isin(ALLOWED_TYPES).fillna(False).astype(bool)
+            _report(
+                errors, bad_type, idx,
+                lambda p, r: f"Row {r}: Invalid Type '{str(raw_types.iat[p]).strip().lower()}'. Must be one of {ALLOWED_TYPES}",
+                "an invalid Type", limit,
+            )
+
+            if "Kind" in df_entries.columns:
+                raw_kinds = df_entries["Kind"]
+                kinds = _cell_text(raw_kinds).str.lower()
+                bad_kind = (kinds.notna() & (kinds != "") & ~kinds.isin(ALLOWED_KINDS)).fillna(False).astype(bool)
+                _report(
+                    errors, bad_kind, idx,
+                    lambda p, r: f"Row {r}: Invalid Kind '{str(raw_kinds.iat[p]).strip().lower()}'. Must be one of {ALLOWED_KINDS}",
+                    "an invalid Kind", limit,
+                )
+
+            is_range = (types == "integer_range").fillna(False).astype(bool)
+            if is_range.any():
+                raw_min = df_entries["Min"] if "Min" in df_entries.columns else pd.Series(np.nan, index=idx)
+                raw_max = df_entries["Max"] if "Max" in df_entries.columns else pd.Series(np.nan, index=idx)
+                v_min = _coerce_numeric(raw_min)
+                v_max = _coerce_numeric(raw_max)
+                not_number = (raw_min.notna() & v_min.isna()) | (raw_max.notna() & v_max.isna())
+                no_bounds = ~not_number & (v_min.isna() | v_max.isna())
+                inverted = ~not_number & ~no_bounds & (v_min >= v_max)
 
-                if "Kind" in df_entries.columns and pd.notna(row.get("Kind")):
-                    m_kind = str(row.get("Kind")).strip().lower()
-                    if m_kind and m_kind not in ALLOWED_KINDS:
-                        errors.append(
-                            f"Row {row_num}: Invalid Kind '{m_kind}'. Must be one of {ALLOWED_KINDS}"
-                        )
-
-                if m_type == "integer_range":
-                    try:
-                        v_min = float(row["Min"]) if pd.notna(row.get("Min")) else None
-                        v_max = float(row["Max"]) if pd.notna(row.get("Max")) else None
-                        if v_min is None or v_max is None:
-                            errors.append(
-                                f"Row {row_num}: Metric '{m_name}' is a range but missing Min/Max."
-                            )
-                        elif v_min >= v_max:
-                            errors.append(
-                                f"Row {row_num}: Min ({v_min}) must be less than Max ({v_max})."
-                            )
-                    except ValueError:
-                        errors.append(
-                            f"Row {row_num}: Min/Max for '{m_name}' must be numbers."
-                        )
-
-                v = row.get("Value")
-                if pd.notna(v) and str(v).strip() != "":
-                    try:
-                        float(v)
-                    except (TypeError, ValueError):
-                        errors.append(f"Row {row_num}: Value '{v}' is not a valid number.")
+                _report(
+                    errors, is_range & not_number, idx,
+                    lambda p, r: f"Row {r}: Min/Max for '{names.iat[p]}' must be numbers.",
+                    "non-numeric Min/Max", limit,
+                )
+                _report(
+                    errors, is_range & no_bounds, idx,
+                    lambda p, r: f"Row {r}: Metric '{names.iat[p]}' is a range but missing Min/Max.",
+                    "missing Min/Max", limit,
+                )
+                _report(
+                    errors, is_range & inverted, idx,
+                    lambda p, r: f"Row {r}: Min ({float(v_min.iat[p])}) must be less than Max ({float(v_max.iat[p])}).",
+                    "Min not less than Max", limit,
+                )
+
+            raw_values = df_entries["Value"]
+            bad_value = _has_content(raw_values) & _coerce_numeric(raw_values).isna()
+            _report(
+                errors, bad_value, idx,
+                lambda p, r: f"Row {r}: Value '{raw_values.iat[p]}' is not a valid number.",
+                "an invalid Value", limit,
+            )
+
+            raw_dates = df_entries["Date"]
+            has_date = _has_content(raw_dates)
+            _report(
+                errors, ~has_date, idx,
+                lambda p, r: f"Row {r}: Entry Date cannot be empty.",
+                "an empty entry Date", limit,
+            )
+            _report(
+                errors, has_date & _parse_import_dates(raw_dates).isna(), idx,
+                lambda p, r: f"Row {r}: Date '{raw_dates.iat[p]}' is not a valid date.",
+                "an invalid Date", limit,
+            )
 
     if df_changes is not None and not df_changes.empty:
         required_cols = ["Title", "Date"]
@@ -95,18 +187,170 @@ def validate_import_frames(df_entries: pd.DataFrame, df_changes: pd.DataFrame) -
         if missing:
             errors.append(f"Missing mandatory columns for changes: {', '.join(missing)}")
         else:
-            for idx, row in df_changes.iterrows():
-                row_num = idx + 2
-                title = str(row.get("Title") or "").strip()
-                if not title:
-                    errors.append(f"Row {row_num}: Change Title cannot be empty.")
-                raw_date = row.get("Date")
-                if pd.isna(raw_date) or str(raw_date).strip() == "":
-                    errors.append(f"Row {row_num}: Change Date cannot be empty.")
+            idx = df_changes.index
+            _report(
+                errors, ~_has_content(df_changes["Title"]), idx,
+                lambda p, r: f"Row {r}: Change Title cannot be empty.",
+                "an empty change Title", limit,
+            )
+            _report(
+                errors, ~_has_content(df_changes["Date"]), idx,
+                lambda p, r: f"Row {r}: Change Date cannot be empty.",
+                "an empty change Date", limit,
+            )
+            raw_dates = df_changes["Date"]
+            _report(
+                errors, _has_content(raw_dates) & _parse_import_dates(raw_dates).isna(), idx,
+                lambda p, r: f"Row {r}: Change Date '{raw_dates.iat[p]}' is not a valid date.",
+                "an invalid change Date", limit,
+            )
 
     return errors
 
 
+def write_parquet_backup(tables: dict) -> bytes:
+    """
+    Packs the normalized backup tables (see `models.get_backup_tables`) into a
+    zip archive holding one Parquet file per table.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name in PARQUET_BACKUP_TABLES:
+            part = io.BytesIO()
+            tables[name].to_parquet(part, index=False, compression="zstd")
+            archive.writestr(f"{name}.parquet", part.getvalue())
+    return buffer.getvalue()
+
+
+def read_parquet_backup(fileobj, tables=PARQUET_BACKUP_TABLES) -> dict[str, pd.DataFrame]:
+    """Reads (some of) the tables of an archive written by `write_parquet_backup`."""
+    with zipfile.ZipFile(fileobj) as archive:
+        members = set(archive.namelist())
+        missing = [n for n in tables if f"{n}.parquet" not in members]
+        if missing:
+            raise ValueError(f"Backup archive is missing tables: {', '.join(missing)}")
+        return {
+            name: pd.read_parquet(io.BytesIO(archive.read(f"{name}.parquet")))
+            for name in tables
+        }
+
+
+def parquet_backup_to_frames(tables: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Joins the normalized tables back into the (df_entries, df_changes) shape of
+    `parse_import_frames`, keeping typed columns (float Value, datetime Date,
+    nullable integer Min/Max) so validation and payload building skip parsing.
+    """
+    cat_names = tables["categories"].set_index("id")["name"]
+    metrics = tables["metrics"].copy()
+    metrics["category"] = metrics["category_id"].map(cat_names)
+    entries = tables["entries"].merge(
+        metrics, how="left", left_on="metric_id", right_on="id", suffixes=("", "_metric")
+    )
+    df_entries = pd.DataFrame(
+        {
+            "RowType": "entry",
+            "Date": entries["recorded_at"],
+            "Category": entries["category"],
+            "Metric": entries["name"],
+            "Description": entries["description"],
+            "Archived": entries["is_archived"].fillna(False),
+            "Value": entries["value"],
+            "Unit": entries["unit_name"],
+            "Type": entries["unit_type"].fillna("float"),
+            "Kind": entries["metric_kind"],
+            "Min": entries["range_start"],
+            "Max": entries["range_end"],
+            "HigherIsBetter": entries["higher_is_better"].fillna(True),
+            "Target": entries["target_action"],
+        }
+    )
+    changes = tables["changes"]
+    df_changes = pd.DataFrame(
+        {
+            "RowType": "change",
+            "Date": changes["recorded_at"],
+            "Category": changes["category_id"].map(cat_names),
+            "Title": changes["title"],
+            "Notes": changes["notes"],
+        }
+    )
+    return df_entries, df_changes
+
+
+def parquet_backup_definitions(tables: dict) -> dict:
+    """
+    Every metric definition and category name stored in a Parquet backup,
+    including those without entries or change events, as `import_bundle`
+    "metrics" and "categories" payloads.
+    """
+    categories = tables["categories"]
+    metrics = tables["metrics"]
+    frame = pd.DataFrame(
+        {
+            "Metric": metrics["name"],
+            "Description": metrics["description"],
+            "Unit": metrics["unit_name"],
+            "Category": metrics["category_id"].map(categories.set_index("id")["name"]),
+            "Type": metrics["unit_type"].fillna("float"),
+            "Kind": metrics["metric_kind"],
+            "Min": metrics["range_start"],
+            "Max": metrics["range_end"],
+            "Archived": metrics["is_archived"],
+            "HigherIsBetter": metrics["higher_is_better"],
+        }
+    )
+    return {
+        "metrics": [build_metric_payload(row) for _, row in frame.iterrows()],
+        "categories": [utils.normalize_name(name) for name in categories["name"].dropna()],
+    }
+
+
+def _is_parquet_backup(uploaded_file) -> bool:
+    return str(getattr(uploaded_file, "name", "")).lower().endswith(".zip")
+
+
+def _category_key(raw):
+    """Normalized category name for an import cell, or None when blank."""
+    if raw is None or pd.isna(raw) or not str(raw).strip():
+        return None
+    return utils.normalize_name(str(raw))
+
+
+def build_metric_payload(row) -> dict:
+    """
+    Builds an `import_bundle` metric definition from one unique import row.
+    The category is referenced by normalized name and resolved server-side.
+    """
+    m_type = str(row['Type']).strip().lower()
+    if pd.notna(row.get("Kind")) and str(row.get("Kind")).strip():
+        m_kind = str(row.get("Kind")).strip().lower()
+    else:
+        m_kind = "score" if m_type == "integer_range" else ("count" if m_type == "integer" else "quantitative")
+
+    # Keep `unit_type` aligned to kind for consistent behavior.
+    if m_kind == "score":
+        m_type = "integer_range"
+    elif m_kind == "count":
+        m_type = "integer"
+    else:
+        m_type = "float"
+
+    cat_key = _category_key(row.get('Category'))
+    return {
+        "name": str(row['Metric']).strip().lower(),
+        "description": str(row['Description']) if pd.notna(row.get('Description')) else None,
+        "is_archived": bool(row['Archived']) if pd.notna(row.get('Archived')) else False,
+        "unit_name": str(row['Unit']).lower() if pd.notna(row.get('Unit')) else None,
+        "category": cat_key,
+        "unit_type": m_type,
+        "metric_kind": m_kind,
+        "range_start": int(row['Min']) if pd.notna(row.get('Min')) else None,
+        "range_end": int(row['Max']) if pd.notna(row.get('Max')) else None,
+        "higher_is_better": bool(row.get("HigherIsBetter")) if pd.notna(row.get("HigherIsBetter")) else True,
+    }
+
+
 @st.fragment
 def show_data_lifecycle_management():
     st.header("Backup & Recovery")
@@ -114,46 +358,232 @@ def show_data_lifecycle_management():
     
     with col_exp:
         st.subheader("Export Data")
-        if st.button("Prepare Enhanced Export CSV", use_container_width=True):
-            data = models.get_flat_export_data()
-            if data:
-                df = pd.DataFrame(data)
-                # Standardize Date format
-                df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d %H:%M:%S')
-                csv = df.to_csv(index=False).encode('utf-8')
-                user = auth.get_current_user()
-                username = user.email.split('@')[0] if user else "user"
-                datestr = datetime.now().strftime('%Y-%m-%d')
-
-                fname = f"quantifi_backup_{username}_{datestr}.csv"
+        export_format = st.radio(
+            "Format",
+            ["CSV", "Parquet (compact)"],
+            horizontal=True,
+            help="Parquet backups are a zip of normalized, typed tables: smaller and much faster to restore.",
+        )
+        user = auth.get_current_user()
+        username = user.email.split('@')[0] if user else "user"
+        datestr = datetime.now().strftime('%Y-%m-%d')
+
+        if export_format == "CSV" and st.button("Prepare Enhanced Export CSV", use_container_width=True):
+            # Rows are paged and merged newest-first and written straight to a
+            # spooled file, so large histories never sit in memory as a frame.
+            # A failed page aborts the export: the partial file is dropped with
+            # the spool and no backup timestamp is recorded.
+            with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES) as csv_file:
+                try:
+                    with st.spinner("Preparing export..."):
+                        row_count = models.write_export_csv(csv_file)
+                except Exception as e:
+                    st.error(f"⚠️ Export failed; no backup was created: {e}")
+                    row_count = None
+                if row_count:
+                    csv_file.seek(0)
+                    fname = f"quantifi_backup_{username}_{datestr}.csv"
+                    models.save_backup_timestamp()
+                    st.download_button("📥 Download CSV", data=csv_file.read(), file_name= fname,
+                                        mime="text/csv", use_container_width=True)
+                elif row_count == 0:
+                    st.info("No data found to export.")
+
+        if export_format != "CSV" and st.button("Prepare Parquet Backup", use_container_width=True):
+            with st.spinner("Preparing export..."):
+                tables = models.get_backup_tables()
+            if tables and (len(tables["entries"]) or len(tables["changes"])):
+                fname = f"quantifi_backup_{username}_{datestr}.zip"
                 models.save_backup_timestamp()
-                st.download_button("📥 Download CSV", data=csv, file_name= fname,
-                                    mime="text/csv", use_container_width=True)
-            else:
+                st.download_button("📥 Download Parquet Backup", data=write_parquet_backup(tables),
+                                    file_name=fname, mime="application/zip", use_container_width=True)
+            elif tables is not None:
                 st.info("No data found to export.")
 
     with col_imp:
         st.subheader("Rebuild / Import")
-        uploaded_file = st.file_uploader("Upload Enhanced CSV", type="csv")
+        uploaded_file = st.file_uploader("Upload Enhanced CSV or Parquet backup", type=["csv", "zip"])
         wipe_first = st.checkbox("🔥 Wipe database before import", value=False)
         
-        if uploaded_file:
+        if uploaded_file and _is_parquet_backup(uploaded_file):
             _handle_import_logic(uploaded_file, wipe_first)
+        elif uploaded_file:
+            stream = st.checkbox(
+                "🪶 Low-memory import (read in chunks)",
+                value=uploaded_file.size >= STREAM_IMPORT_MIN_BYTES,
+                help="Recommended for very large backups.",
+            )
+            _handle_import_logic(uploaded_file, wipe_first, stream=stream)
 
     st.divider()
     # Add the template downloader at the bottom
     _render_template_downloader()
 
-def _handle_import_logic(uploaded_file, wipe_first):
+def _read_import_chunks(uploaded_file, chunksize=None):
+    """
+    Yields (df_entries, df_changes) per CSV chunk, or once for the whole file
+    when `chunksize` is None. Rewinds first so the upload can be read twice.
+    Parquet backup archives are read whole (they are compact) and sliced.
+    """
+    uploaded_file.seek(0)
+    if _is_parquet_backup(uploaded_file):
+        df_entries, df_changes = parquet_backup_to_frames(read_parquet_backup(uploaded_file))
+        step = chunksize or max(1, len(df_entries))
+        yield df_entries.iloc[:step], df_changes
+        for start in range(step, len(df_entries), step):
+            yield df_entries.iloc[start:start + step], df_changes.iloc[:0]
+        return
+    if chunksize is None:
+        yield parse_import_frames(pd.read_csv(uploaded_file))
+        return
+    for chunk in pd.read_csv(uploaded_file, chunksize=chunksize):
+        yield parse_import_frames(chunk)
+
+
+def _metric_payloads(df_entries) -> list[dict]:
+    """One metric definition per metric name (first occurrence wins)."""
+    if df_entries.empty:
+        return []
+    # Fill missing metadata with defaults
+    for col in ['Description', 'Unit', 'Category', 'Min', 'Max', 'Archived', 'Kind', 'HigherIsBetter']:
+        if col not in df_entries.columns:
+            df_entries[col] = None
+    schema_cols = ['Metric', 'Description', 'Unit', 'Category', 'Type', 'Kind', 'Min', 'Max', 'Archived', 'HigherIsBetter']
+
+    payloads = {}
+    for _, row in df_entries[schema_cols].drop_duplicates().iterrows():
+        payload = build_metric_payload(row)
+        payloads.setdefault(payload["name"], payload)
+    return list(payloads.values())
+
+
+def _iso_dates(series: pd.Series) -> pd.Series:
+    """
+    Vectorized `Timestamp.isoformat()` for a Date column: fractional seconds
+    only when present, tz-aware stamps rendered in UTC. Formatting runs in
+    numpy (`datetime_as_string`), not per value.
+    """
+    dates = _parse_import_dates(series)
+    if dates.isna().any():
+        raise ValueError(f"Unparseable Date in row {dates.index[dates.isna()][0] + 2}.")
+    aware = dates.dt.tz is not None
+    if aware:
+        dates = dates.dt.tz_convert("UTC").dt.tz_localize(None)
+    values = dates.to_numpy(dtype="datetime64[us]")
+    text = np.datetime_as_string(values, unit="s").astype(object)
+    fractional = values != values.astype("datetime64[s]")
+    if fractional.any():
+        text[fractional] = np.datetime_as_string(values[fractional], unit="us")
+    if aware:
+        text = text + "+00:00"
+    return pd.Series(text, index=series.index, dtype=object)
+
+
+def _records(columns: dict) -> list[dict]:
+    """Row dicts from equally long columns; much faster than DataFrame.to_dict("records")."""
+    keys = list(columns)
+    values = [col.tolist() if isinstance(col, pd.Series) else col for col in columns.values()]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def _optional_text(series: pd.Series) -> pd.Series:
+    """Stripped text per cell, with NaN and blank cells as None."""
+    text = _cell_text(series)
+    return text.astype(object).where(text.notna() & (text != ""), None)
+
+
+def _build_entry_payloads(df_entries) -> list[dict]:
+    values = _coerce_numeric(df_entries["Value"])
+    no_text = [None] * len(df_entries)
+    return _records(
+        {
+            "metric": df_entries["Metric"].astype(str).str.strip().str.lower(),
+            "value": values.astype(object).where(values.notna(), None),
+            "recorded_at": _iso_dates(df_entries["Date"]),
+            "target_action": _optional_text(df_entries["Target"]) if "Target" in df_entries.columns else no_text,
+        }
+    )
+
+
+def _build_change_payloads(df_changes) -> list[dict]:
+    no_text = [None] * len(df_changes)
+    if "Title" in df_changes.columns:
+        titles = _optional_text(df_changes["Title"])
+        titles = titles.where(titles.notna(), "")
+    else:
+        titles = [""] * len(df_changes)
+    return _records(
+        {
+            "title": titles,
+            "notes": _optional_text(df_changes["Notes"]) if "Notes" in df_changes.columns else no_text,
+            "category": (
+                _optional_text(_cell_text(df_changes["Category"]).str.lower())
+                if "Category" in df_changes.columns else no_text
+            ),
+            "recorded_at": _iso_dates(df_changes["Date"]),
+        }
+    )
+
+
+def build_import_bundles(df_entries, df_changes, rows_per_call: int = IMPORT_RPC_ROWS, definitions=None) -> list[dict]:
+    """
+    Serializes validated frames into `import_bundle` payloads carrying at most
+    `rows_per_call` entry/change rows each. Metric definitions ride along with
+    the first bundle: `definitions` (see `parquet_backup_definitions`) when
+    given, else the metrics named by `df_entries`. Metrics and categories are
+    referenced by name.
+    """
+    entries = _build_entry_payloads(df_entries) if not df_entries.empty else []
+    changes = _build_change_payloads(df_changes) if not df_changes.empty else []
+
+    bundles = [
+        {"metrics": [], "entries": entries[i:i + rows_per_call], "changes": []}
+        for i in range(0, len(entries), rows_per_call)
+    ]
+    bundles += [
+        {"metrics": [], "entries": [], "changes": changes[i:i + rows_per_call]}
+        for i in range(0, len(changes), rows_per_call)
+    ]
+    if not bundles:
+        bundles.append({"metrics": [], "entries": [], "changes": []})
+    if definitions is None:
+        bundles[0]["metrics"] = _metric_payloads(df_entries)
+    else:
+        bundles[0]["metrics"] = definitions["metrics"]
+        bundles[0]["categories"] = definitions["categories"]
+    return bundles
+
+
+def _handle_import_logic(uploaded_file, wipe_first, stream=False):
+    """
+    Dry-runs and (on confirmation) imports an uploaded CSV.
+    With `stream=True` the file is read and validated in chunks of
+    IMPORT_CHUNK_ROWS rows, so only counters stay in memory.
+
+    Rows are staged server-side through the `import_bundle` RPC and applied
+    (including the optional wipe) in one final transaction: a failed restore
+    leaves the database untouched.
+    """
+    chunksize = IMPORT_CHUNK_ROWS if stream else None
     try:
-        df_import = pd.read_csv(uploaded_file)
-        df_entries, df_changes = parse_import_frames(df_import)
+        # --- 1. PRE-VALIDATION / DRY RUN ---
+        n_rows = n_entries = n_changes = 0
+        errors: list[str] = []
+        hidden_errors = 0
+        for df_entries, df_changes in _read_import_chunks(uploaded_file, chunksize):
+            n_rows += len(df_entries) + len(df_changes)
+            n_entries += len(df_entries)
+            n_changes += len(df_changes)
+            chunk_errors = validate_import_frames(df_entries, df_changes)
+            room = max(0, MAX_IMPORT_ERRORS - len(errors))
+            errors.extend(chunk_errors[:room])
+            hidden_errors += len(chunk_errors[room:])
+        if hidden_errors:
+            errors.append(f"... and {hidden_errors} more validation messages.")
+
         st.caption(
-            f"Found {len(df_import)} rows: {len(df_entries)} entries, {len(df_changes)} changes."
+            f"Found {n_rows} rows: {n_entries} entries, {n_changes} changes."
         )
-        
-        # --- 1. PRE-VALIDATION / DRY RUN ---
-        errors = validate_import_frames(df_entries, df_changes)
 
         if errors:
             st.error("❌ **Dry Run Failed: Import Aborted.**")
@@ -164,111 +594,67 @@ def _handle_import_logic(uploaded_file, wipe_first):
 
         # --- 2. EXECUTION PHASE (Only reached if Dry Run passes) ---
         if st.button("🚀 Start Rebuild", type="primary", use_container_width=True):
-            st.cache_data.clear() 
             log = st.container(height=300)
             progress_bar = st.progress(0)
-            
-            if wipe_first:
-                log.write("🗑️ **Wiping existing database...**")
-                models.wipe_user_data() 
-                log.write("✅ Database cleared.")
-                time.sleep(1)
-
-            if not df_entries.empty:
-                log.write("🏗️ **Syncing Schema...**")
-            schema_cols = ['Metric', 'Description', 'Unit', 'Category', 'Type', 'Min', 'Max', 'Archived']
-            # Fill missing metadata with defaults
-            for col in ['Description', 'Unit', 'Category', 'Min', 'Max', 'Archived', 'Kind', 'HigherIsBetter']:
-                if col not in df_entries.columns:
-                    df_entries[col] = None
-            
-            unique_metrics = df_entries[schema_cols].drop_duplicates() if not df_entries.empty else pd.DataFrame()
-            
-            for i, (_, row) in enumerate(unique_metrics.iterrows()):
-                met_name = str(row['Metric']).strip().lower()
-                if not models.get_metric_by_name(met_name):
-                    m_type = str(row['Type']).strip().lower()
-                    if pd.notna(row.get("Kind")):
-                        m_kind = str(row.get("Kind")).strip().lower()
-                    else:
-                        m_kind = "score" if m_type == "integer_range" else ("count" if m_type == "integer" else "quantitative")
-
-                    # Keep `unit_type` aligned to kind for consistent behavior.
-                    if m_kind == "score":
-                        m_type = "integer_range"
-                    elif m_kind == "count":
-                        m_type = "integer"
-                    else:
-                        m_type = "float"
-
-                    payload = {
-                        "name": met_name,
-                        "description": str(row['Description']) if pd.notna(row['Description']) else None,
-                        "is_archived": bool(row['Archived']) if pd.notna(row['Archived']) else False,
-                        "unit_name": str(row['Unit']).lower() if pd.notna(row['Unit']) else None,
-                        "category_id": utils.ensure_category_id("NEW_CAT", str(row['Category'])) if pd.notna(row['Category']) else None,
-                        "unit_type": m_type,
-                        "metric_kind": m_kind,
-                        "range_start": int(row['Min']) if pd.notna(row['Min']) else None,
-                        "range_end": int(row['Max']) if pd.notna(row['Max']) else None
-                    }
-                    if pd.notna(row.get("HigherIsBetter")):
-                        payload["higher_is_better"] = bool(row.get("HigherIsBetter"))
-                    res = models.create_metric(payload)
-                    if not res:
-                        st.error(f"Failed to create metric: {met_name}. Aborting.")
-                        return 
-
-            success_entries = 0
-            success_changes = 0
-            total_rows = max(1, len(df_entries) + len(df_changes))
-
-            if not df_entries.empty:
-                log.write("📝 **Importing Entries...**")
-                all_metrics = models.get_metrics()
-                metrics_lookup = {m['name'].lower().strip(): m['id'] for m in all_metrics}
-
-                for i, (_, row) in enumerate(df_entries.iterrows()):
-                    m_id = metrics_lookup.get(str(row["Metric"]).strip().lower())
-                    if m_id:
-                        formatted_date = pd.to_datetime(row["Date"]).isoformat()
-                        raw_val = row.get("Value")
-                        if pd.isna(raw_val) or str(raw_val).strip() == "":
-                            val = None
-                        else:
-                            val = float(raw_val)
-                        payload = {"metric_id": m_id, "value": val, "recorded_at": formatted_date}
-                        if "Target" in df_entries.columns and pd.notna(row.get("Target")) and str(row.get("Target")).strip():
-                            payload["target_action"] = str(row.get("Target")).strip()
-                        models.create_entry(payload)
-                        success_entries += 1
-                    progress_bar.progress((i + 1) / total_rows)
-
-            if not df_changes.empty:
-                log.write("📝 **Importing Changes...**")
-                for j, (_, row) in enumerate(df_changes.iterrows()):
-                    formatted_date = pd.to_datetime(row["Date"]).isoformat()
-                    title = str(row.get("Title") or "").strip()
-                    notes = str(row.get("Notes") or "").strip()
-                    cat_name = row.get("Category")
-                    cat_id = None
-                    if pd.notna(cat_name) and str(cat_name).strip():
-                        cat_id = utils.ensure_category_id("NEW_CAT", str(cat_name))
-                    models.create_change_event(
-                        {
-                            "title": title,
-                            "notes": (notes if notes else None),
-                            "category_id": cat_id,
-                            "recorded_at": formatted_date,
-                        }
+            import_id = str(uuid.uuid4())
+            total_rows = max(1, n_rows)
+            rows_sent = 0
+
+            # Staged rows of an aborted upload (or a rolled-back commit) are
+            # discarded right away instead of lingering for a day.
+            discard = True
+            try:
+                log.write("📤 **Uploading rows...**")
+                definitions = None
+                if _is_parquet_backup(uploaded_file):
+                    # Restore every stored metric/category, not only those with rows.
+                    uploaded_file.seek(0)
+                    definitions = parquet_backup_definitions(
+                        read_parquet_backup(uploaded_file, ("categories", "metrics"))
                     )
-                    success_changes += 1
-                    progress_bar.progress((len(df_entries) + j + 1) / total_rows)
-            
+                for chunk_no, (df_entries, df_changes) in enumerate(_read_import_chunks(uploaded_file, chunksize)):
+                    if definitions is not None and chunk_no:
+                        definitions = {"metrics": [], "categories": []}  # Sent with the first chunk only
+                    for bundle in build_import_bundles(df_entries, df_changes, definitions=definitions):
+                        bundle.update({"import_id": import_id, "commit": False})
+                        if models.import_bundle(bundle) is None:
+                            st.error("Upload failed. Import aborted; nothing was changed.")
+                            return
+                        rows_sent += len(bundle["entries"]) + len(bundle["changes"])
+                        # Keep the last slice of the bar for the commit step.
+                        progress_bar.progress(0.9 * min(1.0, rows_sent / total_rows))
+
+                if wipe_first:
+                    log.write("🗑️ **Wiping existing database & rebuilding...**")
+                else:
+                    log.write("🏗️ **Syncing Schema & Importing...**")
+                result = models.import_bundle({"import_id": import_id, "wipe": wipe_first, "commit": True})
+                if result is None:
+                    st.error("Import failed and was rolled back; nothing was changed.")
+                    return
+                discard = False
+            finally:
+                if discard:
+                    models.discard_import(import_id)
+
+            if result.get("committed") is None:
+                # The commit may still be running server-side: keep its staged
+                # rows and show what the database holds right now.
+                metrics = models.get_metrics(include_archived=True) or []
+                st.warning(
+                    "⏳ The import did not answer in time and may still complete. "
+                    f"Your account currently has {len(metrics)} metrics; reload in a minute to see the result."
+                )
+                return
+
+            progress_bar.progress(1.0)
+            log.write(
+                f"✅ Created {result.get('categories', 0)} categories and {result.get('metrics', 0)} metrics."
+            )
 
             # Use the mobile-optimized toast and refresh from utils
             utils.finalize_action(
-                message=f"Rebuild complete: {success_entries} entries, {success_changes} changes synced.",
+                message=f"Rebuild complete: {result.get('entries', 0)} entries, {result.get('changes', 0)} changes synced.",
                 icon="🚀",
                 delay=2 # Slightly longer delay to let the user read the count
             )
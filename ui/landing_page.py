@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import auth
 import models
+import utils
 from ui import visualize, pages
 
 def _switch_to_new_metric():
@@ -42,7 +43,7 @@ def _format_latest_value(*, metric, stats):
     suffix = f" {unit}" if unit else ""
     return value_str, suffix
 
-def show_landing_page(metrics_list, all_entries):
+def show_landing_page(metrics_list, summary):
     cats = models.get_categories() or []
     user = auth.get_current_user()
     user_display = user.email.split('@')[0].capitalize() if user else "User"
@@ -52,10 +53,10 @@ def show_landing_page(metrics_list, all_entries):
         if st.button("✨ Create Your First Metric", use_container_width=True, type="primary"):
             _switch_to_new_metric()
         return
-    render_metric_grid(metrics_list, cats, all_entries)
+    render_metric_grid(metrics_list, cats, summary)
 
 @st.fragment
-def render_metric_grid(metrics_list, cats, all_entries):
+def render_metric_grid(metrics_list, cats, summary):
     # Initialize the session state for the pills if it doesn't exist
     if "cat_filter" not in st.session_state:
         st.session_state["cat_filter"] = None
@@ -74,50 +75,25 @@ def render_metric_grid(metrics_list, cats, all_entries):
     )
     current_filter = st.session_state.get("cat_filter")
 
-    all_df = pd.DataFrame(all_entries)
-
-    if not all_df.empty:
-        all_df['recorded_at'] = pd.to_datetime(all_df['recorded_at'], format='mixed', utc=True)
-        # "Not measured" (NULL/blank) should not make a metric appear "recent".
-        all_df["_value_num"] = pd.to_numeric(all_df.get("value"), errors="coerce")
-        measured_df = all_df[pd.notna(all_df["_value_num"])].copy()
-        latest_by_metric = measured_df.groupby('metric_id')['recorded_at'].max() if not measured_df.empty else pd.Series(dtype='datetime64[ns, UTC]')
-        grouped_by_metric = {mid: df for mid, df in all_df.groupby('metric_id')}
-    else:
-        latest_by_metric = pd.Series(dtype='datetime64[ns, UTC]')
-        grouped_by_metric = {}
+    # One precomputed row per metric (see models.get_overview_summary).
+    summary_by_metric = {row["metric_id"]: row for row in (summary or [])}
+    no_ts = pd.Timestamp.min.tz_localize('UTC')
 
     scored_metrics = []
     for m in metrics_list:
-        m_df = grouped_by_metric.get(m['id'], pd.DataFrame())
-        stats = visualize.get_metric_stats(m_df)
-        
-        # --- FIX START: Extract Target ---
-        latest_target = None
-        if not m_df.empty and "target_action" in m_df.columns:
-            # Sort by date to ensure we get the absolute latest
-            latest_entry = m_df.sort_values("recorded_at").iloc[-1]
-            if pd.notna(latest_entry.get("target_action")):
-                latest_target = latest_entry["target_action"]
-        # --- FIX END ---
-
-        if not m_df.empty:
-            v = pd.to_numeric(m_df.sort_values("recorded_at")["value"], errors="coerce")
-            spark_values = list(v.dropna().tail(12))
-        else:
-            spark_values = []
-        stats["spark_values"] = spark_values
-        latest_ts = latest_by_metric.get(m['id'], pd.Timestamp.min.tz_localize('UTC'))
-        
-        # --- FIX: Append 4 items instead of 3 ---
-        scored_metrics.append((latest_ts, m, stats, latest_target)) 
+        row = summary_by_metric.get(m['id'])
+        stats = visualize.get_summary_stats(row)
+        latest_target = row.get("latest_target") if row else None
+        # "Not measured" (NULL/blank) should not make a metric appear "recent".
+        latest_ts = stats["latest_ts"] if stats["latest_ts"] is not None else no_ts
+        scored_metrics.append((latest_ts, m, stats, latest_target))
 
     if current_filter == "Recent":
         recent = [
             (ts, m, stats, target)
             for ts, m, stats, target in scored_metrics
             if ts is not None
-            and ts != pd.Timestamp.min.tz_localize('UTC')
+            and ts != no_ts
             and not m.get("is_archived", False)
         ]
         recent.sort(key=lambda x: x[0], reverse=True)
@@ -396,7 +372,7 @@ def show_advanced_analytics_view(metric):
         return
 
     # 2. Render visualizations
-    df = pd.DataFrame(entries)
+    df = utils.entry_frame(entries)
     visualize.show_visualizations(
         df,
         metric.get("unit_name", ""),
@@ -41,8 +41,7 @@ def show_manage_lookups():
                     st.session_state["last_active_cat_id"] = existing["id"]
                     st.rerun()
                 else:
-                    models.create_category(norm_name)
-                    created = models.get_category_by_name(norm_name)
+                    created = models.create_category(norm_name)
                     if created:
                         st.session_state["last_active_cat_id"] = created["id"]
                     st.session_state["manage_cat_notice"] = None
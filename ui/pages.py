@@ -19,6 +19,20 @@ def tracker_page():
         st.session_state["nav_to_record_trigger"] = False 
 
     # --- 2. DATA LOADING & STATE ---
+    # Fetch the view's cold reads concurrently (warm ones submit nothing); the calls below hit the cache.
+    initial_view = st.session_state.get("tracker_view_selector", "Overview")
+    if initial_view == "Overview":
+        models.prefetch(
+            models.get_metrics_async(include_archived=True),
+            models.get_overview_summary_async(),
+            models.get_categories_async(),
+        )
+    elif initial_view == "Changes":
+        models.prefetch(
+            models.get_metrics_async(include_archived=True),
+            models.get_change_events_async(),
+            models.get_categories_async(),
+        )
     all_metrics = models.get_metrics(include_archived=True) or []
 
     if "tracker_view_selector" not in st.session_state:
@@ -63,11 +77,13 @@ def tracker_page():
         
         if selected_metric:
             st.session_state["last_active_mid"] = selected_metric['id']
+            if view_mode != "Edit":  # The editor loads only its date window
+                models.prefetch_entries(selected_metric['id'])
 
     # --- 6. CONTENT ROUTING ---
     if view_mode == "Overview":
-        all_entries = models.get_all_entries_bulk()
-        landing_page.show_landing_page(all_metrics, all_entries)
+        summary = models.get_overview_summary()
+        landing_page.show_landing_page(all_metrics, summary)
         
     elif view_mode == "Record" and selected_metric:
         capture.show_tracker_suite(selected_metric)
@@ -149,6 +165,7 @@ def configure_page():
         st.html('<div style="height: 10px;"></div>')
 
     # --- 4. DATA LOADING & CONTENT ROUTING ---
+    models.prefetch(models.get_categories_async(), models.get_metrics_async(include_archived=True))
     cats = models.get_categories() or []
     metrics_list = models.get_metrics(include_archived=True) or []
     
@@ -2,6 +2,7 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 import math
+import utils
 
 def build_hierarchical_annotations(plot_df, freq, range_choice=None):
     month_annotations = []
@@ -58,15 +59,10 @@ def get_metric_stats(df):
             "avg": None, "count": 0, "last_date": "No Data"
         }
 
-    if not pd.api.types.is_datetime64_any_dtype(df['recorded_at']):
-        df['recorded_at'] = pd.to_datetime(df['recorded_at'], format='mixed', utc=True)
-    elif df['recorded_at'].dt.tz is None:
-        df['recorded_at'] = df['recorded_at'].dt.tz_localize('UTC')
-    
-    df = df.sort_values("recorded_at")
+    df = utils.as_entry_frame(df).sort_values("recorded_at")
 
     # Treat NULL/blank as "not measured" (excluded from stats), but keep numeric 0 as valid.
-    clean_series = pd.to_numeric(df["value"], errors="coerce").dropna()
+    clean_series = df["value"].dropna()
     if clean_series.empty:
         return {
             "latest": None,
@@ -89,7 +85,33 @@ def get_metric_stats(df):
         "change": change,
         "avg": float(clean_series.mean()),
         "count": int(clean_series.shape[0]),
-        "last_date": last_ts.strftime('%d %b') 
+        "last_date": last_ts.strftime('%d %b')
+    }
+
+def get_summary_stats(row):
+    """
+    Same shape as get_metric_stats, built from one `get_overview_summary` row
+    (already aggregated server-side). Adds `spark_values` and `latest_ts`.
+    """
+    if not row or not row.get("entry_count") or row.get("latest_value") is None:
+        stats = get_metric_stats(None)
+        stats.update({"spark_values": [], "latest_ts": None})
+        return stats
+
+    latest_val = float(row["latest_value"])
+    prev_val = row.get("prev_value")
+    ma7 = row.get("ma7")
+    latest_ts = pd.to_datetime(row["latest_recorded_at"], format="ISO8601", utc=True)
+
+    return {
+        "latest": latest_val,
+        "ma7": float(ma7) if ma7 is not None else None,
+        "change": float(latest_val - float(prev_val)) if prev_val is not None else 0.0,
+        "avg": float(row["avg_value"]),
+        "count": int(row["entry_count"]),
+        "last_date": latest_ts.strftime('%d %b'),
+        "spark_values": [float(v) for v in (row.get("spark_values") or [])],
+        "latest_ts": latest_ts,
     }
 
 def render_stat_row(stats, mode="compact"):
@@ -153,11 +175,8 @@ def show_visualizations(
         st.info("No data recorded for this metric yet.")
         return
 
-    # 1. TIMEZONE & TYPE SANITY CHECK
-    if not pd.api.types.is_datetime64_any_dtype(dfe['recorded_at']):
-        dfe['recorded_at'] = pd.to_datetime(dfe['recorded_at'], format='mixed', utc=True)
-    elif dfe['recorded_at'].dt.tz is None:
-        dfe['recorded_at'] = dfe['recorded_at'].dt.tz_localize('UTC')
+    # 1. TYPED FRAME (a no-op for frames from utils.collect_data)
+    dfe = utils.as_entry_frame(dfe)
 
     # 2. CALCULATE DATA SPAN FOR SMART RANGE OPTIONS
     min_date = dfe["recorded_at"].min()
@@ -240,9 +259,6 @@ def show_visualizations(
     is_ordinal_score = kind == "score"
     is_count = kind == "count"
 
-    # Normalize values: blanks/NULLs -> NaN, numeric 0 preserved.
-    filtered_df["value"] = pd.to_numeric(filtered_df["value"], errors="coerce")
-
     if is_ordinal_score:
         agg_func = "median"
     elif is_count:
@@ -22,8 +22,7 @@ def ensure_category_id(choice, new_name_input):
         if existing:
             return existing['id']
             
-        models.create_category(norm_cat)
-        new_cat_obj = models.get_category_by_name(norm_cat)
+        new_cat_obj = models.create_category(norm_cat)
         return new_cat_obj['id'] if new_cat_obj else None
     
     return choice if choice != "NEW_CAT" else None
@@ -37,17 +36,52 @@ def format_metric_label(metric, unit_map=None):
         label = f"{label} (Archived)"
     return label
 
-def collect_data(selected_metric, unit_meta=None):
+ENTRY_COLUMNS = ["id", "metric_id", "value", "recorded_at"]
+
+def entry_frame(entries) -> pd.DataFrame:
+    """
+    Typed entry frame, built once at load time: `recorded_at` is tz-aware
+    (UTC) datetime64, `value` is float64 (blank/NULL -> NaN, "not measured")
+    and `recorded_date` caches the UTC calendar date for date-range masks.
+    Accepts PostgREST rows or an untyped frame.
+    """
+    if isinstance(entries, pd.DataFrame):
+        dfe = entries.copy()
+    else:
+        dfe = pd.DataFrame(entries) if entries else pd.DataFrame(columns=ENTRY_COLUMNS)
+    if is_entry_frame(dfe):
+        return dfe
+    dfe["recorded_at"] = pd.to_datetime(dfe["recorded_at"], format="mixed", utc=True)
+    dfe["value"] = pd.to_numeric(dfe["value"], errors="coerce").astype("float64")
+    dfe["recorded_date"] = dfe["recorded_at"].dt.date
+    return dfe
+
+def is_entry_frame(dfe) -> bool:
+    """Cheap dtype check (no parsing): True when `dfe` already has entry_frame's types."""
+    return (
+        dfe is not None
+        and "recorded_date" in dfe.columns
+        and isinstance(dfe["recorded_at"].dtype, pd.DatetimeTZDtype)
+        and dfe["value"].dtype == "float64"
+    )
+
+def as_entry_frame(dfe) -> pd.DataFrame:
+    """Returns `dfe` untouched when already typed, else converts it once."""
+    return dfe if is_entry_frame(dfe) else entry_frame(dfe)
+
+def collect_data(selected_metric, unit_meta=None, start=None, end=None):
     mid = selected_metric.get("id")
     m_name = selected_metric.get("name", "Metric").title() #
     m_unit = selected_metric.get("unit_name", "") #
 
-    entries = models.get_entries(metric_id=mid) #
+    if start is not None and end is not None:
+        entries = models.get_entries_window(mid, start, end)  # Date range filtered server-side
+    else:
+        entries = models.get_entries(metric_id=mid) #
     if not entries:
         return pd.DataFrame(), m_unit, m_name #
         
-    dfe = pd.DataFrame(entries) #
-    dfe["recorded_at"] = pd.to_datetime(dfe["recorded_at"], format='ISO8601', utc=True) #
+    dfe = entry_frame(entries)  # Typed once here; the UI never re-parses
     
     # DEFAULT: Always provide data sorted by time for immediate visual feedback
     return dfe.sort_values("recorded_at", ascending=False), m_unit, m_name #
@@ -103,11 +137,11 @@ def apply_custom_tabs_css():
 
 def finalize_action(message, icon="✅", delay=1):
     """
-    Refined for performance: Clears cache and shows a toast with consistent timing.
-    The natural Streamlit rerun triggered by the button click 
-    will handle the UI refresh without 'double-hopping'.
+    Refined for performance: Shows a toast with consistent timing.
+    Cached reads were already evicted by the models write that preceded this,
+    for the current user only. The natural Streamlit rerun triggered by the
+    button click will handle the UI refresh without 'double-hopping'.
     """
-    st.cache_data.clear()
     st.toast(f"{icon} {message}")
     time.sleep(delay)
 